@@ -15,7 +15,21 @@ from pathlib import Path
 from typing import Optional
 
 import yaml
-from pydantic import BaseModel, Field, SecretStr
+from pydantic import BaseModel, Field, SecretStr, field_serializer
+
+try:  # libyaml-backed C implementation when available
+    from yaml import CSafeDumper as _Dumper, CSafeLoader as _Loader
+except ImportError:
+    from yaml import SafeDumper as _Dumper, SafeLoader as _Loader
+
+REDACTED = "***REDACTED***"
+
+
+def _redact_secret(value, handler, info):
+    """Wrap serializer: secrets dump as REDACTED under context={"redact": True}."""
+    if value and info.context and info.context.get("redact"):
+        return REDACTED
+    return handler(value)
 
 
 class VMwareConfig(BaseModel):
@@ -25,6 +39,10 @@ class VMwareConfig(BaseModel):
     insecure: bool = Field(False, description="Skip SSL verification")
     datacenter: str = Field("", description="Default datacenter name")
 
+    @field_serializer("password", mode="wrap")
+    def _serialize_password(self, value, handler, info):
+        return _redact_secret(value, handler, info)
+
 
 class ScalewayConfig(BaseModel):
     """Scaleway API + S3 settings (flat — accessed as config.scaleway.*)."""
@@ -37,6 +55,11 @@ class ScalewayConfig(BaseModel):
     s3_region: str = Field("fr-par")
     s3_bucket: str = Field("vmware2scw-transit")
     s3_endpoint: str = Field("https://s3.fr-par.scw.cloud")
+    s3_upload_concurrency: int = Field(16)   # multipart parts uploaded in parallel per file
+
+    @field_serializer("secret_key", mode="wrap")
+    def _serialize_secret_key(self, value, handler, info):
+        return _redact_secret(value, handler, info)
 
 
 class ConversionConfig(BaseModel):
@@ -44,6 +67,11 @@ class ConversionConfig(BaseModel):
     virtio_win_iso: str = Field("")
     ovmf_path: str = Field("/usr/share/OVMF/OVMF_CODE.fd")
     compress_qcow2: bool = Field(True)
+    convert_parallelism: int = Field(0)  # max concurrent qemu-img per VM (0 = cpu_count // 2)
+    streaming_upload: bool = Field(False)  # upload data disks to S3 during export
+    disk_parallelism: int = Field(2)  # disks uploaded / imported concurrently per VM
+    guestfs_memsize: int = Field(2048)  # libguestfs appliance RAM in MB
+    guestfs_smp: int = Field(0)  # libguestfs appliance vCPUs (0 = min(4, cpu_count))
     keep_intermediates: bool = Field(False)
     qemu_img_path: str = Field("qemu-img")
     virt_customize_path: str = Field("virt-customize")
@@ -57,38 +85,36 @@ class AppConfig(BaseModel):
     @classmethod
     def from_yaml(cls, path: str | Path) -> "AppConfig":
         with open(path) as f:
-            data = yaml.safe_load(f) or {}
+            data = yaml.load(f, Loader=_Loader) or {}
         return cls(**data)
 
     @classmethod
     def from_env_and_args(cls, **overrides) -> "AppConfig":
+        env = os.environ
+        vmware_password = env.get("VMWARE_PASSWORD")
+        scw_secret_key = env.get("SCW_SECRET_KEY")
         return cls(
             vmware=VMwareConfig(
-                vcenter=os.getenv("VMWARE_VCENTER", ""),
-                username=os.getenv("VMWARE_USERNAME", ""),
-                password=SecretStr(os.getenv("VMWARE_PASSWORD", "")) if os.getenv("VMWARE_PASSWORD") else None,
-                insecure=os.getenv("VMWARE_INSECURE", "false").lower() == "true",
+                vcenter=env.get("VMWARE_VCENTER", ""),
+                username=env.get("VMWARE_USERNAME", ""),
+                password=SecretStr(vmware_password) if vmware_password else None,
+                insecure=env.get("VMWARE_INSECURE", "false").lower() == "true",
             ),
             scaleway=ScalewayConfig(
-                access_key=os.getenv("SCW_ACCESS_KEY"),
-                secret_key=SecretStr(os.getenv("SCW_SECRET_KEY", "")) if os.getenv("SCW_SECRET_KEY") else None,
-                organization_id=os.getenv("SCW_ORGANIZATION_ID", ""),
-                project_id=os.getenv("SCW_PROJECT_ID", ""),
-                default_zone=os.getenv("SCW_DEFAULT_ZONE", "fr-par-1"),
-                s3_bucket=os.getenv("SCW_S3_BUCKET", "vmware2scw-transit"),
-                s3_region=os.getenv("SCW_S3_REGION", "fr-par"),
+                access_key=env.get("SCW_ACCESS_KEY"),
+                secret_key=SecretStr(scw_secret_key) if scw_secret_key else None,
+                organization_id=env.get("SCW_ORGANIZATION_ID", ""),
+                project_id=env.get("SCW_PROJECT_ID", ""),
+                default_zone=env.get("SCW_DEFAULT_ZONE", "fr-par-1"),
+                s3_bucket=env.get("SCW_S3_BUCKET", "vmware2scw-transit"),
+                s3_region=env.get("SCW_S3_REGION", "fr-par"),
             ),
         )
 
     def to_yaml(self, path: str | Path) -> None:
-        data = self.model_dump(mode="json")
-        for section in data.values():
-            if isinstance(section, dict):
-                for key, val in section.items():
-                    if ("password" in key or "secret" in key) and val:
-                        section[key] = "***REDACTED***"
+        data = self.model_dump(mode="json", context={"redact": True})
         with open(path, "w") as f:
-            yaml.dump(data, f, default_flow_style=False, sort_keys=False)
+            yaml.dump(data, f, Dumper=_Dumper, default_flow_style=False, sort_keys=False)
 
 
 class VMMigrationPlan(BaseModel):
@@ -7,25 +7,112 @@ appliance boot overhead.
 v2.0 — Optimized pipeline:
   1 appel virt-customize au lieu de 3-4
   virt-v2v complètement éliminé (fallback direct)
+
+When the libguestfs Python binding is installed, the adaptation script runs
+through an in-process guestfs handle instead of virt-customize.
 """
 
 import logging
 import os
-import subprocess
+import tempfile
 from pathlib import Path
 
+from vmware2scw.utils.subprocess import run_streamed
+
+try:  # libguestfs Python binding (python3-guestfs), optional
+    import guestfs
+except ImportError:
+    guestfs = None
+
 logger = logging.getLogger(__name__)
 
-GUESTFS_ENV = {**os.environ, "LIBGUESTFS_BACKEND": "direct"}
+APPLIANCE_MEMSIZE = 2048  # MB; the libguestfs default (~768) slows initramfs rebuilds
+APPLIANCE_SMP = min(4, os.cpu_count() or 1)
+
+GUEST_SCRIPT = "/tmp/vmware2scw-adapt.sh"
+
+# /etc/default/grub for KVM on Scaleway in one awk pass (one read, one
+# write): /dev/sda → /dev/vda, serial console instead of gfx terminals,
+# console= kernel args. POSIX awk + rename: Debian/Ubuntu ship mawk, which
+# has no -i inplace.
+GRUB_DEFAULTS_CMD = (
+    "if [ -f /etc/default/grub ]; then "
+    "  cp /etc/default/grub /etc/default/grub.vmware2scw.bak; "
+    "  awk -v c='console=tty1 console=ttyS0,115200n8' '\n"
+    "    { gsub(\"/dev/sda\", \"/dev/vda\") }\n"
+    "    /^GRUB_(TERMINAL_OUTPUT|TERMINAL|SERIAL_COMMAND|GFXMODE|GFXPAYLOAD_LINUX)=/ { next }\n"
+    "    /^GRUB_CMDLINE_LINUX_DEFAULT=/ { $0 = \"GRUB_CMDLINE_LINUX_DEFAULT=\\\"\" c \"\\\"\" }\n"
+    "    /console=ttyS0/ { serial = 1 }\n"
+    "    { line[++n] = $0 }\n"
+    "    END {\n"
+    "      for (i = 1; i <= n; i++) {\n"
+    "        if (!serial && line[i] ~ /^GRUB_CMDLINE_LINUX=/) line[i] = \"GRUB_CMDLINE_LINUX=\\\"\" c \"\\\"\"\n"
+    "        print line[i]\n"
+    "      }\n"
+    "      print \"GRUB_TERMINAL=\\\"console serial\\\"\"\n"
+    "      print \"GRUB_SERIAL_COMMAND=\\\"serial --speed=115200 --unit=0 --word=8 --parity=no --stop=1\\\"\"\n"
+    "      print \"GRUB_TERMINAL_OUTPUT=\\\"console serial\\\"\"\n"
+    "    }' /etc/default/grub > /etc/default/grub.vmware2scw.tmp && "
+    "  mv /etc/default/grub.vmware2scw.tmp /etc/default/grub; "
+    "fi"
+)
+
+# Copy the distro's EFI loader to the removable-media path (Scaleway NVRAM is
+# empty). One find over /boot/efi/EFI instead of stat'ing a fixed list of
+# distro paths; shimx64.efi sorts before grubx64.efi so shim is preferred.
+UEFI_FALLBACK_CMD = (
+    "if [ -d /boot/efi/EFI ]; then "
+    "  src=$(find /boot/efi/EFI -mindepth 2 -maxdepth 2 -not -path '/boot/efi/EFI/BOOT/*' "
+    "        \\( -name shimx64.efi -o -name grubx64.efi \\) -printf '%f %p\\n' "
+    "        | sort -r | head -n1 | cut -d' ' -f2-); "
+    "  if [ -n \"$src\" ]; then "
+    "    mkdir -p /boot/efi/EFI/BOOT; "
+    "    cp \"$src\" /boot/efi/EFI/BOOT/BOOTX64.EFI; "
+    "    echo \"Copied $src to BOOTX64.EFI\"; "
+    "  fi; "
+    "fi"
+)
+
+
+def _run_script_in_appliance(boot_disk: str, script: str) -> None:
+    """Run a shell script in the guest through an in-process guestfs handle.
+
+    Same effect as `virt-customize --run`, without the virt-customize
+    process: the image is inspected, its filesystems mounted, and the
+    script uploaded, run and removed. Failures are logged, not raised
+    (like check=False on the virt-customize call).
+    """
+    g = guestfs.GuestFS(python_return_dict=True)
+    try:
+        g.set_backend("direct")
+        g.set_memsize(APPLIANCE_MEMSIZE)
+        g.set_smp(APPLIANCE_SMP)
+        g.add_drive_opts(boot_disk, format="qcow2", readonly=0)
+        g.launch()
 
+        roots = g.inspect_os()
+        if not roots:
+            logger.warning(f"  No operating system found in {boot_disk} — guest not adapted")
+            return
+        mountpoints = g.inspect_get_mountpoints(roots[0])
+        for mountpoint in sorted(mountpoints, key=len):
+            try:
+                g.mount(mountpoints[mountpoint], mountpoint)
+            except RuntimeError as e:
+                logger.warning(f"  Could not mount {mountpoint}: {e}")
 
-def _run(cmd, check=True, **kw):
-    logger.debug(f"  $ {' '.join(str(c) for c in cmd[:6])}...")
-    r = subprocess.run(cmd, capture_output=True, text=True, env=GUESTFS_ENV, **kw)
-    if check and r.returncode != 0:
-        err = r.stderr.strip()[-500:] if r.stderr else f"exit {r.returncode}"
-        raise RuntimeError(f"Command failed: {' '.join(str(c) for c in cmd[:4])}\n{err}")
-    return r
+        g.write(GUEST_SCRIPT, script)
+        g.chmod(0o755, GUEST_SCRIPT)
+        try:
+            g.sh(GUEST_SCRIPT)
+        except RuntimeError as e:
+            logger.warning(f"  Guest adaptation script reported errors: {str(e)[-500:]}")
+        g.rm_f(GUEST_SCRIPT)
+
+        g.umount_all()
+        g.shutdown()
+    finally:
+        g.close()
 
 
 def adapt_linux_guest(boot_disk: str | Path, skip_uefi_fallback: bool = False) -> None:
@@ -48,45 +135,43 @@ def adapt_linux_guest(boot_disk: str | Path, skip_uefi_fallback: bool = False) -
     boot_disk = str(boot_disk)
     logger.info("Adapting Linux guest (unified virt-customize)...")
 
-    commands = []
+    # Every step goes into one guest script: one shell instead of a
+    # --run-command (fork/exec + log entry) per step
+    script_parts = ["#!/bin/sh"]
 
     # ═══ 1. Clean VMware tools ═══
-    # Try all package managers (only the relevant one will succeed)
-    commands += [
-        "--run-command",
-        "apt-get remove -y open-vm-tools open-vm-tools-desktop 2>/dev/null || true",
-        "--run-command",
-        "yum remove -y open-vm-tools open-vm-tools-desktop 2>/dev/null || true",
-        "--run-command",
-        "dnf remove -y open-vm-tools open-vm-tools-desktop 2>/dev/null || true",
-        "--run-command",
-        "zypper remove -y open-vm-tools open-vm-tools-desktop 2>/dev/null || true",
+    # Only the guest's own package manager runs (yum and dnf share the rpm
+    # lock, so they can't simply be tried concurrently)
+    script_parts += [
+        "for pm in apt-get dnf yum zypper; do "
+        "  if command -v $pm >/dev/null 2>&1; then "
+        "    $pm remove -y open-vm-tools open-vm-tools-desktop 2>/dev/null || true; "
+        "    break; "
+        "  fi; "
+        "done",
         # Remove manual VMware tools installations
-        "--run-command",
         "rm -rf /etc/vmware-tools /usr/lib/vmware-tools 2>/dev/null || true",
         # Remove VMware udev rules
-        "--run-command",
         "rm -f /etc/udev/rules.d/*vmware* /etc/udev/rules.d/99-vmware-scsi-udev.rules 2>/dev/null || true",
         # Disable VMware services
-        "--run-command",
         "systemctl disable vmtoolsd.service vmware-tools.service 2>/dev/null || true",
     ]
 
     # ═══ 2. Inject VirtIO modules into initramfs ═══
     # Debian/Ubuntu path
-    commands += [
-        "--run-command",
+    script_parts += [
+        # Shell builtins only (read/case/echo): no grep fork per module
         "if command -v update-initramfs >/dev/null 2>&1; then "
+        "  have=' '; "
+        "  while read -r m _; do have=\"$have$m \"; done < /etc/initramfs-tools/modules 2>/dev/null; "
         "  for mod in virtio_blk virtio_scsi virtio_net virtio_pci; do "
-        "    grep -q $mod /etc/initramfs-tools/modules 2>/dev/null || "
-        "    echo $mod >> /etc/initramfs-tools/modules; "
+        "    case \"$have\" in *\" $mod \"*) ;; *) echo $mod >> /etc/initramfs-tools/modules ;; esac; "
         "  done; "
         "  update-initramfs -u; "
         "fi",
     ]
     # RHEL/CentOS/Rocky path
-    commands += [
-        "--run-command",
+    script_parts += [
         "if command -v dracut >/dev/null 2>&1; then "
         "  dracut --force --add-drivers 'virtio_blk virtio_scsi virtio_net virtio_pci' 2>/dev/null || true; "
         "fi",
@@ -94,45 +179,22 @@ def adapt_linux_guest(boot_disk: str | Path, skip_uefi_fallback: bool = False) -
 
     # ═══ 3. Fix bootloader for KVM ═══
     # 3a. Fix fstab: /dev/sd* → /dev/vd*
-    commands += [
-        "--run-command",
+    script_parts += [
         "if [ -f /etc/fstab ]; then "
         "  cp /etc/fstab /etc/fstab.vmware2scw.bak; "
         "  sed -i 's|/dev/sda|/dev/vda|g; s|/dev/sdb|/dev/vdb|g; s|/dev/sdc|/dev/vdc|g' /etc/fstab; "
         "fi",
     ]
-    # 3b. Fix GRUB device references
-    commands += [
-        "--run-command",
-        "if [ -f /etc/default/grub ]; then "
-        "  cp /etc/default/grub /etc/default/grub.vmware2scw.bak; "
-        "  sed -i 's|/dev/sda|/dev/vda|g' /etc/default/grub; "
-        "fi",
-    ]
-    # 3c. Configure serial console for Scaleway
-    commands += [
-        "--run-command",
-        "if [ -f /etc/default/grub ]; then "
-        "  sed -i '/^GRUB_TERMINAL_OUTPUT=/d; /^GRUB_TERMINAL=/d; /^GRUB_SERIAL_COMMAND=/d; "
-        "/^GRUB_GFXMODE=/d; /^GRUB_GFXPAYLOAD_LINUX=/d' /etc/default/grub; "
-        "  echo 'GRUB_TERMINAL=\"console serial\"' >> /etc/default/grub; "
-        "  echo 'GRUB_SERIAL_COMMAND=\"serial --speed=115200 --unit=0 --word=8 --parity=no --stop=1\"' >> /etc/default/grub; "
-        "  echo 'GRUB_TERMINAL_OUTPUT=\"console serial\"' >> /etc/default/grub; "
-        "  sed -i 's/^GRUB_CMDLINE_LINUX_DEFAULT=.*/GRUB_CMDLINE_LINUX_DEFAULT=\"console=tty1 console=ttyS0,115200n8\"/' /etc/default/grub; "
-        "  grep -q 'console=ttyS0' /etc/default/grub || "
-        "    sed -i 's/^GRUB_CMDLINE_LINUX=.*/GRUB_CMDLINE_LINUX=\"console=tty1 console=ttyS0,115200n8\"/' /etc/default/grub; "
-        "fi",
-    ]
+    # 3b+3c. GRUB device references and serial console for Scaleway
+    script_parts.append(GRUB_DEFAULTS_CMD)
     # 3d. Fix device.map
-    commands += [
-        "--run-command",
+    script_parts += [
         "if [ -f /boot/grub/device.map ]; then "
         "  sed -i 's|/dev/sda|/dev/vda|g' /boot/grub/device.map; "
         "fi",
     ]
     # 3e. Regenerate GRUB config
-    commands += [
-        "--run-command",
+    script_parts += [
         "if command -v grub-mkconfig >/dev/null 2>&1; then "
         "  grub-mkconfig -o /boot/grub/grub.cfg 2>/dev/null || true; "
         "elif command -v grub2-mkconfig >/dev/null 2>&1; then "
@@ -141,21 +203,18 @@ def adapt_linux_guest(boot_disk: str | Path, skip_uefi_fallback: bool = False) -
     ]
 
     # ═══ 4. Remove VMware SCSI modprobe configs ═══
-    commands += [
-        "--run-command",
+    script_parts += [
         "rm -f /etc/modprobe.d/*vmw* /etc/modprobe.d/*vmware* 2>/dev/null || true",
     ]
 
     # ═══ 5. Clean persistent net rules ═══
-    commands += [
-        "--run-command",
+    script_parts += [
         "rm -f /etc/udev/rules.d/70-persistent-net.rules "
         "/etc/udev/rules.d/75-persistent-net-generator.rules 2>/dev/null || true",
     ]
 
     # ═══ 6. Configure network (DHCP) ═══
-    commands += [
-        "--run-command",
+    script_parts += [
         "if [ -d /etc/netplan ]; then "
         "  cat > /etc/netplan/50-cloud-init.yaml << 'NETPLAN'\n"
         "network:\n"
@@ -177,30 +236,31 @@ def adapt_linux_guest(boot_disk: str | Path, skip_uefi_fallback: bool = False) -
 
     # ═══ 7. UEFI fallback boot path (for VMs already UEFI) ═══
     if not skip_uefi_fallback:
-        commands += [
-            "--run-command",
-            "if [ -d /boot/efi/EFI ]; then "
-            "  mkdir -p /boot/efi/EFI/BOOT; "
-            "  for src in "
-            "    /boot/efi/EFI/ubuntu/shimx64.efi /boot/efi/EFI/ubuntu/grubx64.efi "
-            "    /boot/efi/EFI/debian/shimx64.efi /boot/efi/EFI/debian/grubx64.efi "
-            "    /boot/efi/EFI/centos/shimx64.efi /boot/efi/EFI/centos/grubx64.efi "
-            "    /boot/efi/EFI/fedora/shimx64.efi /boot/efi/EFI/fedora/grubx64.efi "
-            "    /boot/efi/EFI/rocky/shimx64.efi /boot/efi/EFI/rocky/grubx64.efi "
-            "    /boot/efi/EFI/almalinux/shimx64.efi /boot/efi/EFI/almalinux/grubx64.efi "
-            "    /boot/efi/EFI/rhel/shimx64.efi /boot/efi/EFI/rhel/grubx64.efi "
-            "    /boot/efi/EFI/sles/grubx64.efi /boot/efi/EFI/opensuse/grubx64.efi; do "
-            "    if [ -f \"$src\" ]; then "
-            "      cp \"$src\" /boot/efi/EFI/BOOT/BOOTX64.EFI; "
-            "      echo \"Copied $src to BOOTX64.EFI\"; "
-            "      break; "
-            "    fi; "
-            "  done; "
-            "fi",
-        ]
+        script_parts.append(UEFI_FALLBACK_CMD)
+
+    # No `set -e`: a failing step (e.g. wrong package manager) does not stop
+    # the following ones
+    script_text = "\n\n".join(script_parts) + "\n"
+
+    if guestfs is not None:
+        # ═══ Execute in-process (one appliance, no virt-customize) ═══
+        _run_script_in_appliance(boot_disk, script_text)
+        logger.info("Linux guest adaptation complete (guestfs)")
+        return
 
     # ═══ Execute single virt-customize call ═══
-    cmd = ["virt-customize", "-a", boot_disk] + commands
-    _run(cmd, check=False)  # check=False: some commands may fail (e.g. wrong package manager)
+    # --run uploads the script, runs it and removes it
+    with tempfile.NamedTemporaryFile("w", suffix=".sh", prefix="adapt-") as script:
+        script.write(script_text)
+        script.flush()
+        cmd = [
+            "virt-customize", "-a", boot_disk,
+            # More RAM and vCPUs for update-initramfs / dracut in the appliance
+            "--memsize", str(APPLIANCE_MEMSIZE),
+            "--smp", str(APPLIANCE_SMP),
+            "--run", script.name,
+        ]
+        # Streamed: virt-customize logs every step, only the stderr tail is kept
+        run_streamed(cmd, env={"LIBGUESTFS_BACKEND": "direct"}, check=False)  # some commands may fail
 
     logger.info("Linux guest adaptation complete (single virt-customize call)")
\ No newline at end of file
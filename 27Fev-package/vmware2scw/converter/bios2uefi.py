@@ -2,7 +2,16 @@
 
 Scaleway instances use UEFI firmware. VMware VMs often use BIOS/MBR.
 
-Strategy (qemu-nbd 6.2 workaround):
+Strategy (qemu-nbd >= 7.0):
+1. Create a qcow2 overlay backed by the disk, resize it +200MB
+2. Export the overlay on a free /dev/nbdN with qemu-nbd
+3. Fix GPT backup header / convert MBR with sgdisk on /dev/nbdN
+4. Create ESP partition via sgdisk on /dev/nbdN
+5. Format /dev/nbdNpM as FAT32 with mkfs.vfat
+6. qemu-img commit the overlay (only the changed clusters) into the disk
+7. Install grub-efi inside guest via virt-customize (guest-side)
+
+Fallback (qemu-nbd 6.2 workaround):
 1. Convert qcow2 → raw (sgdisk cannot work via qemu-nbd on QEMU 6.2)
 2. Resize raw +200MB
 3. Fix GPT backup header with sgdisk -e on raw file
@@ -12,71 +21,181 @@ Strategy (qemu-nbd 6.2 workaround):
 7. Install grub-efi inside guest via virt-customize (guest-side)
 """
 
+import functools
 import json
 import logging
 import os
-import shutil
+import re
+import struct
 import subprocess
 import time
 from pathlib import Path
+from typing import Optional
+
+from vmware2scw.utils.nbd import connect_nbd, disconnect_nbd
+from vmware2scw.utils.subprocess import move_sparse, run_streamed
+
+try:  # libguestfs Python binding (python3-guestfs), optional
+    import guestfs
+except ImportError:
+    guestfs = None
 
 logger = logging.getLogger(__name__)
 
 ENV = {"LIBGUESTFS_BACKEND": "direct"}
+BASE_ENV = {**os.environ, **ENV}  # merged once, not per command
 
+SECTOR_SIZE = 512  # raw images: logical sector size of the GPT
+NBD_MIN_VERSION = (7, 0)  # sgdisk over qemu-nbd is broken on QEMU 6.2
 
-def _run(cmd, check=True, env_override=None, **kwargs):
-    """Run a command, optionally raise on failure."""
+
+def _run(cmd, check=True, env_override=None, capture_stderr=True, **kwargs):
+    """Run a command, optionally raise on failure.
+
+    stdout is always captured. capture_stderr=False discards stderr at the
+    pipe, for callers that only parse stdout.
+    """
     logger.info(f"  $ {' '.join(cmd)}")
-    run_env = {**os.environ, **ENV}
-    if env_override:
-        run_env.update(env_override)
+    run_env = {**BASE_ENV, **env_override} if env_override else BASE_ENV
     result = subprocess.run(
-        cmd, capture_output=True, text=True,
-        env=run_env, **kwargs,
+        cmd, stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE if capture_stderr else subprocess.DEVNULL,
+        text=True, env=run_env, **kwargs,
     )
     if check and result.returncode != 0:
-        raise RuntimeError(
-            f"Command failed ({' '.join(cmd[:4])}): "
-            f"{result.stderr.strip()[-500:]}"
-        )
+        err = result.stderr.strip()[-500:] if result.stderr else f"exit {result.returncode}"
+        raise RuntimeError(f"Command failed ({' '.join(cmd[:4])}): {err}")
     return result
 
 
+def _run_streamed(cmd, check=True):
+    """_run() for commands whose output is not parsed: constant memory.
+
+    stdout is discarded and only the stderr tail is kept, so long-running
+    tools (qemu-img, virt-customize) are not buffered in full.
+    """
+    logger.info(f"  $ {' '.join(cmd)}")
+    return run_streamed(cmd, env=ENV, check=check)
+
+
+ESP_GUID = "C12A7328-F81F-11D2-BA4B-00A0C93EC93B"
+GPT_PROBE_PARTITIONS = 9  # partitions checked for the ESP type GUID
+
+
+def _probe_script(inspect: bool) -> list[str]:
+    """guestfish commands for detect_boot_type, one "@@section" per query.
+
+    Queries are prefixed with "-" so a failing one (missing partition,
+    non-GPT disk) does not end the session.
+    """
+    cmds = [] if inspect else [["run"]]
+    cmds += [["echo", "@@parttype"], ["-part-get-parttype", "/dev/sda"]]
+    for part_num in range(1, GPT_PROBE_PARTITIONS + 1):
+        cmds += [["echo", f"@@gpt{part_num}"], ["-part-get-gpt-type", "/dev/sda", str(part_num)]]
+    if inspect:
+        cmds += [["echo", "@@mountpoints"], ["-mountpoints"]]
+    script: list[str] = []
+    for cmd in cmds:
+        script += [*cmd, ":"]
+    return script[:-1]
+
+
+def _probe_disk_guestfs(qcow2_path: str) -> dict[str, list[str]]:
+    """_probe_disk() through the guestfs binding.
+
+    GPT types are only queried for the partitions part_list() reports,
+    not for every number up to GPT_PROBE_PARTITIONS.
+    """
+    g = guestfs.GuestFS(python_return_dict=True)
+    try:
+        g.set_backend("direct")
+        g.add_drive_opts(qcow2_path, format="qcow2", readonly=1)
+        g.launch()
+        part_type = g.part_get_parttype("/dev/sda")
+        sections = {"parttype": [part_type]}
+        if part_type == "gpt":
+            for part in g.part_list("/dev/sda"):
+                num = part["part_num"]
+                sections[f"gpt{num}"] = [g.part_get_gpt_type("/dev/sda", num)]
+        roots = g.inspect_os()
+        if roots:
+            mountpoints = g.inspect_get_mountpoints(roots[0])
+            sections["mountpoints"] = [f"{dev}: {mp}" for mp, dev in mountpoints.items()]
+        return sections
+    except RuntimeError as e:
+        logger.warning(f"Boot type probe failed: {e}")
+        return {}
+    finally:
+        g.close()
+
+
+def _probe_disk(qcow2_path: str) -> dict[str, list[str]]:
+    """Run every detect_boot_type query in one guestfish session.
+
+    One appliance boot instead of one per query. The session inspects and
+    mounts the guest (-i) for the mountpoints query; if no OS is found it
+    is retried once without inspection. Uses the guestfs binding instead
+    when it is installed.
+    """
+    if guestfs is not None:
+        return _probe_disk_guestfs(qcow2_path)
+
+    for inspect in (True, False):
+        result = subprocess.run(
+            ["guestfish", "--ro", "-a", qcow2_path, *(["-i"] if inspect else []),
+             "--", *_probe_script(inspect)],
+            capture_output=True, text=True,
+            env=BASE_ENV,
+        )
+        sections: dict[str, list[str]] = {}
+        current = None
+        for line in result.stdout.splitlines():
+            if line.startswith("@@"):
+                current = sections.setdefault(line[2:].strip(), [])
+            elif current is not None and line.strip():
+                current.append(line.strip())
+        if "parttype" in sections:
+            return sections
+    return {}
+
+
 def detect_boot_type(qcow2_path: str) -> str:
     """Detect if disk uses BIOS or UEFI boot.
 
+    The result is cached per (path, mtime, size): the pipeline and
+    convert_bios_to_uefi() both ask about the same unchanged image, and
+    each probe boots an appliance.
+
     Returns: 'uefi', 'bios-gpt', or 'bios-mbr'
     """
-    result = subprocess.run(
-        ["guestfish", "--ro", "-a", qcow2_path, "--",
-         "run", ":", "part-get-parttype", "/dev/sda"],
-        capture_output=True, text=True,
-        env={**os.environ, **ENV},
-    )
-    part_type = result.stdout.strip()
+    try:
+        st = os.stat(qcow2_path)
+    except OSError:
+        return _detect_boot_type(qcow2_path)
+    return _detect_boot_type_cached(qcow2_path, st.st_mtime_ns, st.st_size)
+
+
+@functools.lru_cache(maxsize=32)
+def _detect_boot_type_cached(qcow2_path: str, mtime_ns: int, size: int) -> str:
+    return _detect_boot_type(qcow2_path)
+
+
+def _detect_boot_type(qcow2_path: str) -> str:
+    sections = _probe_disk(qcow2_path)
+    part_type = " ".join(sections.get("parttype", []))
 
     if part_type == "gpt":
-        for part_num in range(1, 10):
-            res = subprocess.run(
-                ["guestfish", "--ro", "-a", qcow2_path, "--",
-                 "run", ":", "part-get-gpt-type", "/dev/sda", str(part_num)],
-                capture_output=True, text=True,
-                env={**os.environ, **ENV},
-            )
-            guid = res.stdout.strip().upper()
-            if guid == "C12A7328-F81F-11D2-BA4B-00A0C93EC93B":
+        # Only partitions that exist have a GUID
+        gpt_types = sorted(
+            (int(name[3:]), " ".join(lines).upper())
+            for name, lines in sections.items() if name.startswith("gpt") and lines
+        )
+        for part_num, guid in gpt_types:
+            if guid == ESP_GUID:
                 logger.info(f"Found EFI System Partition at partition {part_num}")
                 return "uefi"
-            if res.returncode != 0:
-                break
 
-        result4 = subprocess.run(
-            ["guestfish", "--ro", "-a", qcow2_path, "-i", "--", "mountpoints"],
-            capture_output=True, text=True,
-            env={**os.environ, **ENV},
-        )
-        if "/boot/efi" in result4.stdout:
+        if "/boot/efi" in "\n".join(sections.get("mountpoints", [])):
             return "uefi"
 
         return "bios-gpt"
@@ -88,42 +207,187 @@ def detect_boot_type(qcow2_path: str) -> str:
 
 
 def _setup_loop(raw_path: str, offset: int = 0, sizelimit: int = 0) -> str:
-    """Setup a loop device for a raw file or partition. Returns /dev/loopN."""
+    """Setup a loop device for a raw file or partition. Returns /dev/loopN.
+
+    Attached with direct I/O so writes (mkfs.vfat) are not cached twice,
+    once for the loop device and once for the backing file. util-linux
+    versions without --direct-io get a plain loop device.
+    """
     cmd = ["losetup", "--find", "--show"]
     if offset:
         cmd += ["--offset", str(offset)]
     if sizelimit:
         cmd += ["--sizelimit", str(sizelimit)]
-    cmd.append(raw_path)
-    result = _run(cmd)
+    try:
+        result = _run(cmd + ["--sector-size", "512", "--direct-io=on", raw_path])
+    except RuntimeError as e:
+        logger.info(f"  losetup without direct I/O ({e})")
+        result = _run(cmd + [raw_path])
     loop_dev = result.stdout.strip()
     logger.info(f"  Loop device: {loop_dev}")
     return loop_dev
 
 
+def _convert_image(src: str, src_fmt: str, dst: str, dst_fmt: str):
+    """qemu-img convert with 16 coroutines and host cache bypassed.
+
+    cache=none on both ends keeps the copy out of the page cache, which the
+    next steps need for the guest image. Filesystems without O_DIRECT
+    (tmpfs) get the default cache mode. Out-of-order writes (-W) only for
+    raw output: on qcow2 they fragment the cluster layout.
+    """
+    cmd = ["qemu-img", "convert", "-m", "16"]
+    if dst_fmt == "raw":
+        cmd.append("-W")
+    cmd += ["-f", src_fmt, "-O", dst_fmt, src, dst]
+    try:
+        _run_streamed(cmd[:2] + ["-t", "none", "-T", "none"] + cmd[2:])
+    except RuntimeError as e:
+        logger.info(f"  qemu-img convert without cache=none ({e})")
+        _run_streamed(cmd)
+
+
 def _teardown_loop(loop_dev: str):
     """Detach a loop device."""
-    _run(["losetup", "--detach", loop_dev], check=False)
+    _run_streamed(["losetup", "--detach", loop_dev], check=False)
 
 
-def convert_bios_to_uefi(qcow2_path: str, os_family: str = "linux") -> bool:
-    """Convert a BIOS disk to UEFI boot. Returns True if conversion was done.
+@functools.lru_cache(maxsize=None)
+def _qemu_nbd_version() -> Optional[tuple[int, int]]:
+    """Installed qemu-nbd (major, minor), or None if missing/unparsable."""
+    try:
+        result = _run(["qemu-nbd", "--version"], check=False, capture_stderr=False)
+    except FileNotFoundError:
+        return None
+    match = re.search(r"(\d+)\.(\d+)", result.stdout)
+    return (int(match.group(1)), int(match.group(2))) if match else None
 
-    Uses raw intermediate file for partition operations to avoid
-    qemu-nbd bugs on QEMU 6.2 (Ubuntu 22.04).
-    """
-    boot_type = detect_boot_type(qcow2_path)
-    logger.info(f"Detected boot type: {boot_type}")
 
-    if boot_type == "uefi":
-        logger.info("Disk already has UEFI boot — no conversion needed")
-        return False
+def _read_gpt_entry(raw_path: str, part_num: int) -> tuple[int, int]:
+    """(first sector, size in sectors) of a partition, read from the GPT.
 
-    if os_family == "windows":
-        logger.warning("Windows BIOS→UEFI not supported in fallback mode")
+    Parses the primary GPT header (LBA 1) and the partition entry array of
+    a raw image directly: no sgdisk run, no locale-dependent text.
+    """
+    with open(raw_path, "rb") as f:
+        f.seek(SECTOR_SIZE)
+        header = f.read(92)
+        if header[:8] != b"EFI PART":
+            raise RuntimeError(f"No GPT header found in {raw_path}")
+        entries_lba, entry_count, entry_size = struct.unpack_from("<QII", header, 72)
+        if not 1 <= part_num <= entry_count:
+            raise RuntimeError(f"Partition {part_num} outside the GPT entry array ({entry_count} entries)")
+        f.seek(entries_lba * SECTOR_SIZE + (part_num - 1) * entry_size)
+        entry = f.read(entry_size)
+    first_lba, last_lba = struct.unpack_from("<QQ", entry, 32)
+    if first_lba == 0 or last_lba < first_lba:
+        raise RuntimeError(f"GPT entry {part_num} is empty in {raw_path}")
+    return first_lba, last_lba - first_lba + 1
+
+
+def _gpt_backup_ok(target: str) -> bool:
+    """Whether the primary GPT header already points at the last sector.
+
+    Reads the header's alternate-LBA field (offset 32); `target` may be a
+    raw file or a block device.
+    """
+    with open(target, "rb") as f:
+        f.seek(SECTOR_SIZE)
+        header = f.read(92)
+        last_lba = f.seek(0, os.SEEK_END) // SECTOR_SIZE - 1
+    if header[:8] != b"EFI PART":
         return False
+    (alternate_lba,) = struct.unpack_from("<Q", header, 32)
+    return alternate_lba == last_lba
 
-    ESP_SIZE_MB = 200
+
+def _make_esp(target: str, boot_type: str, esp_size_mb: int) -> int:
+    """Convert `target` (raw file or block device) to GPT and append the ESP.
+
+    Returns the ESP partition number.
+    """
+    if boot_type == "bios-gpt":
+        if _gpt_backup_ok(target):
+            logger.info("GPT backup header already at end of disk")
+        else:
+            logger.info("Fixing GPT backup header...")
+            _run_streamed(["sgdisk", "-e", target])
+    elif boot_type == "bios-mbr":
+        logger.info("Converting MBR → GPT...")
+        _run_streamed(["sgdisk", "--mbrtogpt", target])
+
+    # Find last partition, create ESP after it
+    result = _run(["sgdisk", "-p", target])
+    lines = [l for l in result.stdout.split('\n')
+             if l.strip() and l.strip()[0].isdigit()]
+    if not lines:
+        raise RuntimeError("No partitions found on disk")
+    last_part = int(lines[-1].split()[0])
+    new_part = last_part + 1
+    logger.info(f"Last partition: {last_part}, creating ESP as partition {new_part}")
+
+    _run_streamed([
+        "sgdisk",
+        f"-n{new_part}:0:+{esp_size_mb}M",
+        f"-t{new_part}:EF00",
+        f"-c{new_part}:EFI-System",
+        target,
+    ])
+    logger.info(f"Created ESP partition {new_part}")
+    return new_part
+
+
+def _add_esp_via_nbd(qcow2_path: str, boot_type: str, esp_size_mb: int) -> int:
+    """Add and format the ESP through a qemu-nbd block device.
+
+    No image copies: the partition work goes to a qcow2 overlay backed by
+    the original, exported on a free /dev/nbdN, and `qemu-img commit` writes
+    only the changed clusters (GPT + ESP, a few MB) back into the original,
+    growing it to the overlay's size. Until the commit the original is
+    untouched, so a failure leaves it as it was.
+    Needs qemu-nbd >= 7.0 (see NBD_MIN_VERSION).
+    """
+    logger.info("=== Phase 1: Partition operations over NBD ===")
+    overlay = qcow2_path + ".esp.qcow2"
+    _run_streamed(["qemu-img", "create", "-f", "qcow2", "-F", "qcow2",
+                   "-b", os.path.abspath(qcow2_path), overlay])
+    try:
+        _run_streamed(["qemu-img", "resize", "-f", "qcow2", overlay, f"+{esp_size_mb}M"])
+        logger.info(f"Resized overlay by +{esp_size_mb}MB")
+
+        device = connect_nbd(overlay, "--format=qcow2")
+        try:
+            new_part = _make_esp(device, boot_type, esp_size_mb)
+
+            # Re-read the partition table so /dev/nbdNpM appears
+            _run_streamed(["partprobe", device], check=False)
+            esp_dev = f"{device}p{new_part}"
+            deadline = time.monotonic() + 10
+            while not Path(esp_dev).exists():
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"ESP device {esp_dev} did not appear after partprobe")
+                time.sleep(0.2)
+
+            logger.info(f"Formatting {esp_dev} as FAT32...")
+            _run_streamed(["mkfs.vfat", "-F", "32", "-n", "ESP", esp_dev])
+        finally:
+            disconnect_nbd(device)
+
+        logger.info("Committing partition changes into the original image...")
+        _run_streamed(["qemu-img", "commit", "-f", "qcow2", overlay])
+    finally:
+        Path(overlay).unlink(missing_ok=True)
+
+    return new_part
+
+
+def _add_esp_via_raw(qcow2_path: str, boot_type: str, esp_size_mb: int) -> int:
+    """Add and format the ESP through a raw copy of the image.
+
+    qemu-nbd < 7.0 fallback: sgdisk cannot work via qemu-nbd on QEMU 6.2,
+    so the image goes qcow2 → raw → qcow2. The original is only replaced
+    once every step succeeded.
+    """
     raw_path = qcow2_path + ".raw"
 
     try:
@@ -132,55 +396,20 @@ def convert_bios_to_uefi(qcow2_path: str, os_family: str = "linux") -> bool:
 
         # Step 1: qcow2 → raw
         logger.info("Converting qcow2 → raw for partition operations...")
-        _run(["qemu-img", "convert", "-f", "qcow2", "-O", "raw",
-              qcow2_path, raw_path])
+        _convert_image(qcow2_path, "qcow2", raw_path, "raw")
 
         # Step 2: Resize raw to add ESP space
-        _run(["qemu-img", "resize", "-f", "raw", raw_path, f"+{ESP_SIZE_MB}M"])
-        logger.info(f"Resized raw by +{ESP_SIZE_MB}MB")
+        _run_streamed(["qemu-img", "resize", "-f", "raw", raw_path, f"+{esp_size_mb}M"])
+        logger.info(f"Resized raw by +{esp_size_mb}MB")
 
-        # Step 3: Fix GPT / convert MBR
-        if boot_type == "bios-gpt":
-            logger.info("Fixing GPT backup header...")
-            _run(["sgdisk", "-e", raw_path])
-        elif boot_type == "bios-mbr":
-            logger.info("Converting MBR → GPT...")
-            _run(["sgdisk", "--mbrtogpt", raw_path])
-
-        # Step 4: Find last partition, create ESP
-        result = _run(["sgdisk", "-p", raw_path])
-        lines = [l for l in result.stdout.split('\n')
-                 if l.strip() and l.strip()[0].isdigit()]
-        if not lines:
-            raise RuntimeError("No partitions found on disk")
-        last_part = int(lines[-1].split()[0])
-        new_part = last_part + 1
-        logger.info(f"Last partition: {last_part}, creating ESP as partition {new_part}")
-
-        _run([
-            "sgdisk",
-            f"-n{new_part}:0:+{ESP_SIZE_MB}M",
-            f"-t{new_part}:EF00",
-            f"-c{new_part}:EFI-System",
-            raw_path,
-        ])
-        logger.info(f"Created ESP partition {new_part}")
+        # Steps 3-4: GPT fix / MBR→GPT, then the ESP partition
+        new_part = _make_esp(raw_path, boot_type, esp_size_mb)
 
         # Step 5: Format ESP as FAT32 via losetup
-        # Get partition offset and size from sgdisk output
-        result = _run(["sgdisk", "-i", str(new_part), raw_path])
-        part_start = None
-        part_size = None
-        for line in result.stdout.split('\n'):
-            if "First sector:" in line:
-                part_start = int(line.split(":")[1].strip().split()[0])
-            if "Partition size:" in line:
-                part_size = int(line.split(":")[1].strip().split()[0])
-
-        if part_start is None or part_size is None:
-            raise RuntimeError(f"Could not determine ESP partition geometry from sgdisk -i output")
-
-        sector_size = 512
+        # Partition offset and size straight from the GPT just written
+        part_start, part_size = _read_gpt_entry(raw_path, new_part)
+
+        sector_size = SECTOR_SIZE
         offset = part_start * sector_size
         sizelimit = part_size * sector_size
 
@@ -190,20 +419,19 @@ def convert_bios_to_uefi(qcow2_path: str, os_family: str = "linux") -> bool:
         loop_dev = _setup_loop(raw_path, offset=offset, sizelimit=sizelimit)
         try:
             logger.info(f"Formatting {loop_dev} as FAT32...")
-            _run(["mkfs.vfat", "-F", "32", "-n", "ESP", loop_dev])
+            _run_streamed(["mkfs.vfat", "-F", "32", "-n", "ESP", loop_dev])
         finally:
             _teardown_loop(loop_dev)
 
         # Step 6: Convert raw → qcow2 (uncompressed — virt-customize needs it)
         logger.info("Converting raw → qcow2 (uncompressed)...")
         qcow2_new = qcow2_path + ".new"
-        _run(["qemu-img", "convert", "-f", "raw", "-O", "qcow2",
-              raw_path, qcow2_new])
+        _convert_image(raw_path, "raw", qcow2_new, "qcow2")
 
         # Replace original
         Path(raw_path).unlink()
         Path(qcow2_path).unlink()
-        shutil.move(qcow2_new, qcow2_path)
+        move_sparse(qcow2_new, qcow2_path)
         logger.info("Raw → qcow2 conversion done, original replaced")
 
     except Exception:
@@ -213,17 +441,49 @@ def convert_bios_to_uefi(qcow2_path: str, os_family: str = "linux") -> bool:
                 Path(p).unlink(missing_ok=True)
         raise
 
+    return new_part
+
+
+def convert_bios_to_uefi(qcow2_path: str, os_family: str = "linux") -> bool:
+    """Convert a BIOS disk to UEFI boot. Returns True if conversion was done.
+
+    With qemu-nbd >= 7.0 the partition work is done over NBD on an overlay;
+    older versions use a raw intermediate file to avoid qemu-nbd bugs on
+    QEMU 6.2 (Ubuntu 22.04).
+    """
+    boot_type = detect_boot_type(qcow2_path)
+    logger.info(f"Detected boot type: {boot_type}")
+
+    if boot_type == "uefi":
+        logger.info("Disk already has UEFI boot — no conversion needed")
+        return False
+
+    if os_family == "windows":
+        logger.warning("Windows BIOS→UEFI not supported in fallback mode")
+        return False
+
+    ESP_SIZE_MB = 200
+
+    version = _qemu_nbd_version()
+    if version and version >= NBD_MIN_VERSION:
+        logger.info(f"qemu-nbd {'.'.join(map(str, version))}: partitioning over NBD")
+        new_part = _add_esp_via_nbd(qcow2_path, boot_type, ESP_SIZE_MB)
+    else:
+        new_part = _add_esp_via_raw(qcow2_path, boot_type, ESP_SIZE_MB)
+
     # ── Phase 2: Install GRUB EFI inside guest ──
     logger.info("=== Phase 2: Guest-side GRUB EFI installation ===")
 
     grub_script = _build_grub_efi_script(new_part)
 
-    _run([
+    _run_streamed([
         "virt-customize", "-a", qcow2_path,
         "--install", "grub-efi-amd64,grub-efi-amd64-bin,dosfstools",
         "--run-command", grub_script,
     ])
 
+    # The image changed; don't rely on mtime granularity to notice
+    _detect_boot_type_cached.cache_clear()
     logger.info("BIOS → UEFI conversion complete")
     return True
 
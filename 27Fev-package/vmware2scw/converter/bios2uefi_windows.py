@@ -24,6 +24,9 @@ import subprocess
 import time
 from pathlib import Path
 
+from vmware2scw.utils.nbd import connect_nbd, disconnect_nbd
+from vmware2scw.utils.subprocess import move_sparse
+
 logger = logging.getLogger(__name__)
 
 GUESTFS_ENV = {**os.environ, "LIBGUESTFS_BACKEND": "direct"}
@@ -108,29 +111,26 @@ def _convert_partition_table(qcow2_path, esp_size_mb):
             logger.info("  Converting MBR → GPT...")
 
             # Try qemu-nbd + sgdisk on host
-            _run(["modprobe", "nbd", "max_part=16"], check=False, env=None)
-            _run(["qemu-nbd", "--disconnect", "/dev/nbd0"], check=False, env=None)
-            time.sleep(1)
-            _run(["qemu-nbd", "--connect", "/dev/nbd0", qcow2_path], env=None)
+            nbd_dev = connect_nbd(qcow2_path)  # a free device: other VMs may use NBD too
             time.sleep(2)
 
             try:
                 # Convert MBR to GPT
-                r = _run(["sgdisk", "--mbrtogpt", "/dev/nbd0"], check=False, env=None)
+                r = _run(["sgdisk", "--mbrtogpt", nbd_dev], check=False, env=None)
                 if r.returncode != 0:
                     logger.warning(f"  sgdisk --mbrtogpt failed: {r.stderr.strip()[:200]}")
                     # Try gdisk as fallback
-                    r2 = _run(["sgdisk", "-g", "/dev/nbd0"], check=False, env=None)
+                    r2 = _run(["sgdisk", "-g", nbd_dev], check=False, env=None)
                     if r2.returncode != 0:
                         logger.error("  GPT conversion failed")
                         return False
 
                 # Re-read partitions
-                _run(["partprobe", "/dev/nbd0"], check=False, env=None)
+                _run(["partprobe", nbd_dev], check=False, env=None)
                 time.sleep(1)
 
                 # Find last partition number
-                r = _run(["sgdisk", "-p", "/dev/nbd0"], env=None)
+                r = _run(["sgdisk", "-p", nbd_dev], env=None)
                 lines = [l for l in r.stdout.split('\n')
                          if l.strip() and l.strip()[0].isdigit()]
                 if not lines:
@@ -146,15 +146,15 @@ def _convert_partition_table(qcow2_path, esp_size_mb):
                     f"-n{new_part}:0:+{esp_size_mb}M",
                     f"-t{new_part}:EF00",
                     f"-c{new_part}:EFI-System",
-                    "/dev/nbd0",
+                    nbd_dev,
                 ], env=None)
 
                 # Re-read partitions
-                _run(["partprobe", "/dev/nbd0"], check=False, env=None)
+                _run(["partprobe", nbd_dev], check=False, env=None)
                 time.sleep(1)
 
                 # Format ESP as FAT32
-                esp_dev = f"/dev/nbd0p{new_part}"
+                esp_dev = f"{nbd_dev}p{new_part}"
                 if not Path(esp_dev).exists():
                     time.sleep(2)
                 if Path(esp_dev).exists():
@@ -163,7 +163,7 @@ def _convert_partition_table(qcow2_path, esp_size_mb):
                 else:
                     logger.warning(f"  ESP device {esp_dev} not found, will format via guestfish")
                     # Format via guestfish after disconnect
-                    _run(["qemu-nbd", "--disconnect", "/dev/nbd0"], check=False, env=None)
+                    disconnect_nbd(nbd_dev)
                     time.sleep(1)
                     _run(["guestfish", "-a", qcow2_path, "--",
                           "run", ":",
@@ -171,23 +171,20 @@ def _convert_partition_table(qcow2_path, esp_size_mb):
                     return True
 
             finally:
-                _run(["qemu-nbd", "--disconnect", "/dev/nbd0"], check=False, env=None)
+                disconnect_nbd(nbd_dev)
                 time.sleep(1)
 
         elif part_type == "gpt":
             # Already GPT, just need to add ESP
             logger.info("  Disk is already GPT, adding ESP partition...")
-            _run(["modprobe", "nbd", "max_part=16"], check=False, env=None)
-            _run(["qemu-nbd", "--disconnect", "/dev/nbd0"], check=False, env=None)
-            time.sleep(1)
-            _run(["qemu-nbd", "--connect", "/dev/nbd0", qcow2_path], env=None)
+            nbd_dev = connect_nbd(qcow2_path)  # a free device: other VMs may use NBD too
             time.sleep(2)
 
             try:
                 # Fix GPT backup header after resize
-                _run(["sgdisk", "-e", "/dev/nbd0"], env=None)
+                _run(["sgdisk", "-e", nbd_dev], env=None)
 
-                r = _run(["sgdisk", "-p", "/dev/nbd0"], env=None)
+                r = _run(["sgdisk", "-p", nbd_dev], env=None)
                 lines = [l for l in r.stdout.split('\n')
                          if l.strip() and l.strip()[0].isdigit()]
                 last_part = int(lines[-1].split()[0]) if lines else 0
@@ -198,18 +195,18 @@ def _convert_partition_table(qcow2_path, esp_size_mb):
                     f"-n{new_part}:0:+{esp_size_mb}M",
                     f"-t{new_part}:EF00",
                     f"-c{new_part}:EFI-System",
-                    "/dev/nbd0",
+                    nbd_dev,
                 ], env=None)
 
-                _run(["partprobe", "/dev/nbd0"], check=False, env=None)
+                _run(["partprobe", nbd_dev], check=False, env=None)
                 time.sleep(1)
 
-                esp_dev = f"/dev/nbd0p{new_part}"
+                esp_dev = f"{nbd_dev}p{new_part}"
                 if Path(esp_dev).exists():
                     _run(["mkfs.vfat", "-F", "32", "-n", "ESP", esp_dev], env=None)
 
             finally:
-                _run(["qemu-nbd", "--disconnect", "/dev/nbd0"], check=False, env=None)
+                disconnect_nbd(nbd_dev)
                 time.sleep(1)
 
         logger.info("  Partition table conversion OK")
@@ -369,7 +366,7 @@ def _qemu_bcdboot(qcow2_path, work_dir, timeout=600):
         merged = work_dir / "merged-bcdboot.qcow2"
         _run(["qemu-img", "convert", "-O", "qcow2",
               str(overlay), str(merged)], env=None)
-        shutil.move(str(merged), str(qcow2_path))
+        move_sparse(str(merged), str(qcow2_path))
 
     overlay.unlink(missing_ok=True)
 
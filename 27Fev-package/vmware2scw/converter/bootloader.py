@@ -18,7 +18,8 @@ GUESTFS_ENV = {**os.environ, "LIBGUESTFS_BACKEND": "direct"}
 
 
 def _run(cmd, check=True, **kw):
-    logger.debug(f"  $ {' '.join(str(c) for c in cmd)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("  $ %s", " ".join(str(c) for c in cmd))
     r = subprocess.run(cmd, capture_output=True, text=True, env=GUESTFS_ENV, **kw)
     if check and r.returncode != 0:
         err = r.stderr.strip()[-500:] if r.stderr else f"exit {r.returncode}"
@@ -7,7 +7,7 @@ import shutil
 from pathlib import Path
 
 from vmware2scw.utils.logging import get_logger
-from vmware2scw.utils.subprocess import run_command
+from vmware2scw.utils.subprocess import QEMU_IMG_PROGRESS, run_command
 
 logger = get_logger(__name__)
 
@@ -90,7 +90,7 @@ class DiskConverter:
         # Execute conversion
         result = run_command(
             cmd,
-            progress_pattern=r"\((\d+\.\d+)/100%\)",
+            progress_pattern=QEMU_IMG_PROGRESS,
             progress_callback=progress_callback,
         )
 
@@ -186,11 +186,13 @@ class VMwareToolsCleaner:
     is more complex and may require firstboot scripts.
     """
 
-    def __init__(self):
+    def __init__(self, guestfs_env: dict[str, str] | None = None):
         if not shutil.which("virt-customize"):
             raise RuntimeError(
                 "virt-customize not found. Install with: apt-get install libguestfs-tools"
             )
+        # Extra env for virt-customize (e.g. LIBGUESTFS_PATH of a fixed appliance)
+        self.guestfs_env = guestfs_env or {"LIBGUESTFS_BACKEND": "direct"}
 
     def clean(self, disk_path: str | Path, os_family: str = "linux") -> None:
         """Clean VMware tools from a disk image.
@@ -230,7 +232,7 @@ class VMwareToolsCleaner:
         ]
 
         cmd = ["virt-customize", "-a", str(disk_path)] + commands
-        run_command(cmd, env={"LIBGUESTFS_BACKEND": "direct"})
+        run_command(cmd, env=self.guestfs_env)
         logger.info("VMware tools cleanup complete (Linux)")
 
     def _clean_windows(self, disk_path: str | Path) -> None:
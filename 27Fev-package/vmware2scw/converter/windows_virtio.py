@@ -30,6 +30,9 @@ import tempfile
 import time
 from pathlib import Path
 
+from vmware2scw.utils.nbd import connect_nbd, disconnect_nbd
+from vmware2scw.utils.subprocess import move_sparse
+
 logger = logging.getLogger(__name__)
 
 GUESTFS_ENV = {**os.environ, "LIBGUESTFS_BACKEND": "direct"}
@@ -133,23 +136,17 @@ def _fix_ntfs_dirty(qcow2_path):
     converting to uncompressed first.
     """
     logger.info("  Clearing NTFS dirty flags...")
-    subprocess.run(["modprobe", "nbd", "max_part=8"], capture_output=True)
-    subprocess.run(["qemu-nbd", "--disconnect", "/dev/nbd0"], capture_output=True)
-    time.sleep(1)
-
-    r = subprocess.run(
-        ["qemu-nbd", "--connect", "/dev/nbd0", str(qcow2_path)],
-        capture_output=True, text=True,
-    )
-    if r.returncode != 0:
-        logger.warning(f"  qemu-nbd connect failed: {r.stderr.strip()[:200]}")
+    try:
+        nbd_dev = connect_nbd(str(qcow2_path))
+    except RuntimeError as e:
+        logger.warning(f"  qemu-nbd connect failed: {str(e)[:200]}")
         return False
 
     fixed = False
     try:
         time.sleep(2)  # Wait for partition table to be read
         for i in range(1, 8):
-            part = f"/dev/nbd0p{i}"
+            part = f"{nbd_dev}p{i}"
             if not Path(part).exists():
                 continue
             blkid = subprocess.run(
@@ -167,7 +164,7 @@ def _fix_ntfs_dirty(qcow2_path):
                 else:
                     logger.warning(f"  ntfsfix failed on {part}: {r2.stderr.strip()[:100]}")
     finally:
-        subprocess.run(["qemu-nbd", "--disconnect", "/dev/nbd0"], capture_output=True)
+        disconnect_nbd(nbd_dev)
         time.sleep(1)
 
     return fixed
@@ -178,7 +175,7 @@ def _decompress_qcow2(qcow2_path):
     logger.info("  Decompressing qcow2 (compressed images cause I/O errors with nbd)...")
     tmp = str(qcow2_path) + ".uncomp"
     _run(["qemu-img", "convert", "-O", "qcow2", str(qcow2_path), tmp], env=None)
-    shutil.move(tmp, str(qcow2_path))
+    move_sparse(tmp, str(qcow2_path))
     logger.info("  Decompressed OK")
 
 
@@ -512,7 +509,7 @@ def _phase2_qemu_boot(qcow2_path, work_dir, timeout=QEMU_BOOT_TIMEOUT):
         merged = work_dir / "merged.qcow2"
         _run(["qemu-img", "convert", "-O", "qcow2",
               str(overlay), str(merged)], env=None)
-        shutil.move(str(merged), str(qcow2_path))
+        move_sparse(str(merged), str(qcow2_path))
         logger.info("  Full merge completed")
 
     overlay.unlink(missing_ok=True)
@@ -634,7 +631,7 @@ def _phase3_dual_boot(qcow2_path, work_dir, timeout=PHASE3_TIMEOUT):
         merged = work_dir / "merged-phase3.qcow2"
         _run(["qemu-img", "convert", "-O", "qcow2",
               str(overlay), str(merged)], env=None)
-        shutil.move(str(merged), str(qcow2_path))
+        move_sparse(str(merged), str(qcow2_path))
         logger.info("  Full merge completed")
 
     overlay.unlink(missing_ok=True)
@@ -20,6 +20,8 @@ import subprocess
 import time
 from pathlib import Path
 
+from vmware2scw.utils.subprocess import move_sparse
+
 logger = logging.getLogger(__name__)
 
 GUESTFS_ENV = {**os.environ, "LIBGUESTFS_BACKEND": "direct"}
@@ -235,7 +237,7 @@ def _phase2_merged_qemu_boot(
         merged = work_dir / "merged.qcow2"
         _run(["qemu-img", "convert", "-O", "qcow2",
               str(overlay), str(merged)], env=None)
-        shutil.move(str(merged), str(qcow2_path))
+        move_sparse(str(merged), str(qcow2_path))
         logger.info("  Full merge completed")
 
     overlay.unlink(missing_ok=True)
@@ -655,11 +655,14 @@ class BatchOrchestrator:
         # Acquire resource-specific semaphore
         sem = self._get_stage_semaphore(job, stage)
 
-        if sem:
-            async with sem:
+        try:
+            if sem:
+                async with sem:
+                    await asyncio.to_thread(pipeline._execute_stage, stage, plan, migration_state)
+            else:
                 await asyncio.to_thread(pipeline._execute_stage, stage, plan, migration_state)
-        else:
-            await asyncio.to_thread(pipeline._execute_stage, stage, plan, migration_state)
+        finally:
+            pipeline.close()  # release the vCenter session opened by this stage, if any
 
         # Copy artifacts back to job
         job.artifacts = dict(migration_state.artifacts)
@@ -667,14 +670,11 @@ class BatchOrchestrator:
         # Update job metadata from validate results
         if stage == "validate":
             vm_info = job.artifacts.get("vm_info", {})
-            guest_os = vm_info.get("guest_os", "")
             job.firmware = vm_info.get("firmware", "bios")
             job.esxi_host = vm_info.get("host", "")
             job.total_disk_gb = vm_info.get("total_disk_gb", 0)
-            if "win" in guest_os.lower():
-                job.os_family = "windows"
-            else:
-                job.os_family = "linux"
+            # Computed once by the validate stage (MigrationPipeline._os_family)
+            job.os_family = pipeline._os_family(migration_state)
 
     def _get_stage_semaphore(self, job: VMJob, stage: str) -> asyncio.Semaphore | None:
         """Get the appropriate semaphore for a pipeline stage."""
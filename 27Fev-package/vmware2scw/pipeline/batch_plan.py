@@ -34,6 +34,11 @@ from typing import Any, Optional
 import yaml
 from pydantic import BaseModel, Field, field_validator, model_validator
 
+try:  # libyaml-backed C implementation when available
+    from yaml import CSafeDumper as _Dumper, CSafeLoader as _Loader
+except ImportError:
+    from yaml import SafeDumper as _Dumper, SafeLoader as _Loader
+
 
 # ═══════════════════════════════════════════════════════════════════
 #  Enums
@@ -195,7 +200,7 @@ class BatchPlan(BaseModel):
     def from_yaml(cls, path: str | Path) -> "BatchPlan":
         """Load a batch plan from YAML file."""
         with open(path) as f:
-            data = yaml.safe_load(f)
+            data = yaml.load(f, Loader=_Loader)
         return cls(**data)
 
     def to_yaml(self, path: str | Path) -> None:
@@ -207,7 +212,7 @@ class BatchPlan(BaseModel):
                 del data[key]
 
         with open(path, "w") as f:
-            yaml.dump(data, f, default_flow_style=False, sort_keys=False, allow_unicode=True)
+            yaml.dump(data, f, Dumper=_Dumper, default_flow_style=False, sort_keys=False, allow_unicode=True)
 
     def resolve_vms(self, all_vms: list[dict]) -> list[ResolvedVM]:
         """Resolve VM entries against actual inventory.
@@ -0,0 +1,150 @@
+"""Dependency-graph scheduler for pipeline stages.
+
+Each stage is declared as a Task with the names of the stages it depends
+on. DAGPipeline orders them with Kahn's algorithm (rejecting cycles) and
+dispatches every task whose dependencies are satisfied to a thread pool,
+so stages without an ordering constraint no longer block each other.
+
+Used by:
+  - migration.py: MigrationPipeline.run() / resume()
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Optional
+
+
+@dataclass
+class Task:
+    """A single schedulable unit of work.
+
+    Attributes:
+        name: Unique task name (pipeline stage name)
+        deps: Names of tasks that must complete before this one starts
+        fn: Callable executed in a worker thread
+    """
+    name: str
+    deps: set[str] = field(default_factory=set)
+    fn: Optional[Callable[[], None]] = None
+
+
+class TaskFailedError(RuntimeError):
+    """Raised by DAGPipeline.run() when a task raises.
+
+    The original exception is available as __cause__.
+    """
+
+    def __init__(self, task: str, error: BaseException):
+        super().__init__(str(error))
+        self.task = task
+
+
+class DAGPipeline:
+    """Topological scheduler running independent tasks concurrently.
+
+    Usage:
+        dag = DAGPipeline([
+            Task("export", set(), export_fn),
+            Task("convert", {"export"}, convert_fn),
+        ])
+        dag.run(completed={"export"})   # only convert runs
+    """
+
+    def __init__(self, tasks: Iterable[Task]):
+        self.tasks: dict[str, Task] = {}
+        for task in tasks:
+            if task.name in self.tasks:
+                raise ValueError(f"Duplicate task '{task.name}'")
+            self.tasks[task.name] = task
+
+        for task in self.tasks.values():
+            unknown = task.deps - self.tasks.keys()
+            if unknown:
+                raise ValueError(f"Task '{task.name}' depends on unknown task(s): {', '.join(sorted(unknown))}")
+
+        self._order = self._topological_order()
+
+    def _topological_order(self) -> list[str]:
+        """Kahn's algorithm — preserves declaration order among ready tasks."""
+        indegree = {name: len(task.deps) for name, task in self.tasks.items()}
+        dependents: dict[str, list[str]] = {name: [] for name in self.tasks}
+        for task in self.tasks.values():
+            for dep in task.deps:
+                dependents[dep].append(task.name)
+
+        queue = deque(name for name, deg in indegree.items() if deg == 0)
+        order: list[str] = []
+        while queue:
+            name = queue.popleft()
+            order.append(name)
+            for child in dependents[name]:
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    queue.append(child)
+
+        if len(order) != len(self.tasks):
+            cyclic = sorted(n for n, deg in indegree.items() if deg > 0)
+            raise ValueError(f"Dependency cycle between tasks: {', '.join(cyclic)}")
+        return order
+
+    def order(self) -> list[str]:
+        """Task names in a valid sequential execution order."""
+        return list(self._order)
+
+    def run(
+        self,
+        completed: Iterable[str] = (),
+        max_workers: Optional[int] = None,
+        on_start: Optional[Callable[[str], None]] = None,
+        on_complete: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        """Execute all tasks not already in `completed`.
+
+        A task is dispatched as soon as all of its deps are complete.
+        Callbacks run on the calling thread, so they may update shared
+        state without extra locking.
+
+        On the first failure no new task is started; tasks already running
+        are allowed to finish, then TaskFailedError is raised.
+        """
+        done = set(completed) & self.tasks.keys()
+        pending = [name for name in self._order if name not in done]
+        if not pending:
+            return
+
+        workers = max_workers or len(pending)
+        running: dict[Future, str] = {}
+        failure: Optional[TaskFailedError] = None
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stage") as pool:
+            while pending or running:
+                if failure is None:
+                    ready = [n for n in pending if self.tasks[n].deps <= done]
+                    for name in ready:
+                        pending.remove(name)
+                        if on_start:
+                            on_start(name)
+                        fn = self.tasks[name].fn or (lambda: None)
+                        running[pool.submit(fn)] = name
+
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        if failure is None:
+                            failure = TaskFailedError(name, error)
+                            failure.__cause__ = error
+                        continue
+                    done.add(name)
+                    if on_complete:
+                        on_complete(name)
+
+        if failure is not None:
+            raise failure
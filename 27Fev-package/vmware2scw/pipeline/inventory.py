@@ -21,6 +21,7 @@ Usage:
 from __future__ import annotations
 
 import fnmatch
+import functools
 import re
 from dataclasses import dataclass, field
 from datetime import datetime
@@ -36,6 +37,12 @@ logger = get_logger(__name__)
 #  Filter Engine
 # ═══════════════════════════════════════════════════════════════════
 
+@functools.lru_cache(maxsize=64)
+def _glob_re(patterns: tuple[str, ...]) -> re.Pattern:
+    """Compile a set of glob patterns (OR) into one regex, once per set."""
+    return re.compile("|".join(fnmatch.translate(p) for p in patterns))
+
+
 @dataclass
 class InventoryFilter:
     """Parsed filter criteria for VM inventory."""
@@ -138,7 +145,7 @@ class InventoryFilter:
 
         # Name patterns (OR)
         if self.name_patterns:
-            if not any(fnmatch.fnmatch(name, p) for p in self.name_patterns):
+            if not _glob_re(tuple(self.name_patterns)).match(name):
                 return False
 
         # Name regex (OR)
@@ -160,17 +167,17 @@ class InventoryFilter:
 
         # OS ID patterns (OR)
         if self.os_patterns:
-            if not any(fnmatch.fnmatch(guest_os, p.lower()) for p in self.os_patterns):
+            if not _glob_re(tuple(p.lower() for p in self.os_patterns)).match(guest_os):
                 return False
 
         # Hosts (OR)
         if self.hosts:
-            if not any(fnmatch.fnmatch(host, h) for h in self.hosts):
+            if not _glob_re(tuple(self.hosts)).match(host):
                 return False
 
         # Clusters (OR)
         if self.clusters:
-            if not any(fnmatch.fnmatch(cluster, c) for c in self.clusters):
+            if not _glob_re(tuple(self.clusters)).match(cluster):
                 return False
 
         # Datacenters (OR)
@@ -6,23 +6,56 @@ v2.0 — Optimized pipeline:
   - Windows: Phase 2+3 QEMU merged, serial monitoring, reduced timeouts (~500s saved)
   - fix_network stage removed from pipeline (was NOOP for both Linux and Windows)
   - Bug fix: guestfish --rw/-ro inconsistency in Windows UEFI fallback
+
+v3.0 — Stages scheduled from a dependency graph (pipeline/dag.py)
 """
 
 from __future__ import annotations
 
+import copy
+import errno
+import functools
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
 import time
+import urllib.request
 import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 
 from vmware2scw.config import AppConfig, VMMigrationPlan
+from vmware2scw.converter.adapt_guest import GRUB_DEFAULTS_CMD, UEFI_FALLBACK_CMD
+from vmware2scw.converter.disk import DiskConverter, VMwareToolsCleaner
+from vmware2scw.pipeline.dag import DAGPipeline, Task, TaskFailedError
 from vmware2scw.pipeline.state import MigrationState, MigrationStateStore
+from vmware2scw.scaleway.mapping import ResourceMapper
 from vmware2scw.utils.logging import get_logger
+from vmware2scw.utils.nbd import connect_nbd, disconnect_nbd
+from vmware2scw.utils.subprocess import run_command
+from vmware2scw.vmware.client import VSphereClient
+from vmware2scw.vmware.inventory import VMInventory
 
 logger = get_logger(__name__)
 
+_MISSING = object()
+
+# virt-v2v helper for Windows guests, installed once per host by _ensure_rhsrvany()
+RHSRVANY_PATH = Path("/usr/share/virt-tools/rhsrvany.exe")
+_rhsrvany_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=1)
+def _rhsrvany_installed() -> bool:
+    """Whether rhsrvany.exe is present — stat'ed once per process."""
+    return RHSRVANY_PATH.exists()
+
 
 @dataclass
 class MigrationResult:
@@ -46,8 +79,8 @@ class MigrationPipeline:
     Linux pipeline (9 stages, was 13):
       1. validate       — Pre-flight compatibility checks
       2. snapshot       — Create VMware snapshot for consistency
-      3. export         — Export VMDK disks from VMware
-      4. convert        — Convert VMDK → qcow2
+      3. export         — Export VMDK disks from VMware (each converted as it lands)
+      4. convert        — Convert any VMDK left → qcow2 (resume)
       5. adapt_guest    — Unified: clean VMware tools + inject VirtIO + fix bootloader + configure network
       6. ensure_uefi    — Convert BIOS→UEFI if needed
       7. upload_s3      — Upload qcow2 to Scaleway Object Storage
@@ -58,8 +91,8 @@ class MigrationPipeline:
     Windows pipeline (10 stages, was 13):
       1. validate       — Pre-flight compatibility checks
       2. snapshot       — Create VMware snapshot for consistency
-      3. export         — Export VMDK disks from VMware
-      4. convert        — Convert VMDK → qcow2
+      3. export         — Export VMDK disks from VMware (each converted as it lands)
+      4. convert        — Convert any VMDK left → qcow2 (resume)
       5. clean_tools    — Remove VMware tools from guest
       6. inject_virtio  — Phase 1 offline + merged Phase 2+3 QEMU boot (v2: serial monitoring)
       7. fix_bootloader — Adapt bootloader for KVM
@@ -70,37 +103,45 @@ class MigrationPipeline:
      12. cleanup        — Remove temporary files, snapshots
 
     Each stage is idempotent and can be resumed after failure.
+
+    v3 — Stages are declared as a dependency graph (STAGE_GRAPH_*) and
+    scheduled by DAGPipeline: a stage starts as soon as every stage it
+    depends on has completed, so independent stages run concurrently.
     """
 
-    # v2: Separate stage lists per OS family
-    STAGES_LINUX = [
-        "validate",
-        "snapshot",
-        "export",
-        "convert",
-        "adapt_guest",       # NEW v2: replaces clean_tools + inject_virtio + fix_bootloader + fix_network
-        "ensure_uefi",
-        "upload_s3",
-        "import_scw",
-        "verify",
-        "cleanup",
-    ]
-
-    STAGES_WINDOWS = [
-        "validate",
-        "snapshot",
-        "export",
-        "convert",
-        "clean_tools",
-        "inject_virtio",     # v2: merged Phase 2+3 with serial monitoring
-        "fix_bootloader",
-        "ensure_uefi",       # v2: fixed guestfish --rw/-ro bug
+    # v3: Stage dependency graphs per OS family (stage → stages it depends on).
+    # Declaration order is the sequential order used for display and ties.
+    STAGE_GRAPH_LINUX: dict[str, set[str]] = {
+        "validate": set(),
+        "snapshot": {"validate"},
+        "export": {"snapshot"},
+        "convert": {"export"},
+        "adapt_guest": {"convert"},     # NEW v2: replaces clean_tools + inject_virtio + fix_bootloader + fix_network
+        "ensure_uefi": {"adapt_guest"},
+        "upload_s3": {"ensure_uefi"},
+        "import_scw": {"upload_s3"},
+        "verify": {"import_scw"},
+        "cleanup": {"verify"},
+    }
+
+    STAGE_GRAPH_WINDOWS: dict[str, set[str]] = {
+        "validate": set(),
+        "snapshot": {"validate"},
+        "export": {"snapshot"},
+        "convert": {"export"},
+        "clean_tools": {"convert"},
+        "inject_virtio": {"clean_tools"},     # v2: merged Phase 2+3 with serial monitoring
+        "fix_bootloader": {"inject_virtio"},
+        "ensure_uefi": {"fix_bootloader"},    # v2: fixed guestfish --rw/-ro bug
         # fix_network removed (was NOOP)
-        "upload_s3",
-        "import_scw",
-        "verify",
-        "cleanup",
-    ]
+        "upload_s3": {"ensure_uefi"},
+        "import_scw": {"upload_s3"},
+        "verify": {"import_scw"},
+        "cleanup": {"verify"},
+    }
+
+    STAGES_LINUX = list(STAGE_GRAPH_LINUX)
+    STAGES_WINDOWS = list(STAGE_GRAPH_WINDOWS)
 
     # Legacy fallback (used before OS is detected)
     STAGES = STAGES_LINUX
@@ -108,14 +149,249 @@ class MigrationPipeline:
     def __init__(self, config: AppConfig):
         self.config = config
         self.state_store = MigrationStateStore(config.conversion.work_dir)
+        self._vsphere: Optional[VSphereClient] = None
+        self._vsphere_lock = threading.Lock()
+        self._guestfs_env: Optional[dict[str, str]] = None
+        self._guestfs_lock = threading.Lock()
+        self._commands_from_file: Optional[bool] = None  # virt-customize probe result
+
+        # Stage dispatch table: "convert" → self._stage_convert, built once
+        self._handlers: dict[str, Callable[[VMMigrationPlan, MigrationState], None]] = {
+            name[len("_stage_"):]: getattr(self, name)
+            for name in dir(self)
+            if name.startswith("_stage_")
+        }
+
+    def _get_vsphere(self) -> VSphereClient:
+        """Return the shared vCenter session, connecting on first use.
+
+        validate/snapshot/export/cleanup reuse one SOAP login per run
+        instead of connecting and disconnecting in every stage.
+        """
+        with self._vsphere_lock:
+            if self._vsphere is None:
+                client = VSphereClient()
+                pw = self.config.vmware.password.get_secret_value() if self.config.vmware.password else ""
+                client.connect(
+                    self.config.vmware.vcenter,
+                    self.config.vmware.username,
+                    pw,
+                    insecure=self.config.vmware.insecure,
+                )
+                self._vsphere = client
+            return self._vsphere
+
+    def close(self) -> None:
+        """Release the shared vCenter session, if any."""
+        with self._vsphere_lock:
+            if self._vsphere is not None:
+                self._vsphere.disconnect()
+                self._vsphere = None
+
+    def _ensure_guestfs_appliance(self) -> dict[str, str]:
+        """Return the env for libguestfs tools, building a fixed appliance once.
+
+        Every virt-customize / guestfish / virt-v2v call otherwise boots a
+        supermin appliance from scratch (~5-15s). The fixed appliance is
+        cached in work_dir/guestfs-appliance and shared by all stages and
+        later runs. If it cannot be built, falls back to the plain direct
+        backend. The appliance memory (LIBGUESTFS_MEMSIZE) is raised from
+        the 500MB default for every tool.
+        """
+        with self._guestfs_lock:
+            if self._guestfs_env is not None:
+                return self._guestfs_env
+
+            env = {
+                "LIBGUESTFS_BACKEND": "direct",
+                "LIBGUESTFS_MEMSIZE": str(self.config.conversion.guestfs_memsize),
+            }
+            appliance_dir = Path(self.config.conversion.work_dir) / "guestfs-appliance"
+            if not (appliance_dir / "root").exists() and shutil.which("libguestfs-make-fixed-appliance"):
+                logger.info(f"Building fixed libguestfs appliance in {appliance_dir} (one-time)...")
+                appliance_dir.mkdir(parents=True, exist_ok=True)
+                r = subprocess.run(
+                    ["libguestfs-make-fixed-appliance", str(appliance_dir)],
+                    capture_output=True, text=True,
+                )
+                if r.returncode != 0:
+                    logger.warning(f"Fixed appliance build failed: {r.stderr.strip()[:200]}")
+
+            if (appliance_dir / "root").exists():
+                env["LIBGUESTFS_PATH"] = str(appliance_dir)
+            else:
+                logger.debug("No fixed libguestfs appliance — using supermin per call")
+
+            self._guestfs_env = env
+            return env
+
+    def _supports_commands_from_file(self) -> bool:
+        """Whether the installed virt-customize accepts --commands-from-file (probed once)."""
+        if self._commands_from_file is None:
+            try:
+                r = subprocess.run(["virt-customize", "--help"], capture_output=True, text=True)
+                self._commands_from_file = "--commands-from-file" in r.stdout
+            except OSError:
+                self._commands_from_file = False
+        return self._commands_from_file
+
+    def _virt_customize_opts(self) -> list[str]:
+        """Appliance sizing for virt-customize; no guest network (nothing is downloaded)."""
+        smp = self.config.conversion.guestfs_smp or min(4, os.cpu_count() or 1)
+        return [
+            "--no-network",
+            "--memsize", str(self.config.conversion.guestfs_memsize),
+            "--smp", str(smp),
+        ]
+
+    def _virt_customize_cmd(self, disk: str | Path, args: list[str], cmds_file: Path) -> list[str]:
+        """Build a virt-customize command line from flag/value pairs.
+
+        When supported, the pairs are written to `cmds_file` and passed with
+        --commands-from-file (parsed once, one operation per line); otherwise
+        they are passed as regular flags.
+        """
+        base = ["virt-customize", "-a", str(disk)] + self._virt_customize_opts()
+        if not self._supports_commands_from_file():
+            return base + args
+
+        lines = []
+        for flag, value in zip(args[::2], args[1::2]):
+            # Multi-line values continue with a trailing backslash
+            lines.append(f"{flag.lstrip('-')} " + value.replace("\n", "\\\n"))
+        cmds_file.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        return base + ["--commands-from-file", str(cmds_file)]
+
+    def _run_guest_script(self, boot_disk: str | Path, commands: list[str], name: str, title: str) -> None:
+        """Run shell snippets inside the guest as one script (one virt-customize call).
+
+        The snippets are written to {disk dir}/{name}.sh, uploaded to /tmp
+        in the guest, executed with bash and removed.
+        """
+        script = Path(boot_disk).parent / f"{name}.sh"
+        script.write_text(
+            "#!/bin/bash\n"
+            f"# vmware2scw — {title} (generated)\n"
+            + "\n".join(commands) + "\n",
+            encoding="utf-8",
+        )
+        guest_script = f"/tmp/vmware2scw-{name.replace('_', '-')}.sh"
+        cmd = self._virt_customize_cmd(boot_disk, [
+            "--upload", f"{script}:{guest_script}",
+            "--run-command", f"bash {guest_script}; rm -f {guest_script}",
+        ], Path(boot_disk).parent / f"{name}.cmds")
+        run_command(cmd, env=self._ensure_guestfs_appliance(), check=False)
+
+    def _get_stage_graph(self, state: MigrationState) -> dict[str, set[str]]:
+        """Get the stage dependency graph based on detected OS family."""
+        if self._os_family(state) == "windows":
+            return self.STAGE_GRAPH_WINDOWS
+        return self.STAGE_GRAPH_LINUX
 
     def _get_stages(self, state: MigrationState) -> list[str]:
         """Get the appropriate stage list based on detected OS family."""
-        vm_info = state.artifacts.get("vm_info", {})
-        guest_os = vm_info.get("guest_os", "")
-        if "win" in guest_os.lower():
-            return self.STAGES_WINDOWS
-        return self.STAGES_LINUX
+        return list(self._get_stage_graph(state))
+
+    def _build_dag(
+        self,
+        graph: dict[str, set[str]],
+        plan: VMMigrationPlan,
+        state: MigrationState,
+        skip: Optional[set[str]] = None,
+    ) -> DAGPipeline:
+        """Build a DAGPipeline for `graph`, dropping stages in `skip`.
+
+        A dependency on a skipped stage is treated as satisfied.
+        """
+        skip = skip or set()
+        missing = graph.keys() - skip - self._handlers.keys()
+        if missing:
+            raise KeyError(f"Stage(s) not implemented: {', '.join(sorted(missing))}")
+        return DAGPipeline(
+            Task(
+                name=stage,
+                deps=deps - skip,
+                fn=lambda stage=stage: self._execute_stage(stage, plan, state),
+            )
+            for stage, deps in graph.items()
+            if stage not in skip
+        )
+
+    def _run_stages(
+        self,
+        plan: VMMigrationPlan,
+        state: MigrationState,
+        start_time: float,
+        skip: Optional[set[str]] = None,
+        resumed: bool = False,
+    ) -> Optional[MigrationResult]:
+        """Run every stage not yet in state.completed_stages.
+
+        Stages are dispatched as soon as their dependencies are complete.
+        validate runs on its own first because its result (the guest OS)
+        selects the Linux or Windows graph for the remaining stages.
+
+        Returns:
+            A failed MigrationResult, or None if all stages succeeded
+        """
+        skip = skip or set()
+        suffix = " (resumed)" if resumed else ""
+
+        # Artifacts as they were when each stage started, to journal only the delta
+        artifacts_before: dict[str, dict] = {}
+
+        def artifacts_delta(stage_name: str) -> dict:
+            before = artifacts_before.pop(stage_name, {})
+            return {k: v for k, v in state.artifacts.items() if before.get(k, _MISSING) != v}
+
+        def on_start(stage_name: str) -> None:
+            state.current_stage = stage_name
+            artifacts_before[stage_name] = copy.deepcopy(state.artifacts)
+            self.state_store.append_event(state.migration_id, {"stage": stage_name, "status": "start"})
+            logger.info(f"[cyan]▶ Stage: {stage_name}[/cyan]{suffix}")
+
+        def on_complete(stage_name: str) -> None:
+            state.mark_stage_complete(stage_name)
+            self.state_store.append_event(state.migration_id, {
+                "stage": stage_name,
+                "status": "complete",
+                "artifacts_delta": artifacts_delta(stage_name),
+            })
+            logger.info(f"[green]✓ Stage {stage_name} complete[/green]")
+
+        phases = []
+        if "validate" not in skip and not state.is_stage_complete("validate"):
+            phases.append(lambda: {"validate": set()})
+        phases.append(lambda: self._get_stage_graph(state))
+
+        for graph_for_phase in phases:
+            dag = self._build_dag(graph_for_phase(), plan, state, skip)
+            try:
+                dag.run(
+                    completed=state.completed_stages,
+                    on_start=on_start,
+                    on_complete=on_complete,
+                )
+            except TaskFailedError as e:
+                elapsed = time.time() - start_time
+                state.error = str(e)
+                self.state_store.save(state)  # snapshot + journal compaction
+                self.state_store.flush()
+
+                logger.error(f"[red]✗ Stage {e.task} failed: {e}[/red]")
+                return MigrationResult(
+                    success=False,
+                    migration_id=state.migration_id,
+                    vm_name=state.vm_name,
+                    failed_stage=e.task,
+                    error=str(e),
+                    duration=f"{elapsed:.0f}s",
+                    completed_stages=list(state.completed_stages),
+                )
+
+        self.state_store.save(state)  # snapshot + journal compaction
+        self.state_store.flush()
+        return None
 
     def run(self, plan: VMMigrationPlan) -> MigrationResult:
         """Execute a full migration for a single VM.
@@ -144,51 +420,16 @@ class MigrationPipeline:
         logger.info(f"[bold]Starting migration {migration_id}[/bold]: "
                      f"{plan.vm_name} → {plan.target_type} ({plan.zone})")
 
-        # v2: Start with Linux stages, switch after validate detects OS
-        stages_to_run = list(self.STAGES_LINUX)
-        if plan.skip_validation:
-            stages_to_run = [s for s in stages_to_run if s != "validate"]
-
-        idx = 0
-        while idx < len(stages_to_run):
-            stage_name = stages_to_run[idx]
-            state.current_stage = stage_name
-            self.state_store.save(state)
-
-            logger.info(f"[cyan]▶ Stage: {stage_name}[/cyan]")
+        skip = {"validate"} if plan.skip_validation else set()
+        try:
+            failed = self._run_stages(plan, state, start_time, skip=skip)
+        finally:
             try:
-                self._execute_stage(stage_name, plan, state)
-                state.completed_stages.append(stage_name)
-                self.state_store.save(state)
-                logger.info(f"[green]✓ Stage {stage_name} complete[/green]")
-
-                # v2: After validate, switch to the correct stage list for the detected OS
-                if stage_name == "validate":
-                    new_stages = self._get_stages(state)
-                    if plan.skip_validation:
-                        new_stages = [s for s in new_stages if s != "validate"]
-                    # Replace remaining stages but keep completed ones
-                    remaining_new = [s for s in new_stages if s not in state.completed_stages]
-                    stages_to_run = list(state.completed_stages) + remaining_new
-                    idx = len(state.completed_stages) - 1  # Will be incremented
-
-            except Exception as e:
-                elapsed = time.time() - start_time
-                state.error = str(e)
-                self.state_store.save(state)
-
-                logger.error(f"[red]✗ Stage {stage_name} failed: {e}[/red]")
-                return MigrationResult(
-                    success=False,
-                    migration_id=migration_id,
-                    vm_name=plan.vm_name,
-                    failed_stage=stage_name,
-                    error=str(e),
-                    duration=f"{elapsed:.0f}s",
-                    completed_stages=list(state.completed_stages),
-                )
-
-            idx += 1
+                self.state_store.flush()  # events queued before an escaping exception
+            finally:
+                self.close()
+        if failed:
+            return failed
 
         elapsed = time.time() - start_time
         logger.info(f"[bold green]Migration {migration_id} complete in {elapsed:.0f}s[/bold green]")
@@ -204,7 +445,7 @@ class MigrationPipeline:
         )
 
     def resume(self, migration_id: str) -> MigrationResult:
-        """Resume a failed migration from the last successful stage."""
+        """Resume a failed migration, re-running every stage not yet completed."""
         state = self.state_store.load(migration_id)
         if not state:
             raise ValueError(f"Migration '{migration_id}' not found")
@@ -218,9 +459,9 @@ class MigrationPipeline:
             zone=state.zone,
         )
 
-        # v2: Use the correct stage list based on detected OS
+        # v3: Ready stages are derived from the dependency graph + completed set
         all_stages = self._get_stages(state)
-        remaining = [s for s in all_stages if s not in state.completed_stages]
+        remaining = [s for s in all_stages if not state.is_stage_complete(s)]
         if not remaining:
             return MigrationResult(
                 success=True,
@@ -232,31 +473,15 @@ class MigrationPipeline:
         start_time = time.time()
         state.error = None
 
-        for stage_name in remaining:
-            state.current_stage = stage_name
-            self.state_store.save(state)
-
-            logger.info(f"[cyan]▶ Stage: {stage_name}[/cyan] (resumed)")
+        try:
+            failed = self._run_stages(plan, state, start_time, resumed=True)
+        finally:
             try:
-                self._execute_stage(stage_name, plan, state)
-                state.completed_stages.append(stage_name)
-                self.state_store.save(state)
-                logger.info(f"[green]✓ Stage {stage_name} complete[/green]")
-
-            except Exception as e:
-                state.error = str(e)
-                self.state_store.save(state)
-                elapsed = time.time() - start_time
-
-                return MigrationResult(
-                    success=False,
-                    migration_id=migration_id,
-                    vm_name=state.vm_name,
-                    failed_stage=stage_name,
-                    error=str(e),
-                    duration=f"{elapsed:.0f}s",
-                    completed_stages=list(state.completed_stages),
-                )
+                self.state_store.flush()  # events queued before an escaping exception
+            finally:
+                self.close()
+        if failed:
+            return failed
 
         elapsed = time.time() - start_time
         return MigrationResult(
@@ -269,6 +494,107 @@ class MigrationPipeline:
             completed_stages=list(state.completed_stages),
         )
 
+    # ─── Multi-VM driver ──────────────────────────────────────────────
+
+    def run_many(
+        self,
+        plans: list[VMMigrationPlan],
+        zone_quota: Optional[dict[str, int]] = None,
+        max_workers: Optional[int] = None,
+    ) -> list[MigrationResult]:
+        """Migrate several VMs, running non-conflicting plans concurrently.
+
+        Two plans conflict if they read from a common source datastore or
+        target a zone whose quota (zone_quota[zone]) is 1. Plans are grouped
+        into rounds of mutually independent plans; each round runs in a
+        thread pool and the next round starts once it has finished.
+
+        Each plan gets its own MigrationPipeline (and vCenter session), since
+        run() closes its session when done.
+
+        Returns:
+            One MigrationResult per plan, in the order of `plans`
+        """
+        if not plans:
+            return []
+
+        datastores = self._resolve_datastores(plans)
+        rounds = self._migration_rounds(plans, datastores, zone_quota or {})
+        results: list[Optional[MigrationResult]] = [None] * len(plans)
+
+        for round_no, indices in enumerate(rounds, 1):
+            names = ", ".join(plans[i].vm_name for i in indices)
+            logger.info(f"Migration round {round_no}/{len(rounds)}: {names}")
+            workers = min(len(indices), max_workers or len(indices))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="vm") as pool:
+                futures = {
+                    pool.submit(type(self)(self.config).run, plans[i]): i
+                    for i in indices
+                }
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        results[i] = future.result()
+                    except Exception as e:
+                        logger.error(f"Migration of '{plans[i].vm_name}' crashed: {e}")
+                        results[i] = MigrationResult(
+                            success=False,
+                            migration_id="",
+                            vm_name=plans[i].vm_name,
+                            error=str(e),
+                        )
+
+        return results
+
+    def _resolve_datastores(self, plans: list[VMMigrationPlan]) -> list[Optional[set[str]]]:
+        """Source datastores of each plan's VM (None if the lookup fails)."""
+        datastores: list[Optional[set[str]]] = [None] * len(plans)
+        try:
+            inv = VMInventory(self._get_vsphere())
+            for i, plan in enumerate(plans):
+                try:
+                    vm_info = inv.get_vm_info(plan.vm_name)
+                    datastores[i] = {d.datastore for d in vm_info.disks if d.datastore}
+                except Exception as e:
+                    logger.warning(f"Cannot resolve datastores for '{plan.vm_name}': {e}")
+        except Exception as e:
+            logger.warning(f"Cannot resolve source datastores, migrating one VM at a time: {e}")
+        finally:
+            self.close()
+        return datastores
+
+    @staticmethod
+    def _migration_rounds(
+        plans: list[VMMigrationPlan],
+        datastores: list[Optional[set[str]]],
+        zone_quota: dict[str, int],
+    ) -> list[list[int]]:
+        """Split plans into rounds of mutually non-conflicting plan indices.
+
+        Greedy maximal independent sets over the conflict graph, taking
+        plans in their given order. A plan whose datastores are unknown
+        (None) conflicts with every other plan, so it runs in a round of
+        its own.
+        """
+        def conflicts(a: int, b: int) -> bool:
+            if datastores[a] is None or datastores[b] is None:
+                return True
+            if datastores[a] & datastores[b]:
+                return True
+            zone = plans[a].zone
+            return zone == plans[b].zone and zone_quota.get(zone) == 1
+
+        remaining = list(range(len(plans)))
+        rounds: list[list[int]] = []
+        while remaining:
+            chosen: list[int] = []
+            for i in remaining:
+                if not any(conflicts(i, j) for j in chosen):
+                    chosen.append(i)
+            rounds.append(chosen)
+            remaining = [i for i in remaining if i not in chosen]
+        return rounds
+
     def dry_run(self, plan: VMMigrationPlan) -> None:
         """Simulate a migration without executing any stages."""
         logger.info(f"[yellow]DRY RUN for VM '{plan.vm_name}'[/yellow]")
@@ -292,9 +618,9 @@ class MigrationPipeline:
         Each stage method updates state.artifacts with any intermediate
         results (file paths, IDs, etc.) for use by subsequent stages.
         """
-        handler = getattr(self, f"_stage_{stage}", None)
+        handler = self._handlers.get(stage)
         if handler is None:
-            raise NotImplementedError(f"Stage '{stage}' not implemented yet")
+            raise KeyError(f"Stage '{stage}' not implemented")
         handler(plan, state)
 
     # ─── Stage implementations ───────────────────────────────────────
@@ -302,21 +628,13 @@ class MigrationPipeline:
     def _stage_validate(self, plan: VMMigrationPlan, state: MigrationState) -> None:
         """Pre-flight validation: check VM compatibility with target type."""
         from vmware2scw.pipeline.validator import MigrationValidator
-        from vmware2scw.vmware.client import VSphereClient
-        from vmware2scw.vmware.inventory import VMInventory
-
-        client = VSphereClient()
-        pw = self.config.vmware.password.get_secret_value() if self.config.vmware.password else ""
-        client.connect(
-            self.config.vmware.vcenter,
-            self.config.vmware.username,
-            pw,
-            insecure=self.config.vmware.insecure,
-        )
+
+        client = self._get_vsphere()
 
         inv = VMInventory(client)
         vm_info = inv.get_vm_info(plan.vm_name)
         state.artifacts["vm_info"] = vm_info.model_dump()
+        state.artifacts["os_family"], _ = ResourceMapper().get_os_family(vm_info.guest_os)
 
         # Log VM characteristics for debugging
         firmware = vm_info.firmware if hasattr(vm_info, 'firmware') else 'unknown'
@@ -332,8 +650,6 @@ class MigrationPipeline:
         validator = MigrationValidator()
         report = validator.validate(vm_info, plan.target_type)
 
-        client.disconnect()
-
         if not report.passed:
             failures = [c for c in report.checks if not c.passed and c.blocking]
             msg = "; ".join(f"{c.name}: {c.message}" for c in failures)
@@ -341,96 +657,249 @@ class MigrationPipeline:
 
     def _stage_snapshot(self, plan: VMMigrationPlan, state: MigrationState) -> None:
         """Create a VMware snapshot for consistent export."""
-        from vmware2scw.vmware.client import VSphereClient
         from vmware2scw.vmware.snapshot import SnapshotManager
 
-        client = VSphereClient()
-        pw = self.config.vmware.password.get_secret_value() if self.config.vmware.password else ""
-        client.connect(
-            self.config.vmware.vcenter,
-            self.config.vmware.username,
-            pw,
-            insecure=self.config.vmware.insecure,
-        )
+        client = self._get_vsphere()
 
         snap_mgr = SnapshotManager(client)
         snap_name = f"vmware2scw-{state.migration_id}"
         snap_mgr.create_migration_snapshot(plan.vm_name, snap_name)
         state.artifacts["snapshot_name"] = snap_name
 
-        client.disconnect()
-
     def _stage_export(self, plan: VMMigrationPlan, state: MigrationState) -> None:
-        """Export VMDK disks from VMware."""
-        from vmware2scw.vmware.client import VSphereClient
+        """Export VMDK disks from VMware, converting each one as it lands.
+
+        Export and conversion are fused: every VMDK is handed to a convert
+        worker as soon as its download finishes, and the VMDK is deleted once
+        its qcow2 exists. Conversion overlaps the next download and peak disk
+        usage drops to roughly one VMDK at a time. _stage_convert then only
+        finds already-converted disks (it still handles resumed migrations).
+
+        With conversion.streaming_upload, data disks are also uploaded to
+        S3 as soon as they are converted; _stage_upload_s3 then only sends
+        the (adapted) boot disk.
+        """
         from vmware2scw.vmware.export import VMExporter
 
         work_dir = self.config.conversion.work_dir / state.migration_id
         work_dir.mkdir(parents=True, exist_ok=True)
 
-        client = VSphereClient()
-        pw = self.config.vmware.password.get_secret_value() if self.config.vmware.password else ""
-        client.connect(
-            self.config.vmware.vcenter,
-            self.config.vmware.username,
-            pw,
-            insecure=self.config.vmware.insecure,
-        )
+        client = self._get_vsphere()
 
-        exporter = VMExporter(client)
-        vmdk_paths = exporter.export_vm_disks(plan.vm_name, work_dir)
-        state.artifacts["vmdk_paths"] = [str(p) for p in vmdk_paths]
+        converter = DiskConverter()
+        compress = self._qcow2_compress(state)
+        disk_count = len(state.artifacts.get("vm_info", {}).get("disks", [])) or 1
+        futures = []
+
+        # Data disks are final once converted (only the boot disk is adapted
+        # later), so with streaming_upload they go to S3 while export goes on.
+        s3 = bucket = None
+        if self.config.conversion.streaming_upload and disk_count > 1:
+            s3 = self._make_s3()
+            bucket = self.config.scaleway.s3_bucket
+            s3.create_bucket_if_not_exists(bucket)
+
+        with ThreadPoolExecutor(max_workers=self._convert_workers(disk_count),
+                                thread_name_prefix="convert") as pool:
+            def on_disk_exported(vmdk: Path) -> None:
+                if s3 is not None and futures:  # index > 0 → data disk
+                    futures.append(pool.submit(self._convert_and_upload_disk, converter, vmdk,
+                                               compress, s3, bucket, state))
+                else:
+                    futures.append(pool.submit(self._convert_disk, converter, vmdk, compress))
+
+            exporter = VMExporter(client)
+            vmdk_paths = exporter.export_vm_disks(
+                plan.vm_name, work_dir,
+                on_disk_exported=on_disk_exported,
+                already_exported=lambda vmdk: vmdk.with_suffix(".qcow2").exists(),
+            )
+            state.artifacts["vmdk_paths"] = [str(p) for p in vmdk_paths]
 
-        client.disconnect()
+            # Futures were submitted in export order → boot disk stays first
+            state.artifacts["qcow2_paths"] = [str(f.result()) for f in futures]
 
-    def _stage_convert(self, plan: VMMigrationPlan, state: MigrationState) -> None:
-        """Convert VMDK disks to qcow2 format."""
-        from vmware2scw.converter.disk import DiskConverter
-        from vmware2scw.scaleway.mapping import ResourceMapper
+    @staticmethod
+    def _os_family(state: MigrationState) -> str:
+        """"linux" or "windows", computed once (normally in validate) and cached in artifacts."""
+        os_family = state.artifacts.get("os_family")
+        if not os_family:
+            guest_os = state.artifacts.get("vm_info", {}).get("guest_os", "")
+            os_family, _ = ResourceMapper().get_os_family(guest_os)
+            state.artifacts["os_family"] = os_family
+        return os_family
 
-        converter = DiskConverter()
-        qcow2_paths = []
+    def _qcow2_compress(self, state: MigrationState) -> bool:
+        """Whether converted qcow2 images should be compressed for this VM."""
 
-        # Determine OS family for compression decision
-        mapper = ResourceMapper()
-        vm_info_dict = state.artifacts.get("vm_info", {})
-        guest_os = vm_info_dict.get("guest_os", "otherLinux64Guest")
-        os_family, _ = mapper.get_os_family(guest_os)
+        os_family = self._os_family(state)
 
         # Windows: do NOT compress — qemu-nbd has I/O errors on compressed qcow2
         # The image will be compressed later before upload if needed.
-        compress = self.config.conversion.compress_qcow2
         if os_family == "windows":
-            compress = False
             logger.info("Windows VM: disabling qcow2 compression (required for ntfsfix/qemu-nbd)")
+            return False
+        return self.config.conversion.compress_qcow2
+
+    def _convert_workers(self, disk_count: int) -> int:
+        """Number of concurrent qemu-img conversions for `disk_count` disks.
 
-        for vmdk_path in state.artifacts.get("vmdk_paths", []):
-            vmdk = Path(vmdk_path)
-            qcow2_path = vmdk.with_suffix(".qcow2")
+        Each disk is an independent qemu-img process — bound concurrency
+        so parallel conversions don't saturate the work volume.
+        """
+        workers = self.config.conversion.convert_parallelism or max(1, (os.cpu_count() or 2) // 2)
+        return max(1, min(disk_count, workers))
+
+    def _disk_workers(self, disk_count: int) -> int:
+        """Concurrent per-disk uploads / snapshot imports (conversion.disk_parallelism)."""
+        return max(1, min(disk_count, self.config.conversion.disk_parallelism or 2))
+
+    def _convert_disk(self, converter, vmdk: Path, compress: bool) -> Path:
+        """Convert one VMDK to qcow2 (unless already done) and delete the VMDK."""
+        qcow2_path = vmdk.with_suffix(".qcow2")
+
+        if qcow2_path.exists() and converter.check(qcow2_path):
+            logger.info(f"Skipping conversion (already exists): {qcow2_path.name}")
+        else:
+            converter.convert(vmdk, qcow2_path, compress=compress)
+
+        self._delete_vmdk(vmdk)
+        return qcow2_path
 
+    @staticmethod
+    def _delete_vmdk(vmdk: Path) -> None:
+        """Free disk space once a VMDK has been converted (one stat, no exists())."""
+        try:
+            size_mb = os.stat(vmdk).st_size / (1024**2)
+            vmdk.unlink()
+        except FileNotFoundError:
+            return
+        logger.info(f"Deleted source VMDK: {vmdk.name} ({size_mb:.0f} MB freed)")
+
+    @staticmethod
+    def _replace_disk(src: Path, dst: Path) -> Path:
+        """Replace `dst` with the image `src` without copying any data.
+
+        Same filesystem: atomic rename, returns `dst`. Across filesystems
+        the image stays where it is — `dst` is deleted and `src` returned,
+        so callers must record the returned path (upload and snapshot
+        import only need a readable qcow2, not a particular location).
+        """
+        try:
+            os.replace(src, dst)
+            return dst
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+
+        logger.info(f"  {src.name} is on another filesystem — using it in place")
+        dst.unlink(missing_ok=True)
+        return src
+
+    def _make_s3(self):
+        """Create a Scaleway Object Storage client from the configuration."""
+        from vmware2scw.scaleway.s3 import ScalewayS3
+
+        scw_secret = self.config.scaleway.secret_key
+        return ScalewayS3(
+            region=self.config.scaleway.s3_region,
+            access_key=self.config.scaleway.access_key or "",
+            secret_key=scw_secret.get_secret_value() if scw_secret else "",
+        )
+
+    def _s3_transfer_config(self):
+        """Multipart settings for qcow2 uploads: 64MB parts, configurable concurrency."""
+        from boto3.s3.transfer import TransferConfig
+
+        part_size = 64 * 1024 * 1024
+        return TransferConfig(
+            multipart_threshold=part_size,
+            multipart_chunksize=part_size,
+            max_concurrency=self.config.scaleway.s3_upload_concurrency,
+            use_threads=True,
+        )
+
+    @staticmethod
+    def _s3_key(state: MigrationState, qcow2_path: Path) -> str:
+        return f"migrations/{state.migration_id}/{qcow2_path.name}"
+
+    def _convert_and_upload_disk(self, converter, vmdk: Path, compress: bool, s3, bucket: str,
+                                 state: MigrationState) -> Path:
+        """Convert a data disk and upload it right away (streaming_upload)."""
+        qcow2_path = self._convert_disk(converter, vmdk, compress)
+        s3.upload_image(
+            qcow2_path, bucket, self._s3_key(state, qcow2_path),
+            transfer_config=self._s3_transfer_config(),
+        )
+        return qcow2_path
+
+    def _stage_convert(self, plan: VMMigrationPlan, state: MigrationState) -> None:
+        """Convert VMDK disks to qcow2 format.
+
+        Normally a no-op check: _stage_export already converts each disk as
+        it is downloaded. Converts whatever is left (e.g. resumed migrations),
+        uploading data disks straight away with conversion.streaming_upload.
+        """
+
+        converter = DiskConverter()
+        compress = self._qcow2_compress(state)
+
+        # Keep disk order (boot disk first) — results are slotted by index
+        vmdk_objs = [Path(p) for p in state.artifacts.get("vmdk_paths", [])]
+        qcow2_paths: list[str] = [""] * len(vmdk_objs)
+        pairs = [(vmdk, vmdk.with_suffix(".qcow2")) for vmdk in vmdk_objs]
+
+        # Integrity-check existing qcow2 files concurrently — each check is
+        # its own qemu-img process, dominated by launch cost
+        existing = [qcow2 for _, qcow2 in pairs if qcow2.exists()]
+        valid: set[Path] = set()
+        if existing:
+            with ThreadPoolExecutor(max_workers=min(len(existing), 4), thread_name_prefix="check") as pool:
+                valid = {q for q, ok in zip(existing, pool.map(converter.check, existing)) if ok}
+
+        tasks: list[tuple[int, Path, Path]] = []
+        for i, (vmdk, qcow2_path) in enumerate(pairs):
             # Skip if already converted and valid
-            if qcow2_path.exists() and converter.check(qcow2_path):
+            if qcow2_path in valid:
                 logger.info(f"Skipping conversion (already exists): {qcow2_path.name}")
-                qcow2_paths.append(str(qcow2_path))
+                qcow2_paths[i] = str(qcow2_path)
+                self._delete_vmdk(vmdk)
                 continue
-
-            converter.convert(
-                vmdk,
-                qcow2_path,
-                compress=compress,
-            )
-            qcow2_paths.append(str(qcow2_path))
+            tasks.append((i, vmdk, qcow2_path))
+
+        # streaming_upload: data disks go to S3 right after conversion, while
+        # the freshly written qcow2 is still in the page cache
+        s3 = bucket = None
+        if self.config.conversion.streaming_upload and any(i > 0 for i, _, _ in tasks):
+            s3 = self._make_s3()
+            bucket = self.config.scaleway.s3_bucket
+            s3.create_bucket_if_not_exists(bucket)
+
+        def convert(i: int, vmdk: Path, qcow2_path: Path) -> Path:
+            result = converter.convert(vmdk, qcow2_path, compress=compress)
+            if s3 is not None and i > 0:
+                s3.upload_image(
+                    qcow2_path, bucket, self._s3_key(state, qcow2_path),
+                    transfer_config=self._s3_transfer_config(),
+                )
+            return result
+
+        if tasks:
+            workers = self._convert_workers(len(tasks))
+            logger.info(f"Converting {len(tasks)} disk(s) with {workers} parallel worker(s)")
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="convert") as pool:
+                futures = {
+                    pool.submit(convert, i, vmdk, qcow2_path): (i, vmdk)
+                    for i, vmdk, qcow2_path in tasks
+                }
+                for future in as_completed(futures):
+                    i, vmdk = futures[future]
+                    qcow2_paths[i] = str(future.result())
+                    # Free disk space as soon as this disk is converted
+                    self._delete_vmdk(vmdk)
 
         state.artifacts["qcow2_paths"] = qcow2_paths
 
-        # Free disk space: delete VMDK source files after successful conversion
-        for vmdk_path in state.artifacts.get("vmdk_paths", []):
-            vmdk = Path(vmdk_path)
-            if vmdk.exists():
-                size_mb = vmdk.stat().st_size / (1024**2)
-                vmdk.unlink()
-                logger.info(f"Deleted source VMDK: {vmdk.name} ({size_mb:.0f} MB freed)")
-
     # ─── v2 NEW: adapt_guest (Linux only) ────────────────────────────
 
     def _stage_adapt_guest(self, plan: VMMigrationPlan, state: MigrationState) -> None:
@@ -439,8 +908,10 @@ class MigrationPipeline:
         Replaces 4 separate stages: clean_tools + inject_virtio + fix_bootloader + fix_network.
         Saves ~15-20s by booting the libguestfs appliance only once instead of 3-4 times.
         Also skips virt-v2v entirely (saves ~18s of failed attempts on Ubuntu 24.04).
+
+        v3: All steps are written to one shell script, uploaded into the guest
+        and run once, instead of ~15 separate --run-command invocations.
         """
-        from vmware2scw.utils.subprocess import run_command
 
         qcow2_paths = state.artifacts.get("qcow2_paths", [])
         if not qcow2_paths:
@@ -453,32 +924,34 @@ class MigrationPipeline:
 
         logger.info("Adapting Linux guest (unified virt-customize — v2)...")
 
-        commands = []
+        commands: list[str] = []
 
         # ═══ 1. Clean VMware tools ═══
+        # Only the guest's own package manager when the distro is known
+        remove_cmds = {
+            "apt": ["apt-get"],
+            "dnf": ["dnf", "yum"],
+            "zypper": ["zypper"],
+        }
+        pkg_manager = ResourceMapper().get_package_manager(vm_info_dict.get("guest_os", ""))
+        tools = remove_cmds.get(pkg_manager, ["apt-get", "yum", "dnf", "zypper"])
+        commands += [
+            f"{tool} remove -y open-vm-tools open-vm-tools-desktop 2>/dev/null || true"
+            for tool in tools
+        ]
         commands += [
-            "--run-command",
-            "apt-get remove -y open-vm-tools open-vm-tools-desktop 2>/dev/null || true",
-            "--run-command",
-            "yum remove -y open-vm-tools open-vm-tools-desktop 2>/dev/null || true",
-            "--run-command",
-            "dnf remove -y open-vm-tools open-vm-tools-desktop 2>/dev/null || true",
-            "--run-command",
-            "zypper remove -y open-vm-tools open-vm-tools-desktop 2>/dev/null || true",
-            "--run-command",
             "rm -rf /etc/vmware-tools /usr/lib/vmware-tools 2>/dev/null || true",
-            "--run-command",
             "rm -f /etc/udev/rules.d/*vmware* /etc/udev/rules.d/99-vmware-scsi-udev.rules 2>/dev/null || true",
-            "--run-command",
             "systemctl disable vmtoolsd.service vmware-tools.service 2>/dev/null || true",
         ]
 
         # ═══ 2. Inject VirtIO modules into initramfs ═══
         commands += [
-            "--run-command",
             "if [ -d /etc/initramfs-tools ]; then "
+            "  have=' '; "
+            "  while read -r m _; do have=\"$have$m \"; done < /etc/initramfs-tools/modules 2>/dev/null; "
             "  for mod in virtio_blk virtio_scsi virtio_net virtio_pci; do "
-            "    grep -q $mod /etc/initramfs-tools/modules 2>/dev/null || echo $mod >> /etc/initramfs-tools/modules; "
+            "    case \"$have\" in *\" $mod \"*) ;; *) echo $mod >> /etc/initramfs-tools/modules ;; esac; "
             "  done; "
             "  update-initramfs -u 2>/dev/null || true; "
             "elif command -v dracut >/dev/null 2>&1; then "
@@ -489,47 +962,21 @@ class MigrationPipeline:
         # ═══ 3. Fix bootloader for KVM ═══
         # 3a. Fix /etc/fstab: replace /dev/sd* with /dev/vd*
         commands += [
-            "--run-command",
             "if [ -f /etc/fstab ]; then "
             "  cp /etc/fstab /etc/fstab.vmware2scw.bak; "
             "  sed -i 's|/dev/sda|/dev/vda|g; s|/dev/sdb|/dev/vdb|g; s|/dev/sdc|/dev/vdc|g' /etc/fstab; "
             "fi",
         ]
-        # 3b. Fix GRUB config
-        commands += [
-            "--run-command",
-            "if [ -f /etc/default/grub ]; then "
-            "  cp /etc/default/grub /etc/default/grub.vmware2scw.bak; "
-            "  sed -i 's|/dev/sda|/dev/vda|g' /etc/default/grub; "
-            "fi",
-        ]
-        # 3c. Configure GRUB for serial console (Scaleway has no VGA)
-        commands += [
-            "--run-command",
-            "if [ -f /etc/default/grub ]; then "
-            "  sed -i '/^GRUB_TERMINAL_OUTPUT=/d' /etc/default/grub; "
-            "  sed -i '/^GRUB_TERMINAL=/d' /etc/default/grub; "
-            "  sed -i '/^GRUB_SERIAL_COMMAND=/d' /etc/default/grub; "
-            "  sed -i '/^GRUB_GFXMODE=/d' /etc/default/grub; "
-            "  sed -i '/^GRUB_GFXPAYLOAD_LINUX=/d' /etc/default/grub; "
-            "  echo 'GRUB_TERMINAL=\"console serial\"' >> /etc/default/grub; "
-            "  echo 'GRUB_SERIAL_COMMAND=\"serial --speed=115200 --unit=0 --word=8 --parity=no --stop=1\"' >> /etc/default/grub; "
-            "  echo 'GRUB_TERMINAL_OUTPUT=\"console serial\"' >> /etc/default/grub; "
-            "  sed -i 's/^GRUB_CMDLINE_LINUX_DEFAULT=.*/GRUB_CMDLINE_LINUX_DEFAULT=\"console=tty1 console=ttyS0,115200n8\"/' /etc/default/grub; "
-            "  grep -q 'console=ttyS0' /etc/default/grub || "
-            "    sed -i 's/^GRUB_CMDLINE_LINUX=.*/GRUB_CMDLINE_LINUX=\"console=tty1 console=ttyS0,115200n8\"/' /etc/default/grub; "
-            "fi",
-        ]
+        # 3b+3c. GRUB: sd* → vd*, serial console (Scaleway has no VGA)
+        commands.append(GRUB_DEFAULTS_CMD)
         # 3d. Fix GRUB device map
         commands += [
-            "--run-command",
             "if [ -f /boot/grub/device.map ]; then "
             "  sed -i 's|/dev/sda|/dev/vda|g' /boot/grub/device.map; "
             "fi",
         ]
         # 3e. Regenerate GRUB config
         commands += [
-            "--run-command",
             "if command -v grub-mkconfig >/dev/null 2>&1; then "
             "  grub-mkconfig -o /boot/grub/grub.cfg 2>/dev/null || true; "
             "elif command -v grub2-mkconfig >/dev/null 2>&1; then "
@@ -539,21 +986,18 @@ class MigrationPipeline:
 
         # ═══ 4. Remove VMware SCSI modprobe configs ═══
         commands += [
-            "--run-command",
             "rm -f /etc/modprobe.d/*vmw* 2>/dev/null || true; "
             "rm -f /etc/modprobe.d/*vmware* 2>/dev/null || true",
         ]
 
         # ═══ 5. Clean persistent net rules ═══
         commands += [
-            "--run-command",
             "rm -f /etc/udev/rules.d/70-persistent-net.rules 2>/dev/null || true; "
             "rm -f /etc/udev/rules.d/75-persistent-net-generator.rules 2>/dev/null || true",
         ]
 
         # ═══ 6. Configure network (DHCP) ═══
         commands += [
-            "--run-command",
             "if [ -d /etc/netplan ]; then "
             "  cat > /etc/netplan/50-cloud-init.yaml << 'NETPLAN'\n"
             "network:\n"
@@ -576,34 +1020,16 @@ class MigrationPipeline:
         # ═══ 7. UEFI fallback boot path (only if source is already UEFI) ═══
         if firmware == "efi":
             commands += [
-                "--run-command",
-                "if [ -d /boot/efi/EFI ]; then "
-                "  mkdir -p /boot/efi/EFI/BOOT; "
-                "  for src in /boot/efi/EFI/ubuntu/shimx64.efi /boot/efi/EFI/ubuntu/grubx64.efi "
-                "             /boot/efi/EFI/debian/shimx64.efi /boot/efi/EFI/debian/grubx64.efi "
-                "             /boot/efi/EFI/centos/shimx64.efi /boot/efi/EFI/centos/grubx64.efi "
-                "             /boot/efi/EFI/fedora/shimx64.efi /boot/efi/EFI/fedora/grubx64.efi "
-                "             /boot/efi/EFI/rocky/shimx64.efi /boot/efi/EFI/rocky/grubx64.efi "
-                "             /boot/efi/EFI/almalinux/shimx64.efi /boot/efi/EFI/almalinux/grubx64.efi "
-                "             /boot/efi/EFI/rhel/shimx64.efi /boot/efi/EFI/rhel/grubx64.efi "
-                "             /boot/efi/EFI/sles/grubx64.efi /boot/efi/EFI/opensuse/grubx64.efi; do "
-                "    if [ -f \"$src\" ]; then "
-                "      cp \"$src\" /boot/efi/EFI/BOOT/BOOTX64.EFI; "
-                "      echo \"Copied $src to BOOTX64.EFI\"; "
-                "      break; "
-                "    fi; "
-                "  done; "
-                "fi",
+                UEFI_FALLBACK_CMD,
             ]
 
-        # ═══ Execute single virt-customize call ═══
-        cmd = ["virt-customize", "-a", str(boot_disk)] + commands
-        run_command(cmd, env={"LIBGUESTFS_BACKEND": "direct"}, check=False)
+        # ═══ Execute single virt-customize call running one uploaded script ═══
+        self._run_guest_script(boot_disk, commands, "adapt_guest", "Linux guest adaptation")
 
         if len(qcow2_paths) > 1:
             logger.info(f"Skipping {len(qcow2_paths) - 1} data disk(s) — no OS to adapt")
 
-        logger.info("Linux guest adaptation complete (single virt-customize call — v2)")
+        logger.info("Linux guest adaptation complete (single virt-customize call — v3)")
 
     # ─── Windows-only stages (unchanged from v1) ─────────────────────
 
@@ -613,20 +1039,15 @@ class MigrationPipeline:
         Only processes the boot disk (first disk). Additional data disks
         don't contain an OS and would fail virt-customize inspection.
         """
-        from vmware2scw.converter.disk import VMwareToolsCleaner
-        from vmware2scw.scaleway.mapping import ResourceMapper
 
-        mapper = ResourceMapper()
-        vm_info_dict = state.artifacts.get("vm_info", {})
-        guest_os = vm_info_dict.get("guest_os", "otherLinux64Guest")
-        os_family, _ = mapper.get_os_family(guest_os)
+        os_family = self._os_family(state)
 
         qcow2_paths = state.artifacts.get("qcow2_paths", [])
         if not qcow2_paths:
             logger.warning("No qcow2 files found — skipping clean_tools")
             return
 
-        cleaner = VMwareToolsCleaner()
+        cleaner = VMwareToolsCleaner(guestfs_env=self._ensure_guestfs_appliance())
         # Only clean the boot disk (first disk)
         boot_disk = qcow2_paths[0]
         logger.info(f"Cleaning boot disk: {Path(boot_disk).name}")
@@ -646,16 +1067,10 @@ class MigrationPipeline:
           Step 2: Merged Phase 2+3 — single QEMU boot with virtio-blk + virtio-scsi
                   + serial console monitoring for early exit
         """
-        import shutil
-        import subprocess
-        from vmware2scw.scaleway.mapping import ResourceMapper
-        from vmware2scw.utils.subprocess import run_command, check_tool_available
 
-        mapper = ResourceMapper()
         vm_info_dict = state.artifacts.get("vm_info", {})
-        guest_os = vm_info_dict.get("guest_os", "otherLinux64Guest")
         firmware = vm_info_dict.get("firmware", "efi")
-        os_family, _ = mapper.get_os_family(guest_os)
+        os_family = self._os_family(state)
 
         qcow2_paths = state.artifacts.get("qcow2_paths", [])
         if not qcow2_paths:
@@ -685,7 +1100,6 @@ class MigrationPipeline:
         # Step 1: Phase 1 — offline prep on ORIGINAL writable qcow2
         logger.info("Windows Step 1/3: Offline driver staging (Phase 1)...")
         from vmware2scw.converter.windows_virtio import _phase1_offline, _phase2_qemu_boot, ensure_prerequisites
-        import tempfile
         ensure_prerequisites()
         p1_work = boot_disk.parent / "virtio-phase1"
         p1_work.mkdir(parents=True, exist_ok=True)
@@ -693,7 +1107,8 @@ class MigrationPipeline:
 
         # Step 2: virt-v2v — PCI device binding
         logger.info("Windows Step 2/3: virt-v2v (PCI device binding)...")
-        env = {"LIBGUESTFS_BACKEND": "direct", "VIRTIO_WIN": str(virtio_iso)}
+        guestfs_env = self._ensure_guestfs_appliance()
+        env = {**guestfs_env, "VIRTIO_WIN": str(virtio_iso)}
         out_dir = boot_disk.parent / "v2v-out"
         out_dir.mkdir(parents=True, exist_ok=True)
         v2v_name = f"v2v-{boot_disk.stem}"
@@ -715,31 +1130,46 @@ class MigrationPipeline:
                 break
             except Exception as e:
                 logger.warning(f"  virt-v2v syntax {i} failed: {e}")
-                for f in out_dir.iterdir():
-                    f.unlink(missing_ok=True)
+                # Reset out_dir (partial output, including any sub-directories)
+                shutil.rmtree(out_dir, ignore_errors=True)
+                out_dir.mkdir(parents=True, exist_ok=True)
 
         if not v2v_ok:
             raise RuntimeError("virt-v2v failed — cannot prepare Windows for KVM")
 
         # Find virt-v2v output and replace boot disk
-        candidates = sorted(
-            [f for f in out_dir.iterdir()
-             if f.is_file() and f.stat().st_size > 1024 * 1024
-             and f.suffix not in ('.xml', '.sh')],
-            key=lambda f: f.stat().st_size, reverse=True,
-        )
+        # One scandir pass: DirEntry caches the stat, so each file is stat'ed once
+        candidates = []
+        with os.scandir(out_dir) as it:
+            for entry in it:
+                if not entry.is_file(follow_symlinks=False) or entry.name.endswith(('.xml', '.sh')):
+                    continue
+                size = entry.stat(follow_symlinks=False).st_size
+                if size > 1024 * 1024:
+                    candidates.append((size, entry.path))
         if not candidates:
             raise RuntimeError(f"virt-v2v produced no output in {out_dir}")
 
-        converted = candidates[0]
-        logger.info(f"  virt-v2v output: {converted.name} ({converted.stat().st_size / (1024**3):.1f} GB)")
-
-        boot_disk.unlink(missing_ok=True)
-        import shutil as _shutil
-        _shutil.move(str(converted), str(boot_disk))
-        _shutil.rmtree(out_dir, ignore_errors=True)
+        size, path = max(candidates)
+        converted = Path(path)
+        logger.info(f"  virt-v2v output: {converted.name} ({size / (1024**3):.1f} GB)")
+
+        boot_disk = self._replace_disk(converted, boot_disk)
+        if boot_disk == converted:
+            # Image kept in out_dir: only remove the other virt-v2v outputs
+            for f in out_dir.iterdir():
+                if f.is_dir():
+                    shutil.rmtree(f, ignore_errors=True)
+                elif f != converted:
+                    f.unlink(missing_ok=True)
+        else:
+            shutil.rmtree(out_dir, ignore_errors=True)
         state.artifacts["qcow2_paths"][0] = str(boot_disk)
         logger.info("  virt-v2v complete — boot disk replaced")
+        if firmware == "efi":
+            # virt-v2v keeps the source firmware: an EFI guest comes out UEFI-bootable,
+            # so ensure_uefi does not need to inspect the disk again
+            state.artifacts["boot_type"] = "uefi"
 
         # Step 3: v2 merged Phase 2+3 — single QEMU boot with both controllers + serial monitoring
         logger.info("Windows Step 3/3: QEMU merged boot (pnputil + vioscsi PnP — v2)...")
@@ -755,12 +1185,13 @@ class MigrationPipeline:
             cmd_file = p2_work / "vmware2scw-setup-v2.cmd"
             cmd_file.write_text(SETUP_CMD_V2, encoding="utf-8")
 
-            import os as _os
-            subprocess.run(
-                ["guestfish", "-a", str(boot_disk), "-i", "--",
-                 "upload", str(cmd_file), "/Windows/vmware2scw-setup.cmd"],
-                capture_output=True, text=True,
-                env={**_os.environ, "LIBGUESTFS_BACKEND": "direct"},
+            # Further offline tweaks can be appended here as extra
+            # --upload / --run-command pairs (same appliance boot)
+            run_command(
+                self._virt_customize_cmd(boot_disk, [
+                    "--upload", f"{cmd_file}:/Windows/vmware2scw-setup.cmd",
+                ], p2_work / "setup-upload.cmds"),
+                env=guestfs_env, check=False,
             )
 
             # Merged Phase 2+3 QEMU boot with serial monitoring
@@ -802,13 +1233,8 @@ class MigrationPipeline:
 
         Note: For Linux VMs in v2, this is handled by adapt_guest instead.
         """
-        from vmware2scw.scaleway.mapping import ResourceMapper
-        from vmware2scw.utils.subprocess import run_command
 
-        mapper = ResourceMapper()
-        vm_info_dict = state.artifacts.get("vm_info", {})
-        guest_os = vm_info_dict.get("guest_os", "")
-        os_family, _ = mapper.get_os_family(guest_os)
+        os_family = self._os_family(state)
 
         qcow2_paths = state.artifacts.get("qcow2_paths", [])
         if not qcow2_paths:
@@ -826,46 +1252,23 @@ class MigrationPipeline:
         # v2: Linux should use adapt_guest, but if we get here (e.g. resume), handle it
         logger.info("Fixing bootloader for KVM compatibility...")
 
-        # All fixes in a single virt-customize call to avoid multiple guest inspections
+        # All fixes in one script, uploaded and run by a single virt-customize call
         commands = [
             # 1. Fix /etc/fstab: replace /dev/sd* with /dev/vd* (only if not UUID)
-            "--run-command",
             "if [ -f /etc/fstab ]; then "
             "  cp /etc/fstab /etc/fstab.vmware2scw.bak; "
             "  sed -i 's|/dev/sda|/dev/vda|g; s|/dev/sdb|/dev/vdb|g; s|/dev/sdc|/dev/vdc|g' /etc/fstab; "
             "fi",
 
-            # 2. Fix GRUB config: replace sd* references with vd*
-            "--run-command",
-            "if [ -f /etc/default/grub ]; then "
-            "  cp /etc/default/grub /etc/default/grub.vmware2scw.bak; "
-            "  sed -i 's|/dev/sda|/dev/vda|g' /etc/default/grub; "
-            "fi",
-
-            # 2b. Configure GRUB for serial console (Scaleway has no VGA)
-            "--run-command",
-            "if [ -f /etc/default/grub ]; then "
-            "  sed -i '/^GRUB_TERMINAL_OUTPUT=/d' /etc/default/grub; "
-            "  sed -i '/^GRUB_TERMINAL=/d' /etc/default/grub; "
-            "  sed -i '/^GRUB_SERIAL_COMMAND=/d' /etc/default/grub; "
-            "  sed -i '/^GRUB_GFXMODE=/d' /etc/default/grub; "
-            "  sed -i '/^GRUB_GFXPAYLOAD_LINUX=/d' /etc/default/grub; "
-            "  echo 'GRUB_TERMINAL=\"console serial\"' >> /etc/default/grub; "
-            "  echo 'GRUB_SERIAL_COMMAND=\"serial --speed=115200 --unit=0 --word=8 --parity=no --stop=1\"' >> /etc/default/grub; "
-            "  echo 'GRUB_TERMINAL_OUTPUT=\"console serial\"' >> /etc/default/grub; "
-            "  sed -i 's/^GRUB_CMDLINE_LINUX_DEFAULT=.*/GRUB_CMDLINE_LINUX_DEFAULT=\"console=tty1 console=ttyS0,115200n8\"/' /etc/default/grub; "
-            "  grep -q 'console=ttyS0' /etc/default/grub || "
-            "    sed -i 's/^GRUB_CMDLINE_LINUX=.*/GRUB_CMDLINE_LINUX=\"console=tty1 console=ttyS0,115200n8\"/' /etc/default/grub; "
-            "fi",
+            # 2. GRUB: sd* → vd*, serial console (Scaleway has no VGA)
+            GRUB_DEFAULTS_CMD,
 
             # 3. Fix GRUB device map
-            "--run-command",
             "if [ -f /boot/grub/device.map ]; then "
             "  sed -i 's|/dev/sda|/dev/vda|g' /boot/grub/device.map; "
             "fi",
 
             # 4. Regenerate GRUB config
-            "--run-command",
             "if command -v grub-mkconfig >/dev/null 2>&1; then "
             "  grub-mkconfig -o /boot/grub/grub.cfg 2>/dev/null || true; "
             "elif command -v grub2-mkconfig >/dev/null 2>&1; then "
@@ -873,10 +1276,11 @@ class MigrationPipeline:
             "fi",
 
             # 5. Ensure VirtIO modules are loaded at boot
-            "--run-command",
             "if [ -d /etc/initramfs-tools ]; then "
+            "  have=' '; "
+            "  while read -r m _; do have=\"$have$m \"; done < /etc/initramfs-tools/modules 2>/dev/null; "
             "  for mod in virtio_blk virtio_scsi virtio_net virtio_pci; do "
-            "    grep -q $mod /etc/initramfs-tools/modules 2>/dev/null || echo $mod >> /etc/initramfs-tools/modules; "
+            "    case \"$have\" in *\" $mod \"*) ;; *) echo $mod >> /etc/initramfs-tools/modules ;; esac; "
             "  done; "
             "  update-initramfs -u 2>/dev/null || true; "
             "elif command -v dracut >/dev/null 2>&1; then "
@@ -884,17 +1288,14 @@ class MigrationPipeline:
             "fi",
 
             # 6. Remove VMware SCSI driver references that interfere with VirtIO
-            "--run-command",
             "rm -f /etc/modprobe.d/*vmw* 2>/dev/null || true; "
             "rm -f /etc/modprobe.d/*vmware* 2>/dev/null || true",
 
             # 7. Clean persistent net rules (interface names change)
-            "--run-command",
             "rm -f /etc/udev/rules.d/70-persistent-net.rules 2>/dev/null || true; "
             "rm -f /etc/udev/rules.d/75-persistent-net-generator.rules 2>/dev/null || true",
 
             # 8. Enable DHCP on first interface (Scaleway provides IP via DHCP)
-            "--run-command",
             "if [ -d /etc/netplan ]; then "
             "  cat > /etc/netplan/50-cloud-init.yaml << 'NETPLAN'\n"
             "network:\n"
@@ -914,28 +1315,10 @@ class MigrationPipeline:
             "fi",
 
             # 9. Ensure UEFI fallback boot path exists (Scaleway NVRAM is empty)
-            "--run-command",
-            "if [ -d /boot/efi/EFI ]; then "
-            "  mkdir -p /boot/efi/EFI/BOOT; "
-            "  for src in /boot/efi/EFI/ubuntu/shimx64.efi /boot/efi/EFI/ubuntu/grubx64.efi "
-            "             /boot/efi/EFI/debian/shimx64.efi /boot/efi/EFI/debian/grubx64.efi "
-            "             /boot/efi/EFI/centos/shimx64.efi /boot/efi/EFI/centos/grubx64.efi "
-            "             /boot/efi/EFI/fedora/shimx64.efi /boot/efi/EFI/fedora/grubx64.efi "
-            "             /boot/efi/EFI/rocky/shimx64.efi /boot/efi/EFI/rocky/grubx64.efi "
-            "             /boot/efi/EFI/almalinux/shimx64.efi /boot/efi/EFI/almalinux/grubx64.efi "
-            "             /boot/efi/EFI/rhel/shimx64.efi /boot/efi/EFI/rhel/grubx64.efi "
-            "             /boot/efi/EFI/sles/grubx64.efi /boot/efi/EFI/opensuse/grubx64.efi; do "
-            "    if [ -f \"$src\" ]; then "
-            "      cp \"$src\" /boot/efi/EFI/BOOT/BOOTX64.EFI; "
-            "      echo \"Copied $src to BOOTX64.EFI\"; "
-            "      break; "
-            "    fi; "
-            "  done; "
-            "fi",
+            UEFI_FALLBACK_CMD,
         ]
 
-        cmd = ["virt-customize", "-a", str(boot_disk)] + commands
-        run_command(cmd, env={"LIBGUESTFS_BACKEND": "direct"}, check=False)
+        self._run_guest_script(boot_disk, commands, "fix_bootloader", "KVM bootloader fixes")
         logger.info("Bootloader and network configuration fixed for KVM")
 
     def _stage_ensure_uefi(self, plan: VMMigrationPlan, state: MigrationState) -> None:
@@ -952,13 +1335,10 @@ class MigrationPipeline:
         v2: Fixed guestfish --rw/-ro bug for Windows UEFI fallback.
         """
         from vmware2scw.converter.bios2uefi import detect_boot_type, convert_bios_to_uefi
-        from vmware2scw.scaleway.mapping import ResourceMapper
 
-        mapper = ResourceMapper()
         vm_info_dict = state.artifacts.get("vm_info", {})
-        guest_os = vm_info_dict.get("guest_os", "")
         firmware = vm_info_dict.get("firmware", "bios")
-        os_family, _ = mapper.get_os_family(guest_os)
+        os_family = self._os_family(state)
 
         qcow2_paths = state.artifacts.get("qcow2_paths", [])
         if not qcow2_paths:
@@ -966,10 +1346,14 @@ class MigrationPipeline:
 
         boot_disk = qcow2_paths[0]
 
-        # If virt-v2v succeeded (inject_virtio didn't fall back), disk should already be OK
-        # Check anyway to be sure
-        boot_type = detect_boot_type(boot_disk)
-        logger.info(f"Boot type detection: firmware={firmware}, disk={boot_type}")
+        # If virt-v2v succeeded on an EFI guest, inject_virtio recorded boot_type
+        # already; otherwise inspect the disk
+        boot_type = state.artifacts.get("boot_type")
+        if boot_type:
+            logger.info(f"Boot type (from inject_virtio): firmware={firmware}, disk={boot_type}")
+        else:
+            boot_type = detect_boot_type(boot_disk)
+            logger.info(f"Boot type detection: firmware={firmware}, disk={boot_type}")
 
         if boot_type == "uefi":
             logger.info("Disk already UEFI-bootable — skipping conversion")
@@ -1013,29 +1397,25 @@ class MigrationPipeline:
         guestfish sequence, causing "cannot mix --ro and --rw options" error.
 
         Fix: Use separate guestfish calls — --ro for detection, --rw for writes.
+        v3: Two appliance boots in total instead of one per partition:
+        list-filesystems finds the ESP in one read-only call, and the
+        existence check + copy share the read-write session. guestfish
+        stops a script at its first failing command, so `filesize` on a
+        missing bootmgfw.efi aborts before anything is written to the ESP.
         """
-        import os
-        import subprocess
-
-        gf_env = {**os.environ, "LIBGUESTFS_BACKEND": "direct"}
+        gf_env = {**os.environ, **self._ensure_guestfs_appliance()}
 
-        # Step 1: Find ESP partition (read-only)
+        # Step 1: Find ESP partition (read-only, one session)
         r = subprocess.run(
             ["guestfish", "--ro", "-a", qcow2_path, "--",
-             "run", ":", "list-partitions"],
+             "run", ":", "list-filesystems"],
             capture_output=True, text=True, env=gf_env,
         )
-        partitions = [p.strip() for p in r.stdout.strip().split("\n") if p.strip()]
-
         esp_dev = None
-        for part in partitions:
-            r2 = subprocess.run(
-                ["guestfish", "--ro", "-a", qcow2_path, "--",
-                 "run", ":", "vfs-type", part],
-                capture_output=True, text=True, env=gf_env,
-            )
-            if "fat" in r2.stdout.lower():
-                esp_dev = part
+        for line in r.stdout.splitlines():
+            dev, _, fstype = line.partition(":")
+            if "fat" in fstype.lower():
+                esp_dev = dev.strip()
                 break
 
         if not esp_dev:
@@ -1044,29 +1424,24 @@ class MigrationPipeline:
 
         logger.info(f"  ESP found: {esp_dev}")
 
-        # Step 2: Check if bootmgfw.efi exists (read-only)
-        r3 = subprocess.run(
-            ["guestfish", "--ro", "-a", qcow2_path, "--",
-             "run", ":",
-             f"mount-ro {esp_dev} /", ":",
-             "is-file /EFI/Microsoft/Boot/bootmgfw.efi"],
-            capture_output=True, text=True, env=gf_env,
-        )
-
-        if "true" not in r3.stdout.lower():
-            logger.warning("  /EFI/Microsoft/Boot/bootmgfw.efi not found on ESP")
-            return
-
-        # Step 3: Copy to fallback path (read-write — SEPARATE call)
+        # Step 2: Check bootmgfw.efi and copy to fallback path (read-write — SEPARATE call)
+        # filesize fails on a missing file and ends the script before mkdir-p
         gf_script = f"""run
 mount {esp_dev} /
+filesize /EFI/Microsoft/Boot/bootmgfw.efi
 mkdir-p /EFI/BOOT
 cp /EFI/Microsoft/Boot/bootmgfw.efi /EFI/BOOT/BOOTX64.EFI
 """
-        subprocess.run(
+        r2 = subprocess.run(
             ["guestfish", "--rw", "-a", qcow2_path, "--"],
             input=gf_script, capture_output=True, text=True, env=gf_env,
         )
+        if r2.returncode != 0:
+            logger.warning(
+                f"  UEFI fallback not configured (bootmgfw.efi missing on ESP?): "
+                f"{r2.stderr.strip()[-200:]}"
+            )
+            return
         logger.info("  ✓ UEFI fallback bootloader configured (BOOTX64.EFI)")
 
     # v2: _stage_fix_network REMOVED from pipeline (was NOOP for both Linux and Windows)
@@ -1077,12 +1452,8 @@ cp /EFI/Microsoft/Boot/bootmgfw.efi /EFI/BOOT/BOOTX64.EFI
         Linux: handled in adapt_guest (v2) or fix_bootloader (v1).
         Windows: DHCP already forced in inject_virtio (ensure_all_virtio_drivers).
         """
-        from vmware2scw.scaleway.mapping import ResourceMapper
 
-        mapper = ResourceMapper()
-        vm_info_dict = state.artifacts.get("vm_info", {})
-        guest_os = vm_info_dict.get("guest_os", "")
-        os_family, _ = mapper.get_os_family(guest_os)
+        os_family = self._os_family(state)
 
         if os_family != "windows":
             logger.info("Linux network adaptation already handled in adapt_guest/fix_bootloader stage")
@@ -1091,35 +1462,36 @@ cp /EFI/Microsoft/Boot/bootmgfw.efi /EFI/BOOT/BOOTX64.EFI
         logger.info("Windows network: DHCP already configured by inject_virtio — skipping")
 
     def _stage_upload_s3(self, plan: VMMigrationPlan, state: MigrationState) -> None:
-        """Upload qcow2 images to Scaleway Object Storage."""
-        from vmware2scw.scaleway.s3 import ScalewayS3
-
-        scw_secret = self.config.scaleway.secret_key
-        s3 = ScalewayS3(
-            region=self.config.scaleway.s3_region,
-            access_key=self.config.scaleway.access_key or "",
-            secret_key=scw_secret.get_secret_value() if scw_secret else "",
-        )
+        """Upload qcow2 images to Scaleway Object Storage.
 
+        Each image is sent as a concurrent multipart upload (64MB parts,
+        scaleway.s3_upload_concurrency parts in flight), and up to
+        conversion.disk_parallelism disks are uploaded at the same time.
+        An object already present with the same size (one HEAD) is skipped.
+        """
+        s3 = self._make_s3()
         bucket = self.config.scaleway.s3_bucket
         s3.create_bucket_if_not_exists(bucket)
+        transfer_config = self._s3_transfer_config()
 
-        s3_keys = []
-        for qcow2_path in state.artifacts.get("qcow2_paths", []):
-            p = Path(qcow2_path)
-            key = f"migrations/{state.migration_id}/{p.name}"
-
-            # Skip if already uploaded with same size
-            if s3.check_object_exists(bucket, key):
-                remote_size = s3.get_object_size(bucket, key)
-                local_size = p.stat().st_size
-                if remote_size == local_size:
-                    logger.info(f"Skipping upload (already exists): {key}")
-                    s3_keys.append(key)
-                    continue
+        def upload(qcow2_path: str) -> str:
+            key = self._s3_key(state, Path(qcow2_path))
+
+            # Skip if already uploaded with same size (e.g. streamed from export):
+            # one HEAD (size + ETag) and one local stat
+            head = s3.head_object(bucket, key)
+            if head and head["ContentLength"] == os.stat(qcow2_path).st_size:
+                logger.info(f"Skipping upload (already exists, ETag {head.get('ETag', '?')}): {key}")
+                return key
 
-            s3.upload_image(qcow2_path, bucket, key)
-            s3_keys.append(key)
+            s3.upload_image(qcow2_path, bucket, key, transfer_config=transfer_config)
+            return key
+
+        # Disks are independent — upload several at once; map() keeps disk order
+        qcow2_paths = state.artifacts.get("qcow2_paths", [])
+        with ThreadPoolExecutor(max_workers=self._disk_workers(len(qcow2_paths)),
+                                thread_name_prefix="upload") as pool:
+            s3_keys = list(pool.map(upload, qcow2_paths))
 
         state.artifacts["s3_keys"] = s3_keys
         state.artifacts["s3_bucket"] = bucket
@@ -1146,25 +1518,30 @@ cp /EFI/Microsoft/Boot/bootmgfw.efi /EFI/BOOT/BOOTX64.EFI
         if not s3_keys:
             raise RuntimeError("No S3 keys found — upload stage may have failed")
 
-        # Import ALL disks as snapshots
-        snapshot_ids = []
-        for i, s3_key in enumerate(s3_keys):
-            disk_label = "boot" if i == 0 else f"data-{i}"
-            snap_name = f"vmware2scw-{plan.vm_name}-{state.migration_id}-{disk_label}"
+        # Import ALL disks as snapshots: create them all, then wait for all
+        # (the waits overlap instead of running back to back)
+        labels = ["boot" if i == 0 else f"data-{i}" for i in range(len(s3_keys))]
 
-            logger.info(f"Creating Scaleway snapshot ({disk_label}) from s3://{bucket}/{s3_key}")
+        def create(i: int) -> str:
+            snap_name = f"vmware2scw-{plan.vm_name}-{state.migration_id}-{labels[i]}"
+            logger.info(f"Creating Scaleway snapshot ({labels[i]}) from s3://{bucket}/{s3_keys[i]}")
             snapshot = api.create_snapshot_from_s3(
                 zone=zone,
                 name=snap_name,
                 bucket=bucket,
-                key=s3_key,
+                key=s3_keys[i],
             )
-            snap_id = snapshot["id"]
-            snapshot_ids.append(snap_id)
+            return snapshot["id"]
 
-            logger.info(f"Waiting for snapshot {snap_id}...")
-            api.wait_for_snapshot(zone, snap_id)
-            logger.info(f"Snapshot {snap_id} ({disk_label}) is available")
+        def wait(i: int) -> None:
+            logger.info(f"Waiting for snapshot {snapshot_ids[i]}...")
+            api.wait_for_snapshot(zone, snapshot_ids[i])
+            logger.info(f"Snapshot {snapshot_ids[i]} ({labels[i]}) is available")
+
+        with ThreadPoolExecutor(max_workers=self._disk_workers(len(s3_keys)),
+                                thread_name_prefix="snapshot") as pool:
+            snapshot_ids = list(pool.map(create, range(len(s3_keys))))
+            list(pool.map(wait, range(len(s3_keys))))
 
         state.artifacts["scaleway_snapshot_id"] = snapshot_ids[0]
         state.artifacts["scaleway_snapshot_ids"] = snapshot_ids
@@ -1195,33 +1572,23 @@ cp /EFI/Microsoft/Boot/bootmgfw.efi /EFI/BOOT/BOOTX64.EFI
 
     def _stage_cleanup(self, plan: VMMigrationPlan, state: MigrationState) -> None:
         """Clean up all temporary resources to free disk space."""
-        import shutil
 
         # 1. Clean local work directory (VMDK + qcow2 intermediate files)
         work_dir = self.config.conversion.work_dir / state.migration_id
         if work_dir.exists():
-            size_gb = sum(f.stat().st_size for f in work_dir.rglob("*") if f.is_file()) / (1024**3)
-            logger.info(f"Cleaning work directory: {work_dir} ({size_gb:.1f} GB)")
-            shutil.rmtree(work_dir, ignore_errors=True)
+            logger.info(f"Cleaning work directory: {work_dir}")
+            size_gb = self._rmtree_sum(work_dir) / (1024**3)
+            logger.info(f"Cleaned work directory: {work_dir} ({size_gb:.1f} GB freed)")
 
         # 2. Clean VMware snapshot
         snap_name = state.artifacts.get("snapshot_name")
         if snap_name:
             try:
-                from vmware2scw.vmware.client import VSphereClient
                 from vmware2scw.vmware.snapshot import SnapshotManager
 
-                client = VSphereClient()
-                pw = self.config.vmware.password.get_secret_value() if self.config.vmware.password else ""
-                client.connect(
-                    self.config.vmware.vcenter,
-                    self.config.vmware.username,
-                    pw,
-                    insecure=self.config.vmware.insecure,
-                )
+                client = self._get_vsphere()
                 snap_mgr = SnapshotManager(client)
                 snap_mgr.delete_migration_snapshot(plan.vm_name, snap_name)
-                client.disconnect()
                 logger.info(f"Deleted VMware snapshot: {snap_name}")
             except Exception as e:
                 logger.warning(f"Failed to clean VMware snapshot: {e}")
@@ -1232,20 +1599,11 @@ cp /EFI/Microsoft/Boot/bootmgfw.efi /EFI/BOOT/BOOTX64.EFI
         bucket = state.artifacts.get("s3_bucket")
         if image_id and s3_keys and bucket:
             try:
-                # v2 FIX: Use correct module name (was vmware2scw.scaleway.storage)
-                from vmware2scw.scaleway.s3 import ScalewayS3
-                scw_secret = self.config.scaleway.secret_key
-                s3 = ScalewayS3(
-                    region=self.config.scaleway.s3_region,
-                    access_key=self.config.scaleway.access_key or "",
-                    secret_key=scw_secret.get_secret_value() if scw_secret else "",
-                )
+                # One DeleteObjects request instead of one DELETE per key
+                failed = set(self._make_s3().delete_objects_batch(bucket, s3_keys))
                 for key in s3_keys:
-                    try:
-                        s3.delete_object(bucket, key)
+                    if key not in failed:
                         logger.info(f"Deleted S3 transit: s3://{bucket}/{key}")
-                    except Exception as e2:
-                        logger.warning(f"Failed to delete {key}: {e2}")
             except Exception as e:
                 logger.warning(f"S3 cleanup failed: {e}")
         else:
@@ -1255,6 +1613,34 @@ cp /EFI/Microsoft/Boot/bootmgfw.efi /EFI/BOOT/BOOTX64.EFI
 
     # ─── Helper methods ──────────────────────────────────────────────
 
+    @staticmethod
+    def _rmtree_sum(path: Path) -> int:
+        """Delete a directory tree and return the bytes freed, in one scandir walk.
+
+        Errors are ignored (like shutil.rmtree(ignore_errors=True)); files
+        that could not be removed are not counted.
+        """
+        total = 0
+        try:
+            entries = list(os.scandir(path))
+        except OSError:
+            return 0
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    total += MigrationPipeline._rmtree_sum(Path(entry.path))
+                else:
+                    size = entry.stat(follow_symlinks=False).st_size
+                    os.unlink(entry.path)
+                    total += size
+            except OSError:
+                continue
+        try:
+            os.rmdir(path)
+        except OSError:
+            pass
+        return total
+
     def _fix_ntfs_dirty_flag(self, qcow2_path):
         """Fix NTFS dirty flag that prevents write access.
 
@@ -1263,78 +1649,116 @@ cp /EFI/Microsoft/Boot/bootmgfw.efi /EFI/BOOT/BOOTX64.EFI
 
         Uses qemu-nbd + host ntfsfix for maximum reliability.
         """
-        import os
-        import subprocess
-        import time
 
         logger.info("Checking/fixing NTFS dirty flag (Fast Startup / Hibernation)...")
-        gf_env = {**os.environ, "LIBGUESTFS_BACKEND": "direct"}
+        gf_env = {**os.environ, **self._ensure_guestfs_appliance()}
 
-        # Method 1: qemu-nbd + ntfsfix (most reliable)
-        nbd_dev = "/dev/nbd0"
-        subprocess.run(["modprobe", "nbd", "max_part=8"], capture_output=True)
-        subprocess.run(["qemu-nbd", "--disconnect", nbd_dev], capture_output=True)
-
-        r = subprocess.run(
-            ["qemu-nbd", "--connect", nbd_dev, str(qcow2_path)],
-            capture_output=True, text=True,
-        )
-        if r.returncode == 0:
+        # Method 1: qemu-nbd + ntfsfix (most reliable), on a device of our
+        # own — other VMs may be using NBD concurrently
+        # io_uring AIO batches ntfsfix's many small metadata reads; older
+        # qemu-nbd/kernels reject it → retry with default AIO
+        nbd_dev = None
+        try:
+            nbd_dev = connect_nbd(str(qcow2_path), "--aio=io_uring", "--cache=none", "--discard=unmap")
+        except RuntimeError as e:
+            logger.debug("  qemu-nbd with io_uring failed (%s) — retrying", str(e)[:120])
+            try:
+                nbd_dev = connect_nbd(str(qcow2_path))
+            except RuntimeError as e:
+                logger.warning(f"  qemu-nbd not available: {str(e)[:200]}")
+        if nbd_dev:
             try:
                 time.sleep(1)
-                for i in range(1, 8):
-                    part = f"{nbd_dev}p{i}"
-                    if not os.path.exists(part):
-                        continue
-                    blkid_r = subprocess.run(
-                        ["blkid", "-o", "value", "-s", "TYPE", part],
-                        capture_output=True, text=True,
-                    )
-                    if "ntfs" in blkid_r.stdout.lower():
-                        logger.info(f"  Running ntfsfix -d on {part}...")
-                        fix_r = subprocess.run(
-                            ["ntfsfix", "-d", part],
-                            capture_output=True, text=True,
-                        )
-                        if fix_r.returncode == 0:
-                            logger.info(f"  ntfsfix succeeded on {part}")
-                        else:
-                            logger.warning(f"  ntfsfix on {part}: {fix_r.stderr.strip()[:200]}")
+                ntfs_parts = self._find_ntfs_partitions(nbd_dev)
+                if ntfs_parts:
+                    with ThreadPoolExecutor(max_workers=min(len(ntfs_parts), 4)) as pool:
+                        list(pool.map(self._run_ntfsfix, ntfs_parts))
             finally:
-                subprocess.run(["qemu-nbd", "--disconnect", nbd_dev], capture_output=True)
-        else:
-            logger.warning(f"  qemu-nbd not available: {r.stderr.strip()[:200]}")
+                disconnect_nbd(nbd_dev)
 
-        # Method 2: Disable Fast Startup via hivex
+        # Method 2: Disable Fast Startup via hivex — one guestfish appliance
+        # (--listen) serves both the download and the upload
+        gf_pid = None
         try:
-            r2 = subprocess.run(
-                ["guestfish", "-a", str(qcow2_path), "-i", "--",
-                 "download", "/Windows/System32/config/SYSTEM", "/tmp/SYSTEM.ntfsfix"],
+            listen = subprocess.run(
+                ["guestfish", "--listen", "-a", str(qcow2_path), "-i"],
                 capture_output=True, text=True, env=gf_env,
             )
+            m = re.search(r"GUESTFISH_PID=(\d+)", listen.stdout)
+            if not m:
+                logger.debug("  guestfish --listen failed: %s", listen.stderr.strip()[:200])
+                return
+            gf_pid = m.group(1)
+
+            def remote(*args: str) -> subprocess.CompletedProcess:
+                return subprocess.run(
+                    ["guestfish", f"--remote={gf_pid}", "--", *args],
+                    capture_output=True, text=True, env=gf_env,
+                )
+
+            r2 = remote("download", "/Windows/System32/config/SYSTEM", "/tmp/SYSTEM.ntfsfix")
             if r2.returncode == 0:
-                from pathlib import Path as P
                 reg_content = (
                     'Windows Registry Editor Version 5.00\n\n'
                     '[HKEY_LOCAL_MACHINE\\\\SYSTEM\\\\ControlSet001\\\\Control\\\\Session Manager\\\\Power]\n'
                     '"HiberbootEnabled"=dword:00000000\n'
                 )
-                P("/tmp/disable-fastboot.reg").write_text(reg_content)
+                Path("/tmp/disable-fastboot.reg").write_text(reg_content)
                 subprocess.run(
                     ["hivexregedit", "--merge", "/tmp/SYSTEM.ntfsfix",
                      "--prefix", "HKEY_LOCAL_MACHINE\\SYSTEM",
                      "/tmp/disable-fastboot.reg"],
                     capture_output=True, text=True,
                 )
+                remote("upload", "/tmp/SYSTEM.ntfsfix", "/Windows/System32/config/SYSTEM")
+                logger.info("  Disabled Windows Fast Startup (HiberbootEnabled=0)")
+        except Exception as e:
+            logger.debug("  Fast Startup disable attempt: %s", e)
+        finally:
+            if gf_pid:
+                # Unmounts, syncs and shuts the appliance down
                 subprocess.run(
-                    ["guestfish", "-a", str(qcow2_path), "-i", "--",
-                     "upload", "/tmp/SYSTEM.ntfsfix",
-                     "/Windows/System32/config/SYSTEM"],
+                    ["guestfish", f"--remote={gf_pid}", "--", "exit"],
                     capture_output=True, text=True, env=gf_env,
                 )
-                logger.info("  Disabled Windows Fast Startup (HiberbootEnabled=0)")
-        except Exception as e:
-            logger.debug(f"  Fast Startup disable attempt: {e}")
+
+    @staticmethod
+    def _find_ntfs_partitions(nbd_dev: str) -> list[str]:
+        """NTFS partitions of an attached NBD device, found with one lsblk call."""
+        r = subprocess.run(
+            ["lsblk", "-rno", "NAME,FSTYPE", nbd_dev],
+            capture_output=True, text=True,
+        )
+        if r.returncode == 0:
+            parts = []
+            for line in r.stdout.splitlines():
+                fields = line.split()
+                if len(fields) == 2 and fields[1].lower() == "ntfs":
+                    parts.append(f"/dev/{fields[0]}")
+            return parts
+
+        # No lsblk: one blkid call over the partitions that exist
+        candidates = [f"{nbd_dev}p{i}" for i in range(1, 8) if Path(f"{nbd_dev}p{i}").exists()]
+        if not candidates:
+            return []
+        r = subprocess.run(
+            ["blkid", "-s", "TYPE", *candidates],
+            capture_output=True, text=True,
+        )
+        return [line.split(":", 1)[0] for line in r.stdout.splitlines()
+                if 'type="ntfs"' in line.lower()]
+
+    @staticmethod
+    def _run_ntfsfix(part: str) -> None:
+        logger.info(f"  Running ntfsfix -d on {part}...")
+        fix_r = subprocess.run(
+            ["ntfsfix", "-d", part],
+            capture_output=True, text=True,
+        )
+        if fix_r.returncode == 0:
+            logger.info(f"  ntfsfix succeeded on {part}")
+        else:
+            logger.warning(f"  ntfsfix on {part}: {fix_r.stderr.strip()[:200]}")
 
     def _inject_virtio_fallback(self, boot_disk, os_family):
         """Fallback VirtIO injection when virt-v2v fails."""
@@ -1370,14 +1794,22 @@ cp /EFI/Microsoft/Boot/bootmgfw.efi /EFI/BOOT/BOOTX64.EFI
 
         Ref: https://github.com/rwmjones/rhsrvany
         """
-        import subprocess
-        virt_tools = Path("/usr/share/virt-tools")
-        rhsrvany = virt_tools / "rhsrvany.exe"
-
-        if rhsrvany.exists():
-            logger.info(f"rhsrvany.exe already present at {rhsrvany}")
+        if _rhsrvany_installed():
             return
+        with _rhsrvany_lock:
+            # Another Windows migration may have installed it meanwhile
+            _rhsrvany_installed.cache_clear()
+            if _rhsrvany_installed():
+                logger.info(f"rhsrvany.exe already present at {RHSRVANY_PATH}")
+                return
+            try:
+                self._install_rhsrvany(RHSRVANY_PATH.parent)
+            finally:
+                _rhsrvany_installed.cache_clear()
 
+    @staticmethod
+    def _install_rhsrvany(virt_tools: Path) -> None:
+        """Extract rhsrvany.exe + pnp_wait.exe from the Fedora RPM into `virt_tools`."""
         logger.info("Installing rhsrvany.exe (required by virt-v2v for Windows)...")
         virt_tools.mkdir(parents=True, exist_ok=True)
 
@@ -1385,26 +1817,36 @@ cp /EFI/Microsoft/Boot/bootmgfw.efi /EFI/BOOT/BOOTX64.EFI
         subprocess.run(["apt-get", "install", "-y", "-qq", "rpm2cpio"], check=False, capture_output=True)
 
         rpm_url = "https://kojipkgs.fedoraproject.org//packages/mingw-srvany/1.1/4.fc38/noarch/mingw32-srvany-1.1-4.fc38.noarch.rpm"
-        tmp_rpm = Path("/tmp/srvany.rpm")
 
         try:
-            subprocess.run(["wget", "-q", "-O", str(tmp_rpm), rpm_url], check=True)
-            # Extract exe files from RPM
-            result = subprocess.run(
-                f"cd /tmp && rpm2cpio {tmp_rpm} | cpio -idmv 2>&1",
-                shell=True, capture_output=True, text=True,
-            )
-            # Find and copy the exe files
-            import glob
-            for exe in glob.glob("/tmp/usr/**/bin/*.exe", recursive=True):
-                dest = virt_tools / Path(exe).name
-                subprocess.run(["cp", exe, str(dest)], check=True)
-                logger.info(f"  Installed {dest}")
+            # Stream the download straight into rpm2cpio | cpio: no wget fork
+            # and no intermediate RPM file. Only the .exe members are
+            # extracted, into a private directory under virt_tools so they
+            # can be renamed into place instead of copied.
+            with tempfile.TemporaryDirectory(prefix=".srvany-", dir=virt_tools) as extract_dir:
+                rpm2cpio = subprocess.Popen(["rpm2cpio", "-"], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+                cpio = subprocess.Popen(
+                    ["cpio", "-idm", "--quiet", "*.exe"],
+                    stdin=rpm2cpio.stdout, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                    cwd=extract_dir, text=True,
+                )
+                rpm2cpio.stdout.close()
+                try:
+                    with urllib.request.urlopen(rpm_url, timeout=60) as resp:
+                        shutil.copyfileobj(resp, rpm2cpio.stdin, 1024 * 1024)
+                finally:
+                    rpm2cpio.stdin.close()
+                    _, cpio_err = cpio.communicate()
+                    rpm2cpio.wait()
+                if rpm2cpio.returncode != 0 or cpio.returncode != 0:
+                    raise RuntimeError(f"RPM extraction failed: {cpio_err.strip()[-200:]}")
+                for exe in Path(extract_dir).rglob("*.exe"):
+                    dest = virt_tools / exe.name
+                    os.replace(exe, dest)
+                    logger.info(f"  Installed {dest}")
         except Exception as e:
             logger.warning(f"Failed to install rhsrvany.exe: {e}")
             logger.warning("Windows virt-v2v conversion may fail. Install manually:")
             logger.warning(f"  wget -O /tmp/srvany.rpm {rpm_url}")
             logger.warning("  cd /tmp && rpm2cpio srvany.rpm | cpio -idmv")
             logger.warning("  cp /tmp/usr/*/bin/*.exe /usr/share/virt-tools/")
-        finally:
-            tmp_rpm.unlink(missing_ok=True)
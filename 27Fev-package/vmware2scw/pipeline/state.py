@@ -1,7 +1,10 @@
 """Migration state persistence for single-VM and batch operations.
 
 Tracks the progress of each VM migration through pipeline stages,
-enabling resume after failure. State is persisted as JSON files.
+enabling resume after failure. State is persisted as JSON files: a full
+snapshot ({migration_id}.json) plus an append-only journal of stage
+events ({migration_id}.log) replayed on load. Writes are performed by a
+background writer thread; flush() waits for them.
 
 Used by:
   - batch_orchestrator.py: Creates MigrationState per VM job
@@ -11,14 +14,24 @@ Used by:
 
 from __future__ import annotations
 
-import json
-from dataclasses import dataclass, field
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, fields
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Optional
 
+import orjson
 
-@dataclass
+from vmware2scw.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass(slots=True)
 class MigrationState:
     """Tracks progress of a single VM migration through the pipeline.
 
@@ -41,10 +54,21 @@ class MigrationState:
     error: Optional[str] = None
     started_at: Any = None      # datetime or str — flexible for both pipeline and batch
     completed_at: Any = None
+    # Set view of completed_stages for O(1) membership; built lazily, never
+    # persisted (orjson skips "_" fields, to_dict() only emits init fields)
+    _stages_set: Optional[set[str]] = field(default=None, init=False, repr=False, compare=False)
+
+    def _stage_set(self) -> set[str]:
+        # Rebuilt when completed_stages was changed behind our back
+        if self._stages_set is None or len(self._stages_set) != len(self.completed_stages):
+            self._stages_set = set(self.completed_stages)
+        return self._stages_set
 
     def mark_stage_complete(self, stage: str) -> None:
         """Record a stage as completed."""
-        if stage not in self.completed_stages:
+        stages = self._stage_set()
+        if stage not in stages:
+            stages.add(stage)
             self.completed_stages.append(stage)
 
     def set_artifact(self, key: str, value: Any) -> None:
@@ -56,21 +80,18 @@ class MigrationState:
         return self.artifacts.get(key, default)
 
     def is_stage_complete(self, stage: str) -> bool:
-        return stage in self.completed_stages
+        return stage in self._stage_set()
 
     def to_dict(self) -> dict:
-        return {
-            "migration_id": self.migration_id,
-            "vm_name": self.vm_name,
-            "target_type": self.target_type,
-            "zone": self.zone,
-            "current_stage": self.current_stage,
-            "completed_stages": self.completed_stages,
-            "artifacts": self.artifacts,
-            "error": self.error,
-            "started_at": self.started_at,
-            "completed_at": self.completed_at,
-        }
+        """Shallow field → value mapping (children are shared, not copied).
+
+        The store itself no longer needs this: orjson serializes the
+        dataclass directly.
+        """
+        return {name: getattr(self, name) for name in _STATE_FIELDS}
+
+
+_STATE_FIELDS = tuple(f.name for f in fields(MigrationState) if f.init)
 
 
 class MigrationStateStore:
@@ -78,44 +99,257 @@ class MigrationStateStore:
 
     Saves/loads migration state as JSON files in the work directory.
     Each migration gets its own state file: {work_dir}/state/{migration_id}.json
+
+    Stage transitions are appended to a journal ({migration_id}.log, one
+    JSON event per line) instead of rewriting the whole state each time.
+    load() replays the journal over the last snapshot; save() writes a
+    fresh snapshot and drops the journal (compaction).
+
+    save() and append_event() only serialize on the caller thread; the
+    file writes happen in FIFO order on a background writer thread, which
+    debounces bursts and skips writes superseded by a later snapshot of
+    the same migration. Call flush() to wait for them (load() does).
+    A failed write (ENOSPC, EIO, read-only state dir...) is re-raised by
+    the next flush(), save() or append_event().
     """
 
+    DEBOUNCE_S = 0.05   # collect back-to-back writes into one batch
+
     def __init__(self, state_dir: Path):
         self.state_dir = state_dir
         self.state_dir.mkdir(parents=True, exist_ok=True)
+        # Pending writes: (kind, migration_id, payload), kind = "snapshot" | "event"
+        self._queue: queue.Queue[tuple[str, str, bytes]] = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self._error: Optional[BaseException] = None  # first failed write, until raised
+        # list_states() memo: snapshot file name → (file signature, parsed state)
+        self._cache: dict[str, tuple[tuple[int, ...], MigrationState]] = {}
 
     def _path(self, migration_id: str) -> Path:
         return self.state_dir / f"{migration_id}.json"
 
+    def _journal_path(self, migration_id: str) -> Path:
+        return self.state_dir / f"{migration_id}.log"
+
     def save(self, state: MigrationState) -> None:
-        """Persist migration state to disk."""
-        path = self._path(state.migration_id)
-        with open(path, "w") as f:
-            json.dump(state.to_dict(), f, indent=2, default=str)
+        """Queue a full migration state snapshot (compacts the journal)."""
+        # orjson serializes the dataclass (and datetimes) natively, so no
+        # intermediate dict is built; default=str only covers odd artifact
+        # values such as Path. Compact output: the file is only read by load()
+        self._raise_writer_error()
+        payload = orjson.dumps(state, default=str)
+        self._enqueue("snapshot", state.migration_id, payload)
+
+    def append_event(self, migration_id: str, event: dict[str, Any]) -> None:
+        """Queue one stage event for the migration journal.
+
+        Event keys:
+            stage: Stage name
+            status: "start", "complete" or "error"
+            artifacts_delta: Artifacts added or changed by the stage (optional)
+            error: Error message (status "error" only)
+
+        Each line is stamped with "t" (time.time_ns()) so the journal also
+        records when every stage transition happened.
+        """
+        self._raise_writer_error()
+        line = orjson.dumps({"t": time.time_ns(), **event}, default=str, option=orjson.OPT_APPEND_NEWLINE)
+        self._enqueue("event", migration_id, line)
+
+    def flush(self) -> None:
+        """Block until every queued snapshot and journal event is on disk.
+
+        Raises:
+            OSError: If a queued write failed
+        """
+        self._queue.join()
+        self._raise_writer_error()
+
+    # ─── Background writer ───────────────────────────────────────────
+
+    def _raise_writer_error(self) -> None:
+        """Raise (once) the first error hit by the writer thread."""
+        with self._writer_lock:
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def _enqueue(self, kind: str, migration_id: str, payload: bytes) -> None:
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._writer_loop, name="state-writer", daemon=True,
+                )
+                self._writer.start()
+        self._queue.put((kind, migration_id, payload))
+
+    def _writer_loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.DEBOUNCE_S
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                logger.warning(f"Failed to persist migration state: {e}")
+                with self._writer_lock:
+                    if self._error is None:
+                        self._error = e
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_batch(self, batch: list[tuple[str, str, bytes]]) -> None:
+        """Write a batch of queued operations in order.
+
+        Anything queued before the last snapshot of the same migration is
+        already contained in that snapshot and is skipped.
+        """
+        last_snapshot = {mid: i for i, (kind, mid, _) in enumerate(batch) if kind == "snapshot"}
+        ops = [op for i, op in enumerate(batch) if i >= last_snapshot.get(op[1], -1)]
+
+        i = 0
+        while i < len(ops):
+            kind, migration_id, payload = ops[i]
+            if kind == "snapshot":
+                # The journal is only dropped once the new snapshot is durable
+                self._atomic_write(self._path(migration_id), payload)
+                self._journal_path(migration_id).unlink(missing_ok=True)
+                i += 1
+                continue
+
+            # Consecutive events of one migration share a single fsync
+            lines = []
+            while i < len(ops) and ops[i][0] == "event" and ops[i][1] == migration_id:
+                lines.append(ops[i][2])
+                i += 1
+            with open(self._journal_path(migration_id), "ab", buffering=0) as f:
+                f.write(b"".join(lines))
+                os.fsync(f.fileno())
+
+    @staticmethod
+    def _atomic_write(path: Path, payload: bytes) -> None:
+        """Crash-consistent file replacement.
+
+        Write-then-rename, so a crash leaves either the old or the new
+        file, never a torn one. O_DSYNC makes the write itself reach stable
+        storage (no separate fsync pass), and the directory is fsync'ed so
+        the rename survives a power loss too.
+        """
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_DSYNC, 0o644)
+        try:
+            view = memoryview(payload)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+        os.replace(tmp, path)
+        dir_fd = os.open(path.parent, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    @staticmethod
+    def _apply_event(state: MigrationState, event: dict[str, Any]) -> None:
+        """Replay a single journal event onto a state."""
+        state.artifacts.update(event.get("artifacts_delta") or {})
+        stage = event.get("stage", "")
+        status = event.get("status")
+        if status == "start":
+            state.current_stage = stage
+            state.error = None
+        elif status == "complete":
+            state.mark_stage_complete(stage)
+        elif status == "error":
+            state.error = event.get("error")
 
     def load(self, migration_id: str) -> MigrationState | None:
-        """Load migration state from disk."""
+        """Load migration state from disk (snapshot + journal replay)."""
+        self.flush()
         path = self._path(migration_id)
         if not path.exists():
             return None
-        with open(path) as f:
-            data = json.load(f)
-        return MigrationState(**data)
+        state = MigrationState(**orjson.loads(path.read_bytes()))
+
+        journal = self._journal_path(migration_id)
+        if journal.exists():
+            with open(journal, "rb") as f:
+                for line in f:
+                    try:
+                        event = orjson.loads(line)
+                    except orjson.JSONDecodeError:
+                        break  # torn final write — ignore the tail
+                    self._apply_event(state, event)
+        return state
+
+    @staticmethod
+    def _signature(st: os.stat_result, journal: Path) -> tuple[int, ...]:
+        """(mtime_ns, size) of the snapshot and its journal (0, 0 if absent)."""
+        try:
+            jst = os.stat(journal)
+            return st.st_mtime_ns, st.st_size, jst.st_mtime_ns, jst.st_size
+        except FileNotFoundError:
+            return st.st_mtime_ns, st.st_size, 0, 0
 
     def list_states(self) -> list[MigrationState]:
-        """List all persisted migration states."""
+        """List all persisted migration states.
+
+        Parsed states are memoized by file mtime and size, so files that
+        did not change since the previous call are not read again. The
+        returned objects are shared with the cache: treat them as read-only.
+        """
+        self.flush()
+        # scandir: one getdents pass, no Path objects or extra lstat per entry
+        listing: list[tuple[str, tuple[int, ...], Optional[MigrationState]]] = []
+        with os.scandir(self.state_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(".json") or not entry.is_file(follow_symlinks=False):
+                    continue
+                journal = self._journal_path(entry.name[:-len(".json")])
+                try:
+                    sig = self._signature(entry.stat(follow_symlinks=False), journal)
+                except OSError:
+                    continue
+                cached = self._cache.get(entry.name)
+                listing.append((entry.name, sig, cached[1] if cached and cached[0] == sig else None))
+
+        # Only changed files are read; do it on a small pool so the reads
+        # and parses of a large batch overlap
+        misses = [name[:-len(".json")] for name, _, state in listing if state is None]
+        if misses:
+            with ThreadPoolExecutor(max_workers=min(8, len(misses)), thread_name_prefix="state-load") as pool:
+                loaded = dict(zip(misses, pool.map(self._load_quiet, misses)))
+        else:
+            loaded = {}
+
         states = []
-        for path in self.state_dir.glob("*.json"):
-            try:
-                with open(path) as f:
-                    data = json.load(f)
-                states.append(MigrationState(**data))
-            except Exception:
-                continue
+        cache = {}
+        for name, sig, state in listing:
+            state = state or loaded.get(name[:-len(".json")])
+            if state:
+                cache[name] = (sig, state)
+                states.append(state)
+        self._cache = cache
         return states
 
+    def _load_quiet(self, migration_id: str) -> MigrationState | None:
+        """load() for list_states(): unreadable files are skipped."""
+        try:
+            return self.load(migration_id)
+        except Exception:
+            return None
+
     def delete(self, migration_id: str) -> None:
-        """Remove a migration state file."""
+        """Remove a migration state file and its journal."""
+        self.flush()
         path = self._path(migration_id)
         if path.exists():
             path.unlink()
+        self._journal_path(migration_id).unlink(missing_ok=True)
@@ -254,6 +254,15 @@ GUEST_OS_MAP: dict[str, tuple[str, str]] = {
 }
 
 
+# Maps VMware guestId fragments to the guest package manager family.
+# "dnf" covers the whole RHEL family (yum and dnf are both attempted).
+PACKAGE_MANAGER_HINTS: dict[str, tuple[str, ...]] = {
+    "apt": ("ubuntu", "debian"),
+    "dnf": ("rhel", "centos", "rocky", "alma", "fedora", "oracle", "amazonlinux"),
+    "zypper": ("sles", "suse"),
+}
+
+
 class ResourceMapper:
     """Maps VMware VM resources to Scaleway instance types.
 
@@ -285,6 +294,19 @@ class ResourceMapper:
 
         return ("linux", f"Unknown ({guest_os_id})")
 
+    def get_package_manager(self, guest_os_id: str) -> str | None:
+        """Detect the Linux package manager family from VMware guestId.
+
+        Returns:
+            "apt", "dnf" or "zypper", or None if the distro is unknown
+            (e.g. "otherLinux64Guest")
+        """
+        guest_lower = guest_os_id.lower()
+        for manager, hints in PACKAGE_MANAGER_HINTS.items():
+            if any(h in guest_lower for h in hints):
+                return manager
+        return None
+
     def suggest_instance_type(
         self,
         cpu: int,
@@ -13,6 +13,7 @@ Covers:
 import json
 import tempfile
 from pathlib import Path
+from types import MappingProxyType
 
 import pytest
 import yaml
@@ -22,7 +23,7 @@ import yaml
 #  Test Data Fixtures
 # ═══════════════════════════════════════════════════════════════════
 
-SAMPLE_VMS = [
+_SAMPLE_VMS = [
     {
         "name": "web-prod-01",
         "cpu": 4,
@@ -115,6 +116,9 @@ SAMPLE_VMS = [
     },
 ]
 
+# Read-only views: a test that mutates the shared fixture fails loudly
+SAMPLE_VMS = tuple(MappingProxyType(vm) for vm in _SAMPLE_VMS)
+
 
 # ═══════════════════════════════════════════════════════════════════
 #  Inventory Filter Tests
@@ -195,6 +199,173 @@ class TestInventoryFilter:
         assert f.matches(SAMPLE_VMS[0])
         assert not f.matches(SAMPLE_VMS[2])
 
+    def test_name_patterns_are_ored(self):
+        from vmware2scw.pipeline.inventory import InventoryFilter
+        f = InventoryFilter.from_cli_filters(["name:db-*", "name:web-prod-0?"])
+        assert f.matches(SAMPLE_VMS[0])  # web-prod-01
+        assert f.matches(SAMPLE_VMS[2])  # db-prod-01
+        assert not f.matches(SAMPLE_VMS[4])  # dev
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  vCenter Inventory Collection Tests
+# ═══════════════════════════════════════════════════════════════════
+
+class _FakeContainer:
+    def __init__(self, view):
+        self.view = view
+        self.destroyed = False
+
+    def Destroy(self):
+        self.destroyed = True
+
+
+class TestVMInventory:
+    def test_list_all_vms_uses_prefetched_properties(self, monkeypatch):
+        from types import SimpleNamespace
+        from pyVmomi import vim
+        import vmware2scw.vmware.inventory as inventory
+
+        dc = vim.Datacenter("datacenter-1")
+        vm_root = vim.Folder("group-v1")
+        web = vim.Folder("group-v2")
+        cluster = vim.ClusterComputeResource("domain-c1")
+        host = vim.HostSystem("host-1")
+        entities = [
+            (dc, {"name": "DC1", "parent": None}),
+            (vm_root, {"name": "vm", "parent": dc}),
+            (web, {"name": "Web", "parent": vm_root}),
+            (cluster, {"name": "prod", "parent": None}),
+            (host, {"name": "esxi-01", "parent": cluster}),
+        ]
+
+        def vm(moid, name, **extra):
+            props = {"name": name, "config.hardware.numCPU": 2, "config.hardware.memoryMB": 4096,
+                     "config.guestId": "ubuntu64Guest", "runtime.host": host, "parent": web}
+            props.update(extra)
+            return vim.VirtualMachine(moid), props
+
+        vms = [vm("vm-1", "a"), vm("vm-2", "tpl", **{"config.template": True}), vm("vm-3", "b")]
+        containers = []
+
+        def get_container_view(types):
+            containers.append(_FakeContainer([]))
+            return containers[-1]
+
+        def retrieve(pc, container, specs):
+            if specs[0][0] is not vim.VirtualMachine:
+                return entities
+            assert specs[0][1] == ["name", "config.template"]
+            return [(obj, {k: props[k] for k in ("name", "config.template") if k in props}) for obj, props in vms]
+
+        requested = []
+
+        def retrieve_objects(pc, objects, specs):
+            requested.extend(str(obj._moId) for obj in objects)
+            return [(obj, props) for obj, props in vms if obj in objects]
+
+        monkeypatch.setattr(inventory, "retrieve_properties", retrieve)
+        monkeypatch.setattr(inventory, "retrieve_object_properties", retrieve_objects)
+        vm_view = _FakeContainer([])
+        client = SimpleNamespace(get_container_view=get_container_view, get_vm_view=lambda: vm_view,
+                                 content=SimpleNamespace(propertyCollector=None))
+        result = inventory.VMInventory(client).list_all_vms()
+
+        assert [v.name for v in result] == ["a", "b"]
+        assert requested == ["vm-1", "vm-3"]  # the template's full properties are never fetched
+        assert result[0].moref == "vm-1"
+        assert (result[0].host, result[0].cluster) == ("esxi-01", "prod")
+        assert (result[0].datacenter, result[0].folder) == ("DC1", "/DC1/Web")
+        # Built with model_construct(): the values must still pass validation
+        assert inventory.VMInfo.model_validate(result[0].model_dump()) == result[0]
+        assert all(c.destroyed for c in containers) and len(containers) == 1
+        assert not vm_view.destroyed  # owned by the client, reused across calls
+
+    def test_find_vm_by_name_indexes_names_once(self, monkeypatch):
+        from types import SimpleNamespace
+        from pyVmomi import vim
+        import vmware2scw.vmware.client as client_mod
+
+        vms = [(vim.VirtualMachine("vm-1"), {"name": "web-01"}), (vim.VirtualMachine("vm-2"), {"name": "db-01"})]
+        retrievals = []
+
+        def retrieve(pc, container, specs):
+            retrievals.append(specs)
+            return vms
+
+        monkeypatch.setattr(client_mod, "retrieve_properties", retrieve)
+        client = client_mod.VSphereClient()
+        client._content = SimpleNamespace(propertyCollector=None)
+        views = []
+        monkeypatch.setattr(client, "get_container_view", lambda types: views.append(_FakeContainer([])) or views[-1])
+
+        assert client.find_vm_by_name("db-01")._moId == "vm-2"
+        assert client.find_vm_by_name("web-01")._moId == "vm-1"
+        assert client.find_vm_by_moref("vm-2") is client.find_vm_by_name("db-01")
+        assert len(retrievals) == 1
+        assert client.find_vm_by_name("missing") is None
+        assert len(retrievals) == 2  # a miss refreshes the index
+        assert len(views) == 1 and not views[0].destroyed  # one cached view
+
+        monkeypatch.setattr(client_mod, "Disconnect", lambda si: None)
+        client._si = object()
+        client._safe_disconnect()
+        assert views[0].destroyed and client._vm_view is None
+
+    def test_parent_chain_is_walked_once_per_folder(self):
+        from pyVmomi import vim
+        from vmware2scw.vmware.inventory import _EntityIndex, _get_datacenter, _get_folder_path
+
+        dc, root, web = vim.Datacenter("datacenter-1"), vim.Folder("group-v1"), vim.Folder("group-v2")
+        index = _EntityIndex({
+            "datacenter-1": {"name": "DC1", "parent": None},
+            "group-v1": {"name": "vm", "parent": dc},
+            "group-v2": {"name": "Web", "parent": root},
+        })
+        walked = []
+        parent = index.parent
+        index.parent = lambda entity: walked.append(entity._moId) or parent(entity)
+
+        for _ in range(3):
+            assert _get_folder_path(web, index) == "/DC1/Web"
+            assert _get_datacenter(web, index) == "DC1"
+        assert walked.count("group-v2") == 2  # one folder walk + one datacenter walk
+
+    def test_nic_adapter_types(self):
+        from pyVmomi import vim
+        from vmware2scw.vmware.inventory import _adapter_type
+        dev = vim.vm.device
+        assert _adapter_type(dev.VirtualVmxnet3) == "vmxnet3"
+        assert _adapter_type(dev.VirtualE1000e) == "e1000e"
+        assert _adapter_type(dev.VirtualSriovEthernetCard) == "sriov"
+        assert _adapter_type(dev.VirtualVmxnet2) == "vmxnet2"  # derived from the class name
+
+    def test_flatten_snapshots_depth_first(self):
+        from types import SimpleNamespace
+        from vmware2scw.vmware.inventory import _flatten_snapshots
+
+        def snap(name, *children):
+            return SimpleNamespace(name=name, childSnapshotList=list(children))
+
+        roots = [snap("base", snap("a", snap("a1")), snap("b")), snap("other")]
+        assert _flatten_snapshots(roots) == ["base", "a", "a1", "b", "other"]
+
+    def test_disk_controller_types(self):
+        from pyVmomi import vim
+        from vmware2scw.vmware.inventory import _collect_vm_info, _EntityIndex
+        dev = vim.vm.device
+        devices = [
+            dev.VirtualNVMEController(key=1000),
+            dev.VirtualIDEController(key=200),
+            dev.VirtualDisk(key=2000, controllerKey=1000, capacityInKB=1024 * 1024),
+            dev.VirtualDisk(key=2001, controllerKey=200, capacityInKB=1024 * 1024),
+            dev.VirtualDisk(key=2002, controllerKey=7, capacityInKB=1024 * 1024),
+        ]
+        props = {"name": "a", "config.hardware.numCPU": 1, "config.hardware.device": devices}
+        info = _collect_vm_info(vim.VirtualMachine("vm-1"), props, _EntityIndex())
+        assert [d.controller_type for d in info.disks] == ["nvme", "ide", "scsi"]
+        assert info.total_disk_gb == 3.0
+
 
 # ═══════════════════════════════════════════════════════════════════
 #  Batch Plan Tests
@@ -347,6 +518,16 @@ class TestResourceMapper:
         family, desc = mapper.get_os_family("unknownGuest")
         assert family == "linux"  # Default to linux
 
+    def test_package_manager_detection(self):
+        from vmware2scw.scaleway.mapping import ResourceMapper
+        mapper = ResourceMapper()
+        assert mapper.get_package_manager("ubuntu64Guest") == "apt"
+        assert mapper.get_package_manager("debian12_64Guest") == "apt"
+        assert mapper.get_package_manager("rhel9_64Guest") == "dnf"
+        assert mapper.get_package_manager("rockylinux_64Guest") == "dnf"
+        assert mapper.get_package_manager("sles15_64Guest") == "zypper"
+        assert mapper.get_package_manager("otherLinux64Guest") is None
+
     def test_validate_mapping_ok(self):
         from vmware2scw.scaleway.mapping import ResourceMapper
         mapper = ResourceMapper()
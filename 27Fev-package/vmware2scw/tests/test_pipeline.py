@@ -0,0 +1,837 @@
+"""Tests for the single-VM migration pipeline.
+
+Covers:
+  - DAG scheduling (order, cycles, failure propagation)
+  - MigrationPipeline run/resume with stubbed stages
+  - MigrationStateStore snapshot + journal replay
+"""
+
+import threading
+from pathlib import Path
+
+import pytest
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  DAG Scheduler Tests
+# ═══════════════════════════════════════════════════════════════════
+
+class TestDAGPipeline:
+    def test_topological_order(self):
+        from vmware2scw.pipeline.dag import DAGPipeline, Task
+        dag = DAGPipeline([
+            Task("upload", {"convert"}),
+            Task("export"),
+            Task("convert", {"export"}),
+        ])
+        assert dag.order() == ["export", "convert", "upload"]
+
+    def test_cycle_detected(self):
+        from vmware2scw.pipeline.dag import DAGPipeline, Task
+        with pytest.raises(ValueError, match="cycle"):
+            DAGPipeline([Task("a", {"b"}), Task("b", {"a"})])
+
+    def test_unknown_dependency(self):
+        from vmware2scw.pipeline.dag import DAGPipeline, Task
+        with pytest.raises(ValueError, match="unknown"):
+            DAGPipeline([Task("a", {"missing"})])
+
+    def test_independent_tasks_run_concurrently(self):
+        from vmware2scw.pipeline.dag import DAGPipeline, Task
+        barrier = threading.Barrier(2, timeout=5)
+        done = []
+        dag = DAGPipeline([
+            Task("a", set(), barrier.wait),
+            Task("b", set(), barrier.wait),
+            Task("c", {"a", "b"}, lambda: done.append("c")),
+        ])
+        dag.run()
+        assert done == ["c"]
+
+    def test_completed_tasks_skipped(self):
+        from vmware2scw.pipeline.dag import DAGPipeline, Task
+        ran = []
+        dag = DAGPipeline([
+            Task("a", set(), lambda: ran.append("a")),
+            Task("b", {"a"}, lambda: ran.append("b")),
+        ])
+        dag.run(completed={"a"})
+        assert ran == ["b"]
+
+    def test_failure_stops_dependents(self):
+        from vmware2scw.pipeline.dag import DAGPipeline, Task, TaskFailedError
+        ran = []
+
+        def boom():
+            raise RuntimeError("disk full")
+
+        dag = DAGPipeline([
+            Task("a", set(), boom),
+            Task("b", {"a"}, lambda: ran.append("b")),
+        ])
+        with pytest.raises(TaskFailedError) as exc:
+            dag.run()
+        assert exc.value.task == "a"
+        assert "disk full" in str(exc.value)
+        assert ran == []
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  MigrationPipeline Tests
+# ═══════════════════════════════════════════════════════════════════
+
+def _make_pipeline(tmp_path: Path, guest_os: str = "ubuntu64Guest", fail_on: str = ""):
+    from vmware2scw.config import AppConfig
+    from vmware2scw.pipeline.migration import MigrationPipeline
+
+    config = AppConfig()
+    config.conversion.work_dir = tmp_path
+    pipeline = MigrationPipeline(config)
+    executed = []
+
+    def fake_execute(stage, plan, state):
+        if stage == fail_on:
+            raise RuntimeError(f"{stage} broke")
+        if stage == "validate":
+            state.artifacts["vm_info"] = {"guest_os": guest_os}
+        executed.append(stage)
+
+    pipeline._execute_stage = fake_execute
+    return pipeline, executed
+
+
+class TestMigrationPipeline:
+    def test_every_stage_has_a_handler(self, tmp_path):
+        from vmware2scw.config import AppConfig
+        from vmware2scw.pipeline.migration import MigrationPipeline
+        config = AppConfig()
+        config.conversion.work_dir = tmp_path
+        pipeline = MigrationPipeline(config)
+        for stage in MigrationPipeline.STAGES_LINUX + MigrationPipeline.STAGES_WINDOWS:
+            assert stage in pipeline._handlers
+
+    def test_run_linux_stages(self, tmp_path):
+        from vmware2scw.config import VMMigrationPlan
+        from vmware2scw.pipeline.migration import MigrationPipeline
+        pipeline, executed = _make_pipeline(tmp_path)
+        result = pipeline.run(VMMigrationPlan(vm_name="web-01", target_type="POP2-2C-8G"))
+        assert result.success
+        assert executed == MigrationPipeline.STAGES_LINUX
+
+    def test_run_switches_to_windows_after_validate(self, tmp_path):
+        from vmware2scw.config import VMMigrationPlan
+        from vmware2scw.pipeline.migration import MigrationPipeline
+        pipeline, executed = _make_pipeline(tmp_path, guest_os="windows2019srv_64Guest")
+        result = pipeline.run(VMMigrationPlan(vm_name="win-01", target_type="POP2-2C-8G-WIN"))
+        assert result.success
+        assert executed == MigrationPipeline.STAGES_WINDOWS
+
+    def test_skip_validation(self, tmp_path):
+        from vmware2scw.config import VMMigrationPlan
+        pipeline, executed = _make_pipeline(tmp_path)
+        plan = VMMigrationPlan(vm_name="web-01", target_type="POP2-2C-8G", skip_validation=True)
+        assert pipeline.run(plan).success
+        assert "validate" not in executed
+        assert executed[0] == "snapshot"
+
+    def test_os_family_cached_in_artifacts(self, tmp_path):
+        from vmware2scw.pipeline.migration import MigrationPipeline
+        from vmware2scw.pipeline.state import MigrationState
+        state = MigrationState(migration_id="m1", vm_name="win-01")
+        state.artifacts["vm_info"] = {"guest_os": "windows2019srv_64Guest"}
+        assert MigrationPipeline._os_family(state) == "windows"
+        assert state.artifacts["os_family"] == "windows"
+
+        state.artifacts["vm_info"] = {"guest_os": "ubuntu64Guest"}
+        assert MigrationPipeline._os_family(state) == "windows"  # cached value wins
+
+    def test_guestfs_env_without_fixed_appliance(self, tmp_path, monkeypatch):
+        import vmware2scw.pipeline.migration as migration
+        monkeypatch.setattr(migration.shutil, "which", lambda tool: None)
+        pipeline, _ = _make_pipeline(tmp_path)
+        env = pipeline._ensure_guestfs_appliance()
+        assert env == {"LIBGUESTFS_BACKEND": "direct", "LIBGUESTFS_MEMSIZE": "2048"}
+        assert pipeline._ensure_guestfs_appliance() is env
+
+    def test_guestfs_env_uses_cached_appliance(self, tmp_path):
+        (tmp_path / "guestfs-appliance").mkdir()
+        (tmp_path / "guestfs-appliance" / "root").touch()
+        pipeline, _ = _make_pipeline(tmp_path)
+        env = pipeline._ensure_guestfs_appliance()
+        assert env["LIBGUESTFS_PATH"] == str(tmp_path / "guestfs-appliance")
+        assert env["LIBGUESTFS_BACKEND"] == "direct"
+
+    def test_virt_customize_commands_from_file(self, tmp_path):
+        pipeline, _ = _make_pipeline(tmp_path)
+        pipeline._commands_from_file = True
+        cmds_file = tmp_path / "disk.cmds"
+        cmd = pipeline._virt_customize_cmd("disk.qcow2", [
+            "--upload", "/w/a.sh:/tmp/a.sh",
+            "--run-command", "echo one\necho two",
+        ], cmds_file)
+        assert cmd[:3] == ["virt-customize", "-a", "disk.qcow2"]
+        assert cmd[-2:] == ["--commands-from-file", str(cmds_file)]
+        assert cmds_file.read_text() == "upload /w/a.sh:/tmp/a.sh\nrun-command echo one\\\necho two\n"
+
+    def test_virt_customize_flags_fallback(self, tmp_path):
+        pipeline, _ = _make_pipeline(tmp_path)
+        pipeline._commands_from_file = False
+        cmd = pipeline._virt_customize_cmd("disk.qcow2", ["--run-command", "true"], tmp_path / "x.cmds")
+        assert cmd[:3] == ["virt-customize", "-a", "disk.qcow2"]
+        assert cmd[-2:] == ["--run-command", "true"]
+        assert "--no-network" in cmd
+        assert not (tmp_path / "x.cmds").exists()
+
+    def test_adapt_linux_guest_runs_one_script(self, monkeypatch):
+        import subprocess
+        import vmware2scw.converter.adapt_guest as adapt_guest
+        calls = []
+
+        def fake_run(cmd, check=True, **kw):
+            calls.append((cmd, open(cmd[-1]).read()))
+
+        monkeypatch.setattr(adapt_guest, "run_streamed", lambda cmd, **kw: fake_run(cmd))
+        monkeypatch.setattr(adapt_guest, "guestfs", None)
+        adapt_guest.adapt_linux_guest("/tmp/boot.qcow2")
+        (cmd, script), = calls
+        assert cmd[:4] == ["virt-customize", "-a", "/tmp/boot.qcow2", "--memsize"]
+        assert cmd[cmd.index("--smp") + 1] == str(adapt_guest.APPLIANCE_SMP)
+        assert cmd[-2] == "--run"
+        assert "--run-command" not in cmd and "update-initramfs -u" in script
+        assert adapt_guest.UEFI_FALLBACK_CMD in script
+        assert adapt_guest.GRUB_DEFAULTS_CMD in script and "sed -i" not in adapt_guest.GRUB_DEFAULTS_CMD
+        assert subprocess.run(["sh", "-n"], input=script, text=True).returncode == 0
+
+    def test_adapt_linux_guest_in_process_with_guestfs(self, monkeypatch):
+        from types import SimpleNamespace
+        import vmware2scw.converter.adapt_guest as adapt_guest
+        calls = []
+
+        class FakeGuestFS:
+            def __init__(self, **kw):
+                self.files = {}
+
+            def __getattr__(self, name):
+                return lambda *a, **kw: calls.append(name)
+
+            def inspect_os(self):
+                return ["/dev/sda2"]
+
+            def inspect_get_mountpoints(self, root):
+                return {"/boot": "/dev/sda1", "/": "/dev/sda2"}
+
+            def mount(self, dev, mountpoint):
+                calls.append(f"mount {mountpoint}")
+
+            def write(self, path, content):
+                self.files[path] = content
+
+            def sh(self, cmd):
+                calls.append(f"sh {cmd}")
+                assert "update-initramfs -u" in self.files[cmd]
+
+        monkeypatch.setattr(adapt_guest, "guestfs", SimpleNamespace(GuestFS=FakeGuestFS))
+        monkeypatch.setattr(adapt_guest, "run_streamed", lambda *a, **kw: calls.append("virt-customize"))
+        adapt_guest.adapt_linux_guest("/tmp/boot.qcow2")
+        assert "virt-customize" not in calls
+        assert calls.index("set_memsize") < calls.index("launch") < calls.index("mount /")
+        assert calls.index("mount /") < calls.index("mount /boot") < calls.index(f"sh {adapt_guest.GUEST_SCRIPT}")
+        assert calls[-3:] == ["umount_all", "shutdown", "close"]
+
+    def test_find_ntfs_partitions_single_lsblk(self, monkeypatch):
+        import subprocess
+        import vmware2scw.pipeline.migration as migration
+        calls = []
+
+        def fake_run(cmd, **kwargs):
+            calls.append(cmd)
+            return subprocess.CompletedProcess(cmd, 0, stdout="nbd0 \nnbd0p1 vfat\nnbd0p2 ntfs\nnbd0p3 ntfs\n", stderr="")
+
+        monkeypatch.setattr(migration.subprocess, "run", fake_run)
+        parts = migration.MigrationPipeline._find_ntfs_partitions("/dev/nbd0")
+        assert parts == ["/dev/nbd0p2", "/dev/nbd0p3"]
+        assert len(calls) == 1 and calls[0][0] == "lsblk"
+
+    def test_replace_disk_same_filesystem_renames(self, tmp_path):
+        from vmware2scw.pipeline.migration import MigrationPipeline
+        src = tmp_path / "v2v-out" / "v2v-disk0-sda"
+        src.parent.mkdir()
+        src.write_bytes(b"new")
+        dst = tmp_path / "disk0.qcow2"
+        dst.write_bytes(b"old")
+        assert MigrationPipeline._replace_disk(src, dst) == dst
+        assert dst.read_bytes() == b"new"
+        assert not src.exists()
+
+    def test_replace_disk_cross_device_keeps_source(self, tmp_path, monkeypatch):
+        import errno
+        import vmware2scw.pipeline.migration as migration
+
+        def exdev(src, dst):
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+        monkeypatch.setattr(migration.os, "replace", exdev)
+        src = tmp_path / "v2v-disk0-sda"
+        src.write_bytes(b"new")
+        dst = tmp_path / "disk0.qcow2"
+        dst.write_bytes(b"old")
+        assert migration.MigrationPipeline._replace_disk(src, dst) == src
+        assert src.read_bytes() == b"new"
+        assert not dst.exists()
+
+    def test_move_sparse_cross_device_keeps_holes(self, tmp_path, monkeypatch):
+        import errno
+        import vmware2scw.utils.subprocess as sp
+
+        def exdev(src, dst):
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+        monkeypatch.setattr(sp.os, "replace", exdev)
+        src = tmp_path / "merged.qcow2"
+        with open(src, "wb") as f:
+            f.write(b"head")
+            f.truncate(64 * 1024 * 1024)
+        dst = tmp_path / "disk0.qcow2"
+        sp.move_sparse(src, dst)
+        assert not src.exists()
+        assert dst.stat().st_size == 64 * 1024 * 1024
+        assert dst.stat().st_blocks * 512 < 1024 * 1024
+
+    def test_bios_to_uefi_uses_nbd_on_recent_qemu(self, monkeypatch):
+        import vmware2scw.converter.bios2uefi as b2u
+        calls = []
+        monkeypatch.setattr(b2u, "detect_boot_type", lambda path: "bios-mbr")
+        monkeypatch.setattr(b2u, "_run", lambda cmd, **kw: calls.append(cmd[0]))
+        monkeypatch.setattr(b2u, "_run_streamed", lambda cmd, **kw: calls.append(cmd[0]))
+        monkeypatch.setattr(b2u, "_add_esp_via_nbd", lambda *a: calls.append("nbd") or 3)
+        monkeypatch.setattr(b2u, "_add_esp_via_raw", lambda *a: calls.append("raw") or 3)
+
+        for version, path in (((8, 2), "nbd"), ((6, 2), "raw"), (None, "raw")):
+            calls.clear()
+            monkeypatch.setattr(b2u, "_qemu_nbd_version", lambda: version)
+            assert b2u.convert_bios_to_uefi("/tmp/disk.qcow2") is True
+            assert calls == [path, "virt-customize"]
+
+    def test_overlapping_nbd_conversions_get_different_devices(self, tmp_path, monkeypatch):
+        import pytest
+        from vmware2scw.utils import nbd
+        for n in range(4):
+            (tmp_path / f"nbd{n}").mkdir()
+        (tmp_path / "nbd1" / "pid").write_text("4242")  # held by another qemu-nbd
+        calls = []
+
+        def fake_streamed(cmd, **kw):
+            calls.append(cmd)
+            if cmd[1:3] == ["--connect", "/dev/nbd2"]:
+                (tmp_path / "nbd2" / "pid").write_text("4343")  # lost the race to another process
+                raise RuntimeError("Device busy")
+
+        monkeypatch.setattr(nbd, "NBD_SYSFS", str(tmp_path))
+        monkeypatch.setattr(nbd, "run_streamed", fake_streamed)
+        monkeypatch.setattr(nbd, "_claimed", set())
+
+        first = nbd.connect_nbd("a.esp.qcow2", "--format=qcow2")
+        second = nbd.connect_nbd("b.esp.qcow2", "--format=qcow2")
+        assert (first, second) == ("/dev/nbd0", "/dev/nbd3")
+        with pytest.raises(RuntimeError, match="No free NBD device"):
+            nbd.connect_nbd("c.esp.qcow2")
+
+        nbd.disconnect_nbd(first)
+        nbd.disconnect_nbd("/dev/nbd1")  # not ours: left alone
+        disconnects = [cmd[2] for cmd in calls if cmd[1] == "--disconnect"]
+        assert disconnects == ["/dev/nbd0"]
+        assert nbd.connect_nbd("c.esp.qcow2") == "/dev/nbd0"
+
+    def test_nbd_connect_error_not_retried_on_other_devices(self, tmp_path, monkeypatch):
+        import pytest
+        from vmware2scw.utils import nbd
+        for n in range(3):
+            (tmp_path / f"nbd{n}").mkdir()
+        calls = []
+
+        def unsupported(cmd, **kw):
+            calls.append(cmd)
+            raise RuntimeError("invalid aio mode 'io_uring'")
+
+        monkeypatch.setattr(nbd, "NBD_SYSFS", str(tmp_path))
+        monkeypatch.setattr(nbd, "run_streamed", unsupported)
+        monkeypatch.setattr(nbd, "_claimed", set())
+        with pytest.raises(RuntimeError, match="io_uring"):
+            nbd.connect_nbd("win.qcow2", "--aio=io_uring")
+        assert len(calls) == 1
+
+    def test_ntfs_fix_uses_its_own_nbd_device(self, tmp_path, monkeypatch):
+        from vmware2scw.pipeline import migration
+        events = []
+
+        def fake_connect(image, *options):
+            events.append(("connect", options))
+            if options:
+                raise RuntimeError("invalid aio mode")
+            return "/dev/nbd5"
+
+        monkeypatch.setattr(migration, "connect_nbd", fake_connect)
+        monkeypatch.setattr(migration, "disconnect_nbd", lambda dev: events.append(("disconnect", dev)))
+        monkeypatch.setattr(migration.time, "sleep", lambda s: None)
+        monkeypatch.setattr(migration.subprocess, "run", lambda cmd, **kw: migration.subprocess.CompletedProcess(cmd, 1, "", ""))
+        pipeline, _ = _make_pipeline(tmp_path)
+        pipeline._ensure_guestfs_appliance = lambda: {}
+        pipeline._find_ntfs_partitions = lambda dev: events.append(("find", dev)) or []
+        pipeline._fix_ntfs_dirty_flag(tmp_path / "win.qcow2")
+        assert events[1:] == [("connect", ()), ("find", "/dev/nbd5"), ("disconnect", "/dev/nbd5")]
+
+    def test_detect_boot_type_single_guestfish_session(self, monkeypatch):
+        import subprocess
+        import vmware2scw.converter.bios2uefi as b2u
+        calls = []
+
+        def fake_run(cmd, **kw):
+            calls.append(cmd)
+            if "-i" in cmd:  # inspection fails: no OS found
+                return subprocess.CompletedProcess(cmd, 1, stdout="", stderr="no operating system")
+            out = "@@parttype\ngpt\n@@gpt1\n21686148-6449-6E6F-744E-656564454649\n@@gpt2\n"
+            out += "c12a7328-f81f-11d2-ba4b-00a0c93ec93b\n@@gpt3\n"
+            return subprocess.CompletedProcess(cmd, 0, stdout=out, stderr="")
+
+        monkeypatch.setattr(b2u.subprocess, "run", fake_run)
+        monkeypatch.setattr(b2u, "guestfs", None)
+        assert b2u.detect_boot_type("/tmp/disk.qcow2") == "uefi"
+        assert len(calls) == 2 and calls[1][calls[1].index("--") + 1] == "run"
+
+    def test_detect_boot_type_probes_existing_partitions_only(self, monkeypatch):
+        from types import SimpleNamespace
+        import vmware2scw.converter.bios2uefi as b2u
+        probed = []
+
+        class FakeHandle:
+            def set_backend(self, backend):
+                pass
+
+            def add_drive_opts(self, disk, **kw):
+                assert kw["readonly"] == 1
+
+            def launch(self):
+                pass
+
+            def part_get_parttype(self, dev):
+                return "gpt"
+
+            def part_list(self, dev):
+                return [{"part_num": 1}, {"part_num": 2}]
+
+            def part_get_gpt_type(self, dev, num):
+                probed.append(num)
+                return "0FC63DAF-8483-4772-8E79-3D69D8477DE4"
+
+            def inspect_os(self):
+                return ["/dev/sda2"]
+
+            def inspect_get_mountpoints(self, root):
+                return {"/": "/dev/sda2", "/boot/efi": "/dev/sda1"}
+
+            def close(self):
+                pass
+
+        monkeypatch.setattr(b2u, "guestfs", SimpleNamespace(GuestFS=lambda **kw: FakeHandle()))
+        assert b2u.detect_boot_type("/tmp/disk.qcow2") == "uefi"  # via the /boot/efi mountpoint
+        assert probed == [1, 2]
+
+    def test_detect_boot_type_cached_until_image_changes(self, tmp_path, monkeypatch):
+        import os
+        import vmware2scw.converter.bios2uefi as b2u
+        probes = []
+        monkeypatch.setattr(b2u, "_probe_disk", lambda path: probes.append(path) or {"parttype": ["msdos"]})
+        b2u._detect_boot_type_cached.cache_clear()
+        disk = tmp_path / "disk.qcow2"
+        disk.write_bytes(b"qcow")
+
+        assert b2u.detect_boot_type(str(disk)) == "bios-mbr"
+        assert b2u.detect_boot_type(str(disk)) == "bios-mbr"
+        assert len(probes) == 1
+
+        st = disk.stat()
+        os.utime(disk, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+        b2u.detect_boot_type(str(disk))
+        assert len(probes) == 2
+
+    def test_gpt_backup_header_fixed_only_when_misplaced(self, tmp_path, monkeypatch):
+        import struct
+        import subprocess
+        import vmware2scw.converter.bios2uefi as b2u
+        calls = []
+        monkeypatch.setattr(b2u, "_run_streamed", lambda cmd, **kw: calls.append(cmd[1]))
+        monkeypatch.setattr(b2u, "_run", lambda cmd, **kw: subprocess.CompletedProcess(
+            cmd, 0, stdout="   1   2048   4095   1 MiB   8300\n", stderr=""))
+        raw = tmp_path / "disk.raw"
+
+        for alternate_lba, fixed in ((127, False), (100, True)):
+            calls.clear()
+            image = bytearray(128 * 512)
+            image[512:552] = b"EFI PART" + bytes(24) + struct.pack("<Q", alternate_lba)
+            raw.write_bytes(bytes(image))
+            assert b2u._gpt_backup_ok(str(raw)) is not fixed
+            assert b2u._make_esp(str(raw), "bios-gpt", 200) == 2
+            assert ("-e" in calls) is fixed
+
+    def test_convert_image_falls_back_without_direct_io(self, monkeypatch):
+        import vmware2scw.converter.bios2uefi as b2u
+        calls = []
+
+        def fake_streamed(cmd, **kw):
+            calls.append(cmd)
+            if "none" in cmd:
+                raise RuntimeError("O_DIRECT not supported")
+
+        monkeypatch.setattr(b2u, "_run_streamed", fake_streamed)
+        b2u._convert_image("a.qcow2", "qcow2", "a.raw", "raw")
+        assert calls[0][:6] == ["qemu-img", "convert", "-t", "none", "-T", "none"]
+        assert "-W" in calls[0] and "-m" in calls[0]
+        assert calls[1] == ["qemu-img", "convert", "-m", "16", "-W",
+                            "-f", "qcow2", "-O", "raw", "a.qcow2", "a.raw"]
+
+        calls.clear()
+        b2u._convert_image("a.raw", "raw", "a.qcow2", "qcow2")
+        assert "-W" not in calls[0]
+
+    def test_windows_uefi_fallback_checks_source_before_writing(self, monkeypatch):
+        import subprocess
+        from vmware2scw.pipeline import migration
+        scripts = []
+
+        def fake_run(cmd, input=None, **kw):
+            if "--ro" in cmd:
+                return subprocess.CompletedProcess(cmd, 0, stdout="/dev/sda1: vfat\n/dev/sda2: ntfs\n", stderr="")
+            scripts.append(input.splitlines())
+            return subprocess.CompletedProcess(cmd, 1, stdout="", stderr="filesize: No such file or directory")
+
+        monkeypatch.setattr(migration.subprocess, "run", fake_run)
+        pipeline = migration.MigrationPipeline.__new__(migration.MigrationPipeline)
+        monkeypatch.setattr(pipeline, "_ensure_guestfs_appliance", lambda: {}, raising=False)
+        pipeline._ensure_windows_uefi_fallback_fixed("/tmp/win.qcow2")
+
+        (script,) = scripts
+        assert script[1] == "mount /dev/sda1 /"
+        assert script[2].startswith("filesize ") and script.index("mkdir-p /EFI/BOOT") == 3
+
+    def test_read_gpt_entry(self, tmp_path):
+        import struct
+        import pytest
+        from vmware2scw.converter.bios2uefi import _read_gpt_entry
+        image = bytearray(34 * 512)
+        header = b"EFI PART" + bytes(64) + struct.pack("<QII", 2, 128, 128)
+        image[512:512 + len(header)] = header
+        entry = 2 * 512 + 128  # partition 2
+        image[entry + 32:entry + 48] = struct.pack("<QQ", 2048, 2048 + 409599)
+        raw = tmp_path / "disk.raw"
+        raw.write_bytes(bytes(image))
+        assert _read_gpt_entry(str(raw), 2) == (2048, 409600)
+        with pytest.raises(RuntimeError, match="empty"):
+            _read_gpt_entry(str(raw), 3)
+
+    def test_rhsrvany_install_is_memoized(self, tmp_path, monkeypatch):
+        import vmware2scw.pipeline.migration as migration
+        exe = tmp_path / "virt-tools" / "rhsrvany.exe"
+        monkeypatch.setattr(migration, "RHSRVANY_PATH", exe)
+        migration._rhsrvany_installed.cache_clear()
+        installs = []
+
+        def fake_install(virt_tools):
+            installs.append(virt_tools)
+            virt_tools.mkdir()
+            exe.touch()
+
+        pipeline, _ = _make_pipeline(tmp_path)
+        monkeypatch.setattr(pipeline, "_install_rhsrvany", fake_install)
+        pipeline._ensure_rhsrvany()
+        pipeline._ensure_rhsrvany()
+        assert installs == [exe.parent]
+        assert migration._rhsrvany_installed.cache_info().currsize == 1
+        migration._rhsrvany_installed.cache_clear()
+
+    def test_run_command_progress_on_carriage_returns(self):
+        from vmware2scw.utils.subprocess import run_command
+        seen = []
+        script = 'for i in 10 50 100; do printf "    (%s.00/100%%)\\r" $i >&2; done'
+        run_command(["bash", "-c", script], progress_pattern=r"\((\d+\.\d+)/100%\)", progress_callback=seen.append)
+        assert seen == [10.0, 50.0, 100.0]
+
+    def test_progress_patterns_compiled_once(self):
+        from vmware2scw.utils.subprocess import QEMU_IMG_PROGRESS, _progress_regex
+        assert _progress_regex(r"(\d+)%") is _progress_regex(r"(\d+)%")
+        assert _progress_regex(QEMU_IMG_PROGRESS) is QEMU_IMG_PROGRESS
+        assert QEMU_IMG_PROGRESS.search("    (100/100%)").group(1) == "100"
+        assert QEMU_IMG_PROGRESS.search("    (42.50/100%)").group(1) == "42.50"
+
+    def test_run_command_async_shares_one_loop(self):
+        import asyncio
+        import pytest
+        from vmware2scw.utils.subprocess import run_command_async
+        seen = {0: [], 1: []}
+        script = 'for i in 10 100; do printf "(%s.00/100%%)\\r" $i >&2; done; echo done'
+
+        async def main():
+            return await asyncio.gather(*(
+                run_command_async(["bash", "-c", script], progress_pattern=r"\((\d+\.\d+)/100%\)",
+                                  progress_callback=seen[i].append)
+                for i in range(2)
+            ))
+
+        results = asyncio.run(main())
+        assert [r.stdout for r in results] == ["done\n", "done\n"]
+        assert seen == {0: [10.0, 100.0], 1: [10.0, 100.0]}
+        with pytest.raises(RuntimeError, match="timed out"):
+            asyncio.run(run_command_async(["sleep", "5"], timeout=0.1))
+
+    def test_run_streamed_keeps_stderr_tail(self):
+        import pytest
+        from vmware2scw.utils.subprocess import run_streamed
+        script = 'seq 1 1000; for i in $(seq 1 200); do echo "err $i" >&2; done; exit 2'
+        result = run_streamed(["bash", "-c", script], check=False, tail_lines=3)
+        assert result.returncode == 2 and result.stdout is None
+        assert result.stderr.split() == ["err", "198", "err", "199", "err", "200"]
+        with pytest.raises(RuntimeError, match="err 200"):
+            run_streamed(["bash", "-c", script])
+
+    def test_run_commands_parallel_keeps_submission_order(self):
+        import pytest
+        from vmware2scw.utils.subprocess import run_commands_parallel
+        specs = [{"cmd": ["bash", "-c", f"sleep 0.0{3 - i}; echo {i}"]} for i in range(3)]
+        results = run_commands_parallel(specs, max_workers=3)
+        assert [r.stdout.strip() for r in results] == ["0", "1", "2"]
+        assert run_commands_parallel([]) == []
+        with pytest.raises(RuntimeError, match="exit 3"):
+            run_commands_parallel([{"cmd": ["true"]}, {"cmd": ["bash", "-c", "exit 3"]}])
+
+    def test_rmtree_sum(self, tmp_path):
+        from vmware2scw.pipeline.migration import MigrationPipeline
+        work = tmp_path / "m1"
+        (work / "v2v-out").mkdir(parents=True)
+        (work / "disk0.qcow2").write_bytes(b"x" * 100)
+        (work / "v2v-out" / "disk0-sda").write_bytes(b"y" * 50)
+        assert MigrationPipeline._rmtree_sum(work) == 150
+        assert not work.exists()
+
+    def test_virt_customize_appliance_sizing(self, tmp_path):
+        pipeline, _ = _make_pipeline(tmp_path)
+        pipeline.config.conversion.guestfs_memsize = 4096
+        pipeline.config.conversion.guestfs_smp = 2
+        assert pipeline._virt_customize_opts() == ["--no-network", "--memsize", "4096", "--smp", "2"]
+
+    def test_failure_then_resume(self, tmp_path):
+        from vmware2scw.config import VMMigrationPlan
+        pipeline, executed = _make_pipeline(tmp_path, fail_on="upload_s3")
+        result = pipeline.run(VMMigrationPlan(vm_name="web-01", target_type="POP2-2C-8G"))
+        assert not result.success
+        assert result.failed_stage == "upload_s3"
+        assert "upload_s3" not in result.completed_stages
+
+        pipeline2, executed2 = _make_pipeline(tmp_path)
+        resumed = pipeline2.resume(result.migration_id)
+        assert resumed.success
+        assert executed2 == ["upload_s3", "import_scw", "verify", "cleanup"]
+
+    def test_run_flushes_state_when_interrupted(self, tmp_path):
+        import pytest
+        from vmware2scw.config import VMMigrationPlan
+        pipeline, _ = _make_pipeline(tmp_path)
+        seen = []
+
+        def interrupted(plan, state, start_time, **kw):
+            pipeline.state_store.append_event(state.migration_id, {"stage": "export", "status": "start"})
+            seen.append(state.migration_id)
+            raise KeyboardInterrupt
+
+        pipeline._run_stages = interrupted
+        with pytest.raises(KeyboardInterrupt):
+            pipeline.run(VMMigrationPlan(vm_name="web-01", target_type="POP2-2C-8G"))
+        assert pipeline.state_store._queue.unfinished_tasks == 0
+        assert pipeline.state_store.load(seen[0]).current_stage == "export"
+
+    def test_migration_rounds_split_conflicts(self):
+        from vmware2scw.config import VMMigrationPlan
+        from vmware2scw.pipeline.migration import MigrationPipeline
+        plans = [
+            VMMigrationPlan(vm_name="a", target_type="POP2-2C-8G"),
+            VMMigrationPlan(vm_name="b", target_type="POP2-2C-8G"),
+            VMMigrationPlan(vm_name="c", target_type="POP2-2C-8G", zone="nl-ams-1"),
+            VMMigrationPlan(vm_name="d", target_type="POP2-2C-8G", zone="nl-ams-1"),
+        ]
+        datastores = [{"ds1"}, {"ds1"}, {"ds2"}, {"ds3"}]
+        rounds = MigrationPipeline._migration_rounds(plans, datastores, {"nl-ams-1": 1})
+        assert rounds == [[0, 2], [1, 3]]
+
+    def test_unresolved_plans_run_alone(self, tmp_path):
+        from vmware2scw.config import VMMigrationPlan
+        from vmware2scw.pipeline.migration import MigrationPipeline
+        plans = [VMMigrationPlan(vm_name=n, target_type="POP2-2C-8G") for n in "abc"]
+        rounds = MigrationPipeline._migration_rounds(plans, [{"ds1"}, None, {"ds2"}], {})
+        assert rounds == [[0, 2], [1]]
+
+        pipeline, _ = _make_pipeline(tmp_path)
+
+        def no_vcenter():
+            raise ConnectionError("vCenter unreachable")
+
+        pipeline._get_vsphere = no_vcenter
+        assert pipeline._resolve_datastores(plans) == [None, None, None]
+
+    def test_run_many_returns_results_in_order(self, tmp_path, monkeypatch):
+        from vmware2scw.config import VMMigrationPlan
+        from vmware2scw.pipeline.migration import MigrationPipeline, MigrationResult
+
+        def fake_run(self, plan):
+            if plan.vm_name == "bad":
+                raise RuntimeError("boom")
+            return MigrationResult(success=True, migration_id="x", vm_name=plan.vm_name)
+
+        monkeypatch.setattr(MigrationPipeline, "run", fake_run)
+        pipeline, _ = _make_pipeline(tmp_path)
+        pipeline._resolve_datastores = lambda plans: [set() for _ in plans]
+        plans = [
+            VMMigrationPlan(vm_name="web-01", target_type="POP2-2C-8G"),
+            VMMigrationPlan(vm_name="bad", target_type="POP2-2C-8G"),
+        ]
+        results = pipeline.run_many(plans)
+        assert [r.vm_name for r in results] == ["web-01", "bad"]
+        assert results[0].success and not results[1].success
+        assert results[1].error == "boom"
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  State Store Tests
+# ═══════════════════════════════════════════════════════════════════
+
+class TestMigrationStateStore:
+    def test_journal_replayed_on_load(self, tmp_path):
+        from vmware2scw.pipeline.state import MigrationState, MigrationStateStore
+        store = MigrationStateStore(tmp_path)
+        store.save(MigrationState(migration_id="m1", vm_name="web-01"))
+
+        store.append_event("m1", {"stage": "export", "status": "start"})
+        store.append_event("m1", {
+            "stage": "export",
+            "status": "complete",
+            "artifacts_delta": {"vmdk_paths": ["/work/m1/disk0.vmdk"]},
+        })
+        store.append_event("m1", {"stage": "convert", "status": "start"})
+
+        state = store.load("m1")
+        assert state.completed_stages == ["export"]
+        assert state.current_stage == "convert"
+        assert state.artifacts["vmdk_paths"] == ["/work/m1/disk0.vmdk"]
+
+    def test_mark_stage_complete_is_idempotent(self):
+        from vmware2scw.pipeline.state import MigrationState
+        state = MigrationState(migration_id="m1", vm_name="web-01", completed_stages=["validate"])
+        state.mark_stage_complete("export")
+        state.mark_stage_complete("validate")
+        state.completed_stages.append("convert")  # direct mutation is still seen
+        assert state.completed_stages == ["validate", "export", "convert"]
+        assert state.is_stage_complete("convert")
+        assert "_stages_set" not in state.to_dict()
+
+    def test_journal_events_are_timestamped(self, tmp_path):
+        import json
+        from vmware2scw.pipeline.state import MigrationStateStore
+        store = MigrationStateStore(tmp_path)
+        store.append_event("m1", {"stage": "export", "status": "start"})
+        store.flush()
+        line = json.loads((tmp_path / "m1.log").read_text())
+        assert line["stage"] == "export"
+        assert isinstance(line["t"], int) and line["t"] > 0
+
+    def test_save_compacts_journal(self, tmp_path):
+        from vmware2scw.pipeline.state import MigrationState, MigrationStateStore
+        store = MigrationStateStore(tmp_path)
+        store.save(MigrationState(migration_id="m1", vm_name="web-01"))
+        store.append_event("m1", {"stage": "validate", "status": "complete"})
+
+        state = store.load("m1")
+        store.save(state)
+        store.flush()
+        assert not (tmp_path / "m1.log").exists()
+        assert not (tmp_path / "m1.json.tmp").exists()
+        assert store.load("m1").completed_stages == ["validate"]
+
+    def test_write_failure_reaches_caller(self, tmp_path, monkeypatch):
+        import errno
+        import pytest
+        from vmware2scw.pipeline.state import MigrationState, MigrationStateStore
+        store = MigrationStateStore(tmp_path)
+
+        def no_space(path, payload):
+            raise OSError(errno.ENOSPC, "No space left on device")
+
+        monkeypatch.setattr(store, "_atomic_write", no_space)
+        store.save(MigrationState(migration_id="m1", vm_name="web-01"))
+        with pytest.raises(OSError, match="No space"):
+            store.flush()
+        store.flush()  # raised once
+
+        store.save(MigrationState(migration_id="m1", vm_name="web-01"))
+        store._queue.join()
+        with pytest.raises(OSError, match="No space"):
+            store.append_event("m1", {"stage": "validate", "status": "start"})
+
+    def test_torn_journal_tail_ignored(self, tmp_path):
+        from vmware2scw.pipeline.state import MigrationState, MigrationStateStore
+        store = MigrationStateStore(tmp_path)
+        store.save(MigrationState(migration_id="m1", vm_name="web-01"))
+        store.append_event("m1", {"stage": "validate", "status": "complete"})
+        store.flush()
+        with open(tmp_path / "m1.log", "a") as f:
+            f.write('{"stage": "snap')
+
+        assert store.load("m1").completed_stages == ["validate"]
+
+    def test_later_snapshot_supersedes_queued_writes(self, tmp_path):
+        from vmware2scw.pipeline.state import MigrationState, MigrationStateStore
+        store = MigrationStateStore(tmp_path)
+        state = MigrationState(migration_id="m1", vm_name="web-01")
+        store._write_batch([
+            ("snapshot", "m1", b'{"migration_id": "m1", "vm_name": "old"}'),
+            ("event", "m1", b'{"stage": "validate", "status": "complete"}\n'),
+            ("snapshot", "m1", b'{"migration_id": "m1", "vm_name": "web-01"}'),
+            ("event", "m1", b'{"stage": "snapshot", "status": "start"}\n'),
+        ])
+        loaded = store.load("m1")
+        assert loaded.vm_name == state.vm_name
+        assert loaded.completed_stages == []
+        assert loaded.current_stage == "snapshot"
+
+    def test_list_states_reuses_unchanged_files(self, tmp_path, monkeypatch):
+        from vmware2scw.pipeline.state import MigrationState, MigrationStateStore
+        store = MigrationStateStore(tmp_path)
+        store.save(MigrationState(migration_id="m1", vm_name="web-01"))
+        store.save(MigrationState(migration_id="m2", vm_name="web-02"))
+        assert sorted(s.vm_name for s in store.list_states()) == ["web-01", "web-02"]
+
+        loads = []
+        real_load = store.load
+        monkeypatch.setattr(store, "load", lambda mid: loads.append(mid) or real_load(mid))
+        store.append_event("m2", {"stage": "validate", "status": "complete"})
+        store.delete("m1")
+        states = store.list_states()
+        assert loads == ["m2"]
+        assert [s.completed_stages for s in states] == [["validate"]]
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Configuration Tests
+# ═══════════════════════════════════════════════════════════════════
+
+class TestAppConfig:
+    def test_to_yaml_redacts_secrets(self, tmp_path):
+        import yaml
+        from pydantic import SecretStr
+        from vmware2scw.config import REDACTED, AppConfig
+        config = AppConfig()
+        config.vmware.password = SecretStr("hunter2")
+        config.scaleway.secret_key = SecretStr("scw-secret")
+        config.scaleway.access_key = "SCWACCESS"
+        config.to_yaml(tmp_path / "config.yaml")
+        data = yaml.safe_load((tmp_path / "config.yaml").read_text())
+        assert data["vmware"]["password"] == REDACTED
+        assert data["scaleway"]["secret_key"] == REDACTED
+        assert data["scaleway"]["access_key"] == "SCWACCESS"
+        assert config.model_dump()["vmware"]["password"].get_secret_value() == "hunter2"
@@ -3,18 +3,32 @@
 import logging
 import sys
 
+_PACKAGE_LOGGER = "vmware2scw"
+_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+_DATEFMT = "%H:%M:%S"
+_FORMATTER = logging.Formatter(_FORMAT, datefmt=_DATEFMT)
+_installed = False
+
+
+def _install_package_handler() -> None:
+    """Attach the single stderr handler to the package logger (once).
+
+    Module loggers (vmware2scw.*) propagate to it, so there is one handler
+    object for the whole package instead of one per logger name.
+    """
+    global _installed
+    if _installed:
+        return
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(_FORMATTER)
+    logging.getLogger(_PACKAGE_LOGGER).addHandler(handler)
+    _installed = True
+
 
 def get_logger(name: str, level: int = logging.INFO) -> logging.Logger:
     """Get a configured logger instance."""
+    _install_package_handler()
     logger = logging.getLogger(name)
-    if not logger.handlers:
-        handler = logging.StreamHandler(sys.stderr)
-        formatter = logging.Formatter(
-            "%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-            datefmt="%H:%M:%S",
-        )
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
     logger.setLevel(level)
     return logger
 
@@ -24,7 +38,7 @@ def setup_logging(level: str = "INFO") -> None:
     numeric_level = getattr(logging, level.upper(), logging.INFO)
     logging.basicConfig(
         level=numeric_level,
-        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-        datefmt="%H:%M:%S",
+        format=_FORMAT,
+        datefmt=_DATEFMT,
         stream=sys.stderr,
     )
@@ -0,0 +1,91 @@
+"""qemu-nbd device allocation shared by every NBD user.
+
+Migrations run concurrently (MigrationPipeline.run_many, batch jobs), so
+no caller may hard-code /dev/nbd0 or disconnect a device it did not
+connect: that would pull the export out from under another VM's sgdisk,
+mkfs or ntfsfix, and the following write-back would land on the wrong
+image.
+
+    device = connect_nbd(image, "--format=qcow2")
+    try:
+        ...  # partition work on device / f"{device}p1"
+    finally:
+        disconnect_nbd(device)
+
+Used by:
+  - converter/bios2uefi.py: ESP creation over NBD
+  - converter/bios2uefi_windows.py, converter/windows_virtio.py
+  - pipeline/migration.py: _fix_ntfs_dirty_flag()
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+
+from vmware2scw.utils.subprocess import run_streamed
+
+logger = logging.getLogger(__name__)
+
+NBD_SYSFS = "/sys/block"  # nbdN/pid exists while a device is connected
+NBD_MAX_PART = 16
+
+_lock = threading.Lock()
+_claimed: set[str] = set()  # devices connected by this process
+
+
+def _devices() -> list[str]:
+    """nbdN names in /sys/block, numerically sorted."""
+    if not os.path.isdir(NBD_SYSFS):
+        return []
+    return sorted(
+        (n for n in os.listdir(NBD_SYSFS) if re.fullmatch(r"nbd\d+", n)),
+        key=lambda n: int(n[3:]),
+    )
+
+
+def _held(name: str) -> bool:
+    return os.path.exists(os.path.join(NBD_SYSFS, name, "pid"))
+
+
+def connect_nbd(image: str, *options: str) -> str:
+    """Connect `image` to a free /dev/nbdN and return the device.
+
+    A device is free when no qemu-nbd holds it (no /sys/block/nbdN/pid)
+    and this process has not claimed it. If another process takes the
+    device between the check and the connect, the next one is tried;
+    any other connect failure is raised.
+
+    Raises:
+        RuntimeError: If qemu-nbd fails or every device is in use
+    """
+    with _lock:
+        names = _devices()
+        if not names:
+            run_streamed(["modprobe", "nbd", f"max_part={NBD_MAX_PART}"], check=False)
+            names = _devices()
+        for name in names:
+            device = f"/dev/{name}"
+            if device in _claimed or _held(name):
+                continue
+            try:
+                run_streamed(["qemu-nbd", "--connect", device, *options, image])
+            except RuntimeError as e:
+                if not _held(name):
+                    raise
+                logger.info(f"  {device} taken by another process ({e}), trying the next one")
+                continue
+            _claimed.add(device)
+            return device
+    raise RuntimeError(f"No free NBD device for {image} ({len(names)} devices)")
+
+
+def disconnect_nbd(device: str) -> None:
+    """Disconnect a device returned by connect_nbd(); others are left alone."""
+    with _lock:
+        if device not in _claimed:
+            return
+        run_streamed(["qemu-nbd", "--disconnect", device], check=False)
+        _claimed.discard(device)
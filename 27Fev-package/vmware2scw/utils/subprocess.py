@@ -6,19 +6,140 @@ like qemu-img, virt-customize, guestfish, etc.
 
 from __future__ import annotations
 
+import asyncio
+import collections
+import errno
+import functools
 import logging
 import os
 import re
 import shutil
 import subprocess
-from typing import Callable, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
 
 logger = logging.getLogger(__name__)
 
+STDERR_CHUNK = 16 * 1024          # read size when streaming stderr for progress
+_LINE_BREAK = re.compile(rb"[\r\n]")
+
+# qemu-img -p progress, e.g. "    (42.50/100%)"
+QEMU_IMG_PROGRESS = re.compile(r"\((\d+(?:\.\d+)?)/100%\)")
+
+_PATTERN_CACHE: dict[str, re.Pattern] = {}
+
+
+@functools.lru_cache(maxsize=None)
+def resolve_tool(tool: str) -> Optional[str]:
+    """Absolute path of an external tool in PATH (None if missing).
+
+    PATH does not change during a run, so each tool is looked up once.
+    """
+    return shutil.which(tool)
+
+
+def _cmd_str(cmd: list[str]) -> str:
+    """Short command description for logs and errors (first 6 words)."""
+    return " ".join(str(c) for c in cmd[:6])
+
+
+def _error_tail(stderr: str | bytes | None, limit: int = 500) -> str:
+    """Last `limit` characters of stderr for an error message."""
+    if not stderr:
+        return ""
+    tail = stderr.rstrip()[-limit:]
+    if isinstance(tail, bytes):
+        tail = tail.decode("utf-8", errors="replace")
+    return tail.strip()
+
 
 def check_tool_available(tool: str) -> bool:
     """Check if an external tool is available in PATH."""
-    return shutil.which(tool) is not None
+    return resolve_tool(tool) is not None
+
+
+def _prepare_exec(cmd: list[str], env: dict[str, str] | None) -> tuple[list[str], dict[str, str] | None]:
+    """argv and environment for launching `cmd`.
+
+    The environment is merged with os.environ; None lets the child inherit
+    ours without a copy. argv[0] is the cached absolute path (no PATH search
+    on every launch), except when the caller overrides PATH, which the
+    cache knows nothing about.
+    """
+    run_env = {**os.environ, **env} if env else None
+    argv = cmd
+    if not (env and "PATH" in env) and "/" not in str(cmd[0]):
+        resolved = resolve_tool(str(cmd[0]))
+        if resolved:
+            argv = [resolved, *cmd[1:]]
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Running: %s%s", _cmd_str(cmd), "..." if len(cmd) > 6 else "")
+    return argv, run_env
+
+
+def _progress_regex(pattern: str | re.Pattern) -> re.Pattern:
+    """Compiled progress regex; string patterns are compiled once per process."""
+    if isinstance(pattern, re.Pattern):
+        return pattern
+    compiled = _PATTERN_CACHE.get(pattern)
+    if compiled is None:
+        compiled = _PATTERN_CACHE.setdefault(pattern, re.compile(pattern))
+    return compiled
+
+
+class _ProgressStream:
+    """Splits a stderr byte stream into lines and reports progress matches.
+
+    Lines break on \r as well as \n: qemu-img -p redraws its progress with
+    carriage returns, which line-based reads would only deliver at the end.
+    """
+
+    def __init__(self, pattern: str | re.Pattern, callback: Callable[[float], None]):
+        self._pattern = _progress_regex(pattern)
+        self._callback = callback
+        self._pending = b""
+        self.lines: list[str] = []
+
+    def feed(self, chunk: bytes) -> None:
+        *lines, self._pending = _LINE_BREAK.split(self._pending + chunk)
+        for raw in lines:
+            self._handle_line(raw)
+
+    def close(self) -> str:
+        """Flush the last partial line; returns the collected stderr."""
+        self._handle_line(self._pending)
+        self._pending = b""
+        return "\n".join(self.lines)
+
+    def _handle_line(self, raw: bytes) -> None:
+        line_str = raw.decode("utf-8", errors="replace").strip()
+        if not line_str:
+            return
+        self.lines.append(line_str)
+        match = self._pattern.search(line_str)
+        if match:
+            try:
+                self._callback(float(match.group(1)))
+            except (ValueError, IndexError):
+                pass
+
+
+def _finish(cmd: list[str], result: subprocess.CompletedProcess, check: bool) -> subprocess.CompletedProcess:
+    """Raise on failure (check=True), then decode captured output.
+
+    Output is captured as bytes: a failure only decodes the stderr tail it
+    reports; output is decoded for the caller on success.
+    """
+    if check and result.returncode != 0:
+        raise RuntimeError(
+            f"Command failed (exit {result.returncode}): {_cmd_str(cmd)}\n{_error_tail(result.stderr)}"
+        )
+
+    if isinstance(result.stdout, bytes):
+        result.stdout = result.stdout.decode("utf-8", errors="replace")
+    if isinstance(result.stderr, bytes):
+        result.stderr = result.stderr.decode("utf-8", errors="replace")
+    return result
 
 
 def run_command(
@@ -27,7 +148,7 @@ def run_command(
     capture_output: bool = True,
     check: bool = True,
     timeout: int | None = None,
-    progress_pattern: str | None = None,
+    progress_pattern: str | re.Pattern | None = None,
     progress_callback: Callable[[float], None] | None = None,
     **kwargs,
 ) -> subprocess.CompletedProcess:
@@ -39,7 +160,8 @@ def run_command(
         capture_output: Capture stdout/stderr
         check: Raise on non-zero exit
         timeout: Timeout in seconds
-        progress_pattern: Regex to extract progress percentage from stderr
+        progress_pattern: Regex (str or compiled, e.g. QEMU_IMG_PROGRESS)
+            extracting the progress percentage from stderr
         progress_callback: Called with progress percentage (0-100)
 
     Returns:
@@ -48,41 +170,27 @@ def run_command(
     Raises:
         RuntimeError: If command fails and check=True
     """
-    # Merge environment
-    run_env = dict(os.environ)
-    if env:
-        run_env.update(env)
-
-    cmd_str = " ".join(str(c) for c in cmd[:6])
-    logger.debug(f"Running: {cmd_str}{'...' if len(cmd) > 6 else ''}")
+    argv, run_env = _prepare_exec(cmd, env)
 
     try:
         if progress_pattern and progress_callback:
             # Stream stderr for progress updates
             proc = subprocess.Popen(
-                cmd,
+                argv,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 env=run_env,
+                bufsize=0,
                 **kwargs,
             )
-            stderr_lines = []
-            pattern = re.compile(progress_pattern)
-
-            for line in iter(proc.stderr.readline, b""):
-                line_str = line.decode("utf-8", errors="replace").strip()
-                stderr_lines.append(line_str)
-                match = pattern.search(line_str)
-                if match:
-                    try:
-                        pct = float(match.group(1))
-                        progress_callback(pct)
-                    except (ValueError, IndexError):
-                        pass
+            stream = _ProgressStream(progress_pattern, progress_callback)
+            fd = proc.stderr.fileno()
+            while chunk := os.read(fd, STDERR_CHUNK):
+                stream.feed(chunk)
+            stderr = stream.close()
 
             proc.wait(timeout=timeout)
             stdout = proc.stdout.read().decode("utf-8", errors="replace") if proc.stdout else ""
-            stderr = "\n".join(stderr_lines)
 
             result = subprocess.CompletedProcess(
                 args=cmd,
@@ -92,28 +200,153 @@ def run_command(
             )
         else:
             result = subprocess.run(
-                cmd,
+                argv,
                 capture_output=capture_output,
-                text=True,
                 env=run_env,
                 timeout=timeout,
                 **kwargs,
             )
 
-        if check and result.returncode != 0:
-            err_msg = ""
-            if result.stderr:
-                err_msg = result.stderr.strip()[-500:]
-            raise RuntimeError(
-                f"Command failed (exit {result.returncode}): {cmd_str}\n{err_msg}"
-            )
-
-        return result
+        return _finish(cmd, result, check)
 
     except subprocess.TimeoutExpired:
-        raise RuntimeError(f"Command timed out after {timeout}s: {cmd_str}")
+        raise RuntimeError(f"Command timed out after {timeout}s: {_cmd_str(cmd)}")
+    except FileNotFoundError:
+        raise RuntimeError(
+            f"Command not found: {cmd[0]}. "
+            f"Install the required package."
+        )
+
+
+async def run_command_async(
+    cmd: list[str],
+    env: dict[str, str] | None = None,
+    check: bool = True,
+    timeout: int | None = None,
+    progress_pattern: str | re.Pattern | None = None,
+    progress_callback: Callable[[float], None] | None = None,
+    **kwargs,
+) -> subprocess.CompletedProcess:
+    """Coroutine version of run_command() (output is always captured).
+
+    Many commands with progress callbacks can share one event loop thread
+    instead of taking a thread each:
+
+        results = await asyncio.gather(*(run_command_async(c) for c in cmds))
+
+    Raises:
+        RuntimeError: If command fails and check=True, times out or is missing
+    """
+    argv, run_env = _prepare_exec(cmd, env)
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *argv,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=run_env,
+            **kwargs,
+        )
     except FileNotFoundError:
         raise RuntimeError(
             f"Command not found: {cmd[0]}. "
             f"Install the required package."
-        )
\ No newline at end of file
+        )
+
+    async def read_stderr() -> bytes | str:
+        if not (progress_pattern and progress_callback):
+            return await proc.stderr.read()
+        stream = _ProgressStream(progress_pattern, progress_callback)
+        while chunk := await proc.stderr.read(STDERR_CHUNK):
+            stream.feed(chunk)
+        return stream.close()
+
+    try:
+        stdout, stderr = await asyncio.wait_for(asyncio.gather(proc.stdout.read(), read_stderr()), timeout)
+        await proc.wait()
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise RuntimeError(f"Command timed out after {timeout}s: {_cmd_str(cmd)}")
+
+    result = subprocess.CompletedProcess(args=cmd, returncode=proc.returncode, stdout=stdout, stderr=stderr)
+    return _finish(cmd, result, check)
+
+
+def run_streamed(
+    cmd: list[str],
+    env: dict[str, str] | None = None,
+    check: bool = True,
+    tail_lines: int = 64,
+) -> subprocess.CompletedProcess:
+    """Run a command whose output is not needed, in constant memory.
+
+    stdout is discarded and only the last `tail_lines` lines of stderr are
+    kept (for the error message), however much the tool prints.
+
+    Returns:
+        CompletedProcess with stdout=None and the stderr tail
+
+    Raises:
+        RuntimeError: If command fails and check=True, or is missing
+    """
+    argv, run_env = _prepare_exec(cmd, env)
+    tail: collections.deque[str] = collections.deque(maxlen=tail_lines)
+    try:
+        with subprocess.Popen(argv, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, env=run_env,
+                              text=True, errors="replace") as proc:
+            for line in proc.stderr:
+                tail.append(line)
+    except FileNotFoundError:
+        raise RuntimeError(
+            f"Command not found: {cmd[0]}. "
+            f"Install the required package."
+        )
+    return _finish(cmd, subprocess.CompletedProcess(cmd, proc.returncode, None, "".join(tail)), check)
+
+
+def run_commands_parallel(
+    specs: list[dict[str, Any]],
+    max_workers: int | None = None,
+) -> list[subprocess.CompletedProcess]:
+    """Run independent commands concurrently through run_command().
+
+    Each spec holds the keyword arguments of one run_command() call
+    (at least "cmd"). At most `max_workers` commands are in flight at once
+    (default: os.cpu_count()), however many specs are passed.
+
+    Returns:
+        CompletedProcess results in the order of `specs`
+
+    Raises:
+        RuntimeError: The first failure in spec order (from run_command);
+            commands already started are left to finish
+    """
+    if not specs:
+        return []
+    workers = min(max_workers or os.cpu_count() or 1, len(specs))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cmd") as pool:
+        futures = [pool.submit(run_command, **spec) for spec in specs]
+        return [future.result() for future in futures]
+
+
+def move_sparse(src: str | os.PathLike, dst: str | os.PathLike) -> None:
+    """Move a disk image to `dst`, keeping it sparse.
+
+    Same filesystem: atomic rename. Across filesystems shutil.move() would
+    copy every zero block and write a fully allocated image; instead the
+    copy is done with `cp --sparse=always`, which punches holes for zero
+    runs, and the source is removed afterwards.
+
+    Raises:
+        RuntimeError: If the cross-filesystem copy fails
+    """
+    try:
+        os.replace(src, dst)
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+
+    logger.debug("Cross-device move, sparse copy: %s → %s", src, dst)
+    run_command(["cp", "--sparse=always", str(src), str(dst)])
+    os.unlink(src)
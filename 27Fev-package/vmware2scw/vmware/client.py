@@ -13,6 +13,7 @@ from __future__ import annotations
 import atexit
 import logging
 import ssl
+import threading
 from typing import Optional
 
 from pyVim.connect import Disconnect, SmartConnect
@@ -21,6 +22,59 @@ from pyVmomi import vim
 logger = logging.getLogger(__name__)
 
 
+def retrieve_properties(
+    property_collector, container, specs: list[tuple[type, list[str]]],
+) -> list[tuple[object, dict]]:
+    """Fetch properties of every object in a ContainerView in one paginated call.
+
+    Args:
+        property_collector: content.propertyCollector
+        container: ContainerView to traverse
+        specs: (vim type, property paths) pairs
+
+    Returns:
+        (managed object, {property path: value}) per object. Unset or
+        inaccessible properties are absent from the dict.
+    """
+    traversal = vim.PropertyCollector.TraversalSpec(
+        name="traverseView", path="view", skip=False, type=vim.view.ContainerView,
+    )
+    filter_spec = vim.PropertyCollector.FilterSpec(
+        objectSet=[vim.PropertyCollector.ObjectSpec(obj=container, skip=True, selectSet=[traversal])],
+        propSet=[vim.PropertyCollector.PropertySpec(type=t, pathSet=paths) for t, paths in specs],
+    )
+    return _retrieve(property_collector, filter_spec)
+
+
+def retrieve_object_properties(
+    property_collector, objects: list, specs: list[tuple[type, list[str]]],
+) -> list[tuple[object, dict]]:
+    """Like retrieve_properties(), for an explicit list of managed objects.
+
+    One ObjectSpec per object instead of a container traversal, so only the
+    listed objects are materialized server-side.
+    """
+    if not objects:
+        return []
+    filter_spec = vim.PropertyCollector.FilterSpec(
+        objectSet=[vim.PropertyCollector.ObjectSpec(obj=obj, skip=False) for obj in objects],
+        propSet=[vim.PropertyCollector.PropertySpec(type=t, pathSet=paths) for t, paths in specs],
+    )
+    return _retrieve(property_collector, filter_spec)
+
+
+def _retrieve(property_collector, filter_spec) -> list[tuple[object, dict]]:
+    """Run a RetrievePropertiesEx, following continuation tokens."""
+    objects = []
+    result = property_collector.RetrievePropertiesEx([filter_spec], vim.PropertyCollector.RetrieveOptions())
+    while result:
+        objects.extend((oc.obj, {p.name: p.val for p in oc.propSet or []}) for oc in result.objects)
+        if not result.token:
+            break
+        result = property_collector.ContinueRetrievePropertiesEx(result.token)
+    return objects
+
+
 class VSphereClient:
     """vCenter API client.
 
@@ -35,6 +89,12 @@ class VSphereClient:
         self._si: Optional[vim.ServiceInstance] = None
         self._content = None
         self._host: str = ""
+        # VM lookup indexes, filled by one name-only retrieval over the
+        # cached VM view (see get_vm_view())
+        self._vm_view: Optional[vim.view.ContainerView] = None
+        self._vm_by_name: dict[str, vim.VirtualMachine] = {}
+        self._vm_by_moref: dict[str, vim.VirtualMachine] = {}
+        self._vm_index_lock = threading.Lock()
 
     def connect(self, host: str, username: str, password: str, insecure: bool = False) -> None:
         """Connect to vCenter/ESXi.
@@ -73,6 +133,8 @@ class VSphereClient:
             raise RuntimeError(f"SmartConnect returned None for {host}")
 
         self._content = self._si.RetrieveContent()
+        self._vm_view = None
+        self._vm_by_name, self._vm_by_moref = {}, {}
 
         # Auto-disconnect on interpreter exit
         atexit.register(self._safe_disconnect)
@@ -87,22 +149,31 @@ class VSphereClient:
         """Disconnect from vCenter."""
         if self._si:
             try:
+                self._destroy_vm_view()
                 Disconnect(self._si)
                 logger.info(f"Disconnected from {self._host}")
             except Exception as e:
-                logger.debug(f"Disconnect error (non-fatal): {e}")
+                logger.debug("Disconnect error (non-fatal): %s", e)
             finally:
                 self._si = None
                 self._content = None
+                self._vm_view = None
+                self._vm_by_name, self._vm_by_moref = {}, {}
 
     def _safe_disconnect(self):
         """Safe disconnect for atexit — ignores errors."""
         try:
             if self._si:
+                self._destroy_vm_view()
                 Disconnect(self._si)
         except Exception:
             pass
 
+    def _destroy_vm_view(self) -> None:
+        if self._vm_view is not None:
+            view, self._vm_view = self._vm_view, None
+            view.Destroy()
+
     @property
     def host(self) -> str:
         return self._host
@@ -134,13 +205,53 @@ class VSphereClient:
             container, obj_type, recursive=True
         )
 
+    def get_vm_view(self) -> vim.view.ContainerView:
+        """Shared ContainerView of every VM, created once per connection.
+
+        Owned by the client and destroyed on disconnect — callers must not
+        Destroy() it.
+        """
+        with self._vm_index_lock:
+            if self._vm_view is None:
+                self._vm_view = self.get_container_view([vim.VirtualMachine])
+            return self._vm_view
+
     def find_vm_by_name(self, name: str) -> Optional[vim.VirtualMachine]:
-        """Find a VM by exact name."""
-        container = self.get_container_view([vim.VirtualMachine])
-        try:
-            for vm in container.view:
-                if vm.name == name:
-                    return vm
-        finally:
-            container.Destroy()
-        return None
\ No newline at end of file
+        """Find a VM by exact name, or by inventory path ("DC1/vm/Web/web-01").
+
+        Inventory paths are resolved server-side by the SearchIndex. Bare
+        names go through an index of every VM name, built with a single
+        PropertyCollector call and refreshed on a miss (new or renamed VM)
+        instead of fetching .name from each VM.
+        """
+        if "/" in name:
+            # "/" inside a VM name is stored escaped (%2f), so this is a path
+            vm = self.content.searchIndex.FindByInventoryPath(name)
+            return vm if isinstance(vm, vim.VirtualMachine) else None
+
+        return self._lookup_vm("_vm_by_name", name)
+
+    def find_vm_by_moref(self, moref: str) -> Optional[vim.VirtualMachine]:
+        """Find a VM by Managed Object Reference id (e.g. "vm-42")."""
+        return self._lookup_vm("_vm_by_moref", moref)
+
+    def _lookup_vm(self, index: str, key: str) -> Optional[vim.VirtualMachine]:
+        """Look `key` up in the named index, refreshing it once on a miss."""
+        vm = getattr(self, index).get(key)
+        if vm is None:
+            self._refresh_vm_index()
+            vm = getattr(self, index).get(key)
+        return vm
+
+    def _refresh_vm_index(self) -> None:
+        """Rebuild the name and moref indexes (first name match wins)."""
+        view = self.get_vm_view()
+        objects = retrieve_properties(self.content.propertyCollector, view, [(vim.VirtualMachine, ["name"])])
+        by_name: dict[str, vim.VirtualMachine] = {}
+        by_moref: dict[str, vim.VirtualMachine] = {}
+        for vm, props in objects:
+            by_moref[str(vm._moId)] = vm
+            if "name" in props:
+                by_name.setdefault(props["name"], vm)
+        with self._vm_index_lock:
+            self._vm_by_name, self._vm_by_moref = by_name, by_moref
\ No newline at end of file
@@ -19,7 +19,7 @@ from typing import Optional
 from pydantic import BaseModel, Field
 from pyVmomi import vim
 
-from vmware2scw.vmware.client import VSphereClient
+from vmware2scw.vmware.client import VSphereClient, retrieve_object_properties, retrieve_properties
 
 logger = logging.getLogger(__name__)
 
@@ -70,95 +70,252 @@ class VMInfo(BaseModel):
     snapshots: list[str] = Field(default_factory=list)
 
 
-def _get_folder_path(entity) -> str:
-    """Reconstruct the full folder path for a VM."""
+# Properties fetched per non-template VM in one PropertyCollector round-trip
+VM_PROPERTIES = [
+    "name",
+    "config.hardware.numCPU",
+    "config.hardware.memoryMB",
+    "config.hardware.device",
+    "config.guestId",
+    "config.guestFullName",
+    "config.firmware",
+    "config.uuid",
+    "config.instanceUuid",
+    "config.annotation",
+    "guest.toolsStatus",
+    "guest.toolsVersion",
+    "guest.toolsVersionStatus2",
+    "guest.guestFullName",
+    "runtime.powerState",
+    "runtime.host",
+    "resourcePool",
+    "snapshot.rootSnapshotList",
+    "parent",
+]
+
+# Entities a VM's host/cluster/datacenter/folder/pool resolve through
+ENTITY_TYPES = [
+    vim.Folder,
+    vim.Datacenter,
+    vim.HostSystem,
+    vim.ClusterComputeResource,
+    vim.ComputeResource,
+    vim.ResourcePool,
+    vim.VirtualApp,
+]
+
+# NIC device class → adapter type; other classes are derived from the class
+# name on first sight and added here
+_ADAPTER_TYPES: dict[type, str] = {
+    vim.vm.device.VirtualVmxnet3: "vmxnet3",
+    vim.vm.device.VirtualE1000: "e1000",
+    vim.vm.device.VirtualE1000e: "e1000e",
+    vim.vm.device.VirtualPCNet32: "pcnet32",
+    vim.vm.device.VirtualSriovEthernetCard: "sriov",
+}
+
+
+def _adapter_type(device_type: type) -> str:
+    """Adapter type of a NIC device class, e.g. VirtualVmxnet2 → "vmxnet2"."""
+    adapter_type = _ADAPTER_TYPES.get(device_type)
+    if adapter_type is None:
+        # pyVmomi names are dotted ("vim.vm.device.VirtualVmxnet2")
+        name = device_type.__name__.rpartition(".")[2]
+        adapter_type = name.replace("Virtual", "").replace("Card", "").lower()
+        _ADAPTER_TYPES[device_type] = adapter_type
+    return adapter_type
+
+
+class _LazyProps:
+    """Dict-like view resolving property paths by attribute access (one RPC each).
+
+    Used for single-VM lookups, where a bulk retrieval is not worth it.
+    """
+
+    def __init__(self, obj):
+        self._cache: dict[str, object] = {"": obj}
+
+    def get(self, path: str, default=None):
+        # Intermediate objects are cached: "config.x" and "config.y" fetch
+        # vm.config once
+        if path not in self._cache:
+            parent, _, attr = path.rpartition(".")
+            owner = self.get(parent)
+            self._cache[path] = getattr(owner, attr, None) if owner is not None else None
+        value = self._cache[path]
+        return default if value is None else value
+
+
+class _EntityIndex:
+    """name/parent lookups for folders, datacenters, hosts, clusters and pools.
+
+    Backed by prefetched properties when available; any entity not in the
+    index falls back to a lazy attribute fetch. Folder paths and datacenter
+    names are memoized per parent _moId, so VMs sharing a folder walk the
+    parent chain once.
+    """
+
+    def __init__(self, props: Optional[dict[str, dict]] = None):
+        self._props = props or {}
+        self._folder_paths: dict[str, str] = {}
+        self._datacenters: dict[str, str] = {}
+
+    def name(self, entity) -> str:
+        props = self._props.get(entity._moId)
+        return props.get("name", "") if props is not None else entity.name
+
+    def parent(self, entity):
+        props = self._props.get(entity._moId)
+        return props.get("parent") if props is not None else getattr(entity, "parent", None)
+
+
+def _get_folder_path(parent, index: _EntityIndex) -> str:
+    """Reconstruct the full folder path for a VM from its parent entity."""
+    if parent is None:
+        return ""
+    key = parent._moId
+    if key not in index._folder_paths:
+        index._folder_paths[key] = _walk_folder_path(parent, index)
+    return index._folder_paths[key]
+
+
+def _walk_folder_path(parent, index: _EntityIndex) -> str:
     path_parts = []
-    parent = getattr(entity, "parent", None)
     while parent:
         if isinstance(parent, vim.Folder):
-            name = parent.name
+            name = index.name(parent)
             # Skip the root "vm" folder and datacenters folder
             if name not in ("vm", "Datacenters"):
                 path_parts.insert(0, name)
         elif isinstance(parent, vim.Datacenter):
-            path_parts.insert(0, parent.name)
+            path_parts.insert(0, index.name(parent))
             break
-        parent = getattr(parent, "parent", None)
+        parent = index.parent(parent)
     return "/" + "/".join(path_parts) if path_parts else ""
 
 
-def _get_cluster_name(host_obj) -> str:
+def _get_cluster_name(host_obj, index: _EntityIndex) -> str:
     """Get the cluster name for an ESXi host."""
     if host_obj is None:
         return ""
-    parent = getattr(host_obj, "parent", None)
+    parent = index.parent(host_obj)
     if parent and isinstance(parent, vim.ClusterComputeResource):
-        return parent.name
+        return index.name(parent)
     return ""
 
 
-def _get_datacenter(entity) -> str:
-    """Find the datacenter containing this entity."""
-    parent = getattr(entity, "parent", None)
+def _get_datacenter(parent, index: _EntityIndex) -> str:
+    """Find the datacenter containing a VM, starting from its parent entity."""
+    if parent is None:
+        return ""
+    key = parent._moId
+    if key not in index._datacenters:
+        index._datacenters[key] = _walk_datacenter(parent, index)
+    return index._datacenters[key]
+
+
+def _walk_datacenter(parent, index: _EntityIndex) -> str:
     while parent:
         if isinstance(parent, vim.Datacenter):
-            return parent.name
-        parent = getattr(parent, "parent", None)
+            return index.name(parent)
+        parent = index.parent(parent)
     return ""
 
 
-def _collect_vm_info(vm: vim.VirtualMachine) -> VMInfo:
+def _flatten_snapshots(roots) -> list[str]:
+    """Snapshot names of a snapshot tree, depth-first (parent before children).
+
+    Iterative: no recursion limit on deep snapshot chains.
+    """
+    names: list[str] = []
+    stack = list(reversed(roots))
+    while stack:
+        snap = stack.pop()
+        names.append(snap.name)
+        children = snap.childSnapshotList
+        if children:
+            stack.extend(reversed(children))
+    return names
+
+
+def _collect_vm_info(
+    vm: vim.VirtualMachine,
+    props=None,
+    index: Optional[_EntityIndex] = None,
+) -> VMInfo:
     """Extract all relevant information from a single VM object.
 
     Handles cases where properties may be None (e.g., powered-off VMs
-    without VMware Tools reporting guest info).
+    without VMware Tools reporting guest info). Fields are accumulated in a
+    plain dict and the models are built with model_construct(): values come
+    from typed vSphere properties, so per-field validation is skipped.
+
+    Args:
+        vm: The VM managed object
+        props: Prefetched {property path: value} (see VM_PROPERTIES);
+            default: fetch each property from vCenter on access
+        index: Prefetched entity names/parents; default: lazy lookups
     """
-    config = vm.config
-    summary = vm.summary
-    guest = vm.guest
-    runtime = vm.runtime
+    props = props if props is not None else _LazyProps(vm)
+    index = index or _EntityIndex()
+    name = props.get("name", "")
+    moref = str(vm._moId)
 
-    if config is None:
-        logger.warning(f"VM '{vm.name}' has no config — skipping detailed collection")
-        return VMInfo(name=vm.name, moref=str(vm._moId))
+    if props.get("config.hardware.numCPU") is None:
+        logger.warning(f"VM '{name}' has no config — skipping detailed collection")
+        return VMInfo.model_construct(name=name, moref=moref)
 
     # ── Basic properties ──
-    info = VMInfo(
-        name=vm.name,
-        moref=str(vm._moId),
-        power_state=str(runtime.powerState) if runtime else "",
-        cpu=config.hardware.numCPU,
-        memory_mb=config.hardware.memoryMB,
-        guest_os=config.guestId or "",
-        guest_os_full=(config.guestFullName or
-                       (guest.guestFullName if guest else "") or ""),
-        firmware=getattr(config, "firmware", "bios") or "bios",
-        uuid=config.uuid or "",
-        instance_uuid=config.instanceUuid or "",
-        annotation=config.annotation or "",
-    )
+    data = {
+        "name": name,
+        "moref": moref,
+        "power_state": str(props.get("runtime.powerState", "")),
+        "cpu": props.get("config.hardware.numCPU"),
+        "memory_mb": props.get("config.hardware.memoryMB", 0),
+        "guest_os": props.get("config.guestId") or "",
+        "guest_os_full": (props.get("config.guestFullName") or
+                          props.get("guest.guestFullName") or ""),
+        "firmware": props.get("config.firmware") or "bios",
+        "uuid": props.get("config.uuid") or "",
+        "instance_uuid": props.get("config.instanceUuid") or "",
+        "annotation": props.get("config.annotation") or "",
+    }
 
     # ── VMware Tools ──
-    if guest:
-        info.tools_status = guest.toolsStatus or ""
-        info.tools_version = guest.toolsVersionStatus2 or guest.toolsVersion or ""
+    data["tools_status"] = props.get("guest.toolsStatus") or ""
+    data["tools_version"] = props.get("guest.toolsVersionStatus2") or props.get("guest.toolsVersion") or ""
 
     # ── Host / Cluster / Datacenter ──
-    host_obj = runtime.host if runtime else None
+    host_obj = props.get("runtime.host")
     if host_obj:
-        info.host = host_obj.name
-        info.cluster = _get_cluster_name(host_obj)
+        data["host"] = index.name(host_obj)
+        data["cluster"] = _get_cluster_name(host_obj, index)
 
-    info.datacenter = _get_datacenter(vm)
-    info.folder = _get_folder_path(vm)
+    parent = props.get("parent")
+    data["datacenter"] = _get_datacenter(parent, index)
+    data["folder"] = _get_folder_path(parent, index)
 
     # ── Resource Pool ──
-    if vm.resourcePool:
-        info.resource_pool = vm.resourcePool.name
+    pool = props.get("resourcePool")
+    if pool:
+        data["resource_pool"] = index.name(pool)
+
+    devices = list(props.get("config.hardware.device") or [])
+
+    # controllerKey → bus type, built in one pass instead of a scan per disk
+    ctrl_types = {}
+    for device in devices:
+        if isinstance(device, vim.vm.device.VirtualNVMEController):
+            ctrl_types[device.key] = "nvme"
+        elif isinstance(device, vim.vm.device.VirtualIDEController):
+            ctrl_types[device.key] = "ide"
+        elif isinstance(device, vim.vm.device.VirtualSCSIController):
+            ctrl_types[device.key] = "scsi"
 
     # ── Disks ──
+    disks: list[DiskInfo] = []
     total_disk_gb = 0.0
-    for device in config.hardware.device:
+    for device in devices:
         if isinstance(device, vim.vm.device.VirtualDisk):
             size_gb = device.capacityInKB / (1024 * 1024)
             total_disk_gb += size_gb
@@ -177,32 +334,24 @@ def _collect_vm_info(vm: vim.VirtualMachine) -> VMInfo:
             if hasattr(backing, "thinProvisioned"):
                 thin = backing.thinProvisioned or False
 
-            # Determine controller type
-            ctrl_type = "scsi"
-            ctrl_key = device.controllerKey
-            for dev2 in config.hardware.device:
-                if hasattr(dev2, "key") and dev2.key == ctrl_key:
-                    if isinstance(dev2, vim.vm.device.VirtualNVMEController):
-                        ctrl_type = "nvme"
-                    elif isinstance(dev2, vim.vm.device.VirtualIDEController):
-                        ctrl_type = "ide"
-                    elif isinstance(dev2, vim.vm.device.VirtualSCSIController):
-                        ctrl_type = "scsi"
-                    break
-
-            info.disks.append(DiskInfo(
+            ctrl_type = ctrl_types.get(device.controllerKey, "scsi")
+
+            disks.append(DiskInfo.model_construct(
                 name=device.deviceInfo.label if device.deviceInfo else f"disk-{device.key}",
                 size_gb=round(size_gb, 2),
-                thin_provisioned=thin,
+                thin_provisioned=bool(thin),
                 datastore=ds_name,
-                file_path=getattr(backing, "fileName", ""),
+                file_path=getattr(backing, "fileName", None) or "",
                 controller_type=ctrl_type,
             ))
 
-    info.total_disk_gb = round(total_disk_gb, 2)
+    data["disks"] = disks
+    data["total_disk_gb"] = round(total_disk_gb, 2)
 
     # ── NICs ──
-    for device in config.hardware.device:
+    nics: list[NICInfo] = []
+    networks: list[str] = []
+    for device in devices:
         if isinstance(device, vim.vm.device.VirtualEthernetCard):
             network_name = ""
             backing = device.backing
@@ -216,37 +365,30 @@ def _collect_vm_info(vm: vim.VirtualMachine) -> VMInfo:
                 except Exception:
                     network_name = "dvs:unknown"
 
-            adapter_type = type(device).__name__
-            # Clean up adapter type name
-            adapter_type = adapter_type.replace("Virtual", "").replace("Card", "")
-            # e.g., "Vmxnet3" → "vmxnet3", "E1000e" → "e1000e"
-            adapter_type = adapter_type.lower()
+            adapter_type = _adapter_type(type(device))
 
             connected = False
             if device.connectable:
                 connected = device.connectable.connected or False
 
-            info.nics.append(NICInfo(
+            nics.append(NICInfo.model_construct(
                 mac_address=device.macAddress or "",
                 network=network_name,
                 adapter_type=adapter_type,
-                connected=connected,
+                connected=bool(connected),
             ))
             if network_name:
-                info.networks.append(network_name)
+                networks.append(network_name)
+
+    data["nics"] = nics
+    data["networks"] = networks
 
     # ── Snapshots ──
-    if vm.snapshot and vm.snapshot.rootSnapshotList:
-        def _walk_snapshots(snap_list, result):
-            for s in snap_list:
-                result.append(s.name)
-                if s.childSnapshotList:
-                    _walk_snapshots(s.childSnapshotList, result)
-        snap_names = []
-        _walk_snapshots(vm.snapshot.rootSnapshotList, snap_names)
-        info.snapshots = snap_names
+    root_snapshots = props.get("snapshot.rootSnapshotList")
+    if root_snapshots:
+        data["snapshots"] = _flatten_snapshots(root_snapshots)
 
-    return info
+    return VMInfo.model_construct(**data)
 
 
 class VMInventory:
@@ -265,44 +407,58 @@ class VMInventory:
     def list_all_vms(self) -> list[VMInfo]:
         """List all VMs in the connected vCenter.
 
-        Uses ContainerView for efficient traversal of the entire inventory.
-        Skips templates (config.template == True).
+        PropertyCollector retrievals replace per-VM lazy attribute fetches:
+        name/config.template of every VM, then VM_PROPERTIES for the
+        non-template VMs only (templates never have their device list
+        materialized), then the name/parent of the folders, datacenters,
+        hosts, clusters and pools the VMs resolve through. Collection is
+        then pure in-memory work.
 
         Returns:
             List of VMInfo objects for all non-template VMs
         """
         logger.info("Collecting VM inventory...")
-        container = self.client.get_container_view([vim.VirtualMachine])
-        vms: list[VMInfo] = []
-
+        pc = self.client.content.propertyCollector
+
+        # Shared per-connection view: the client owns and destroys it
+        vm_view = self.client.get_vm_view()
+        candidates = retrieve_properties(pc, vm_view, [(vim.VirtualMachine, ["name", "config.template"])])
+        logger.info(f"Found {len(candidates)} VM objects in vCenter")
+
+        wanted = []
+        for vm_obj, props in candidates:
+            if props.get("config.template"):
+                logger.debug("Skipping template: %s", props.get("name", ""))
+            else:
+                wanted.append(vm_obj)
+        vm_objects = retrieve_object_properties(pc, wanted, [(vim.VirtualMachine, VM_PROPERTIES)])
+
+        container = self.client.get_container_view(ENTITY_TYPES)
         try:
-            vm_objects = list(container.view)
-            logger.info(f"Found {len(vm_objects)} VM objects in vCenter")
-
-            for vm_obj in vm_objects:
-                try:
-                    # Skip templates
-                    if vm_obj.config and vm_obj.config.template:
-                        logger.debug(f"Skipping template: {vm_obj.name}")
-                        continue
-
-                    vm_info = _collect_vm_info(vm_obj)
-                    vms.append(vm_info)
-                    logger.debug(
-                        f"  {vm_info.name}: {vm_info.cpu}vCPU, "
-                        f"{vm_info.memory_mb}MB, {vm_info.total_disk_gb:.1f}GB, "
-                        f"firmware={vm_info.firmware}, os={vm_info.guest_os}"
-                    )
-
-                except Exception as e:
-                    logger.warning(f"Error collecting info for VM '{vm_obj.name}': {e}")
-                    # Still add with minimal info
-                    vms.append(VMInfo(
-                        name=vm_obj.name,
-                        moref=str(vm_obj._moId),
-                    ))
+            entities = retrieve_properties(pc, container, [(t, ["name", "parent"]) for t in ENTITY_TYPES])
         finally:
             container.Destroy()
+        index = _EntityIndex({str(obj._moId): props for obj, props in entities})
+
+        vms: list[VMInfo] = []
+        for vm_obj, props in vm_objects:
+            name = props.get("name", "")
+            try:
+                vm_info = _collect_vm_info(vm_obj, props, index)
+                vms.append(vm_info)
+                logger.debug(
+                    "  %s: %svCPU, %sMB, %.1fGB, firmware=%s, os=%s",
+                    vm_info.name, vm_info.cpu, vm_info.memory_mb,
+                    vm_info.total_disk_gb, vm_info.firmware, vm_info.guest_os,
+                )
+
+            except Exception as e:
+                logger.warning(f"Error collecting info for VM '{name}': {e}")
+                # Still add with minimal info
+                vms.append(VMInfo(
+                    name=name,
+                    moref=str(vm_obj._moId),
+                ))
 
         logger.info(f"Inventory complete: {len(vms)} VMs collected")
         return vms
@@ -332,11 +488,7 @@ class VMInventory:
 
     def get_vm_by_moref(self, moref: str) -> VMInfo | None:
         """Get VM info by Managed Object Reference."""
-        container = self.client.get_container_view([vim.VirtualMachine])
-        try:
-            for vm_obj in container.view:
-                if str(vm_obj._moId) == moref:
-                    return _collect_vm_info(vm_obj)
-        finally:
-            container.Destroy()
-        return None
\ No newline at end of file
+        vm_obj = self.client.find_vm_by_moref(moref)
+        if vm_obj is None:
+            return None
+        return _collect_vm_info(vm_obj)
\ No newline at end of file
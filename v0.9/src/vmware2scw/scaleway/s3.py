@@ -36,7 +36,7 @@ class ScalewayS3:
             region_name=region,
             config=Config(
                 retries={"max_attempts": 3, "mode": "adaptive"},
-                max_pool_connections=10,
+                max_pool_connections=32,  # >= concurrent multipart parts
             ),
         )
         self.resource = boto3.resource(
@@ -69,19 +69,26 @@ class ScalewayS3:
         bucket: str,
         key: str,
         progress_callback: Optional[Callable[[int], None]] = None,
+        max_concurrency: int = 8,
+        chunk_size: int = 64 * 1024 * 1024,
+        transfer_config: Optional[boto3.s3.transfer.TransferConfig] = None,
     ) -> str:
         """Upload a qcow2 image to S3 using multipart upload.
 
         Uses boto3's managed upload which automatically handles:
         - Multipart upload for large files
         - Retry logic
-        - Concurrency
+        - Concurrency (parts are read and sent by parallel threads)
 
         Args:
             local_path: Path to local qcow2 file
             bucket: S3 bucket name
             key: Object key (path within bucket)
             progress_callback: Optional callback(bytes_transferred)
+            max_concurrency: Parts uploaded in parallel
+            chunk_size: Multipart threshold and part size in bytes
+            transfer_config: Explicit TransferConfig (overrides max_concurrency
+                and chunk_size)
 
         Returns:
             S3 URL of the uploaded image
@@ -97,12 +104,13 @@ class ScalewayS3:
         )
 
         # Configure multipart upload
-        transfer_config = boto3.s3.transfer.TransferConfig(
-            multipart_threshold=64 * 1024 * 1024,     # 64MB threshold
-            multipart_chunksize=64 * 1024 * 1024,     # 64MB chunks
-            max_concurrency=4,
-            use_threads=True,
-        )
+        if transfer_config is None:
+            transfer_config = boto3.s3.transfer.TransferConfig(
+                multipart_threshold=chunk_size,     # 64MB threshold by default
+                multipart_chunksize=chunk_size,     # 64MB chunks by default
+                max_concurrency=max_concurrency,
+                use_threads=True,
+            )
 
         # Progress tracking
         class ProgressTracker:
@@ -136,6 +144,13 @@ class ScalewayS3:
         logger.info(f"Upload complete: {url}")
         return url
 
+    def head_object(self, bucket: str, key: str) -> Optional[dict]:
+        """HEAD an object in one request; None if it does not exist."""
+        try:
+            return self.client.head_object(Bucket=bucket, Key=key)
+        except self.client.exceptions.ClientError:
+            return None
+
     def check_object_exists(self, bucket: str, key: str) -> bool:
         """Check if an object already exists in S3."""
         try:
@@ -154,6 +169,25 @@ class ScalewayS3:
         logger.info(f"Deleting s3://{bucket}/{key}")
         self.client.delete_object(Bucket=bucket, Key=key)
 
+    def delete_objects_batch(self, bucket: str, keys: list[str]) -> list[str]:
+        """Delete many objects with DeleteObjects (up to 1000 keys per request).
+
+        Returns:
+            Keys that could not be deleted (errors are logged per key)
+        """
+        failed: list[str] = []
+        for start in range(0, len(keys), 1000):
+            chunk = keys[start:start + 1000]
+            response = self.client.delete_objects(
+                Bucket=bucket,
+                Delete={"Objects": [{"Key": k} for k in chunk], "Quiet": True},
+            )
+            for err in response.get("Errors", []):
+                logger.warning(f"Failed to delete s3://{bucket}/{err.get('Key')}: "
+                               f"{err.get('Code')} {err.get('Message', '')}")
+                failed.append(err.get("Key"))
+        return failed
+
     def generate_presigned_url(self, bucket: str, key: str, expires_in: int = 3600) -> str:
         """Generate a presigned URL for the object.
 
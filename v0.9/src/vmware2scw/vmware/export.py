@@ -15,7 +15,7 @@ from __future__ import annotations
 import os
 import ssl
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 from urllib.request import Request, urlopen
 
 from pyVmomi import vim
@@ -41,8 +41,21 @@ class VMExporter:
         vm_name: str,
         output_dir: Path,
         progress_callback=None,
+        on_disk_exported: Optional[Callable[[Path], None]] = None,
+        already_exported: Optional[Callable[[Path], bool]] = None,
     ) -> list[Path]:
-        """Export all disks of a VM to local VMDK files."""
+        """Export all disks of a VM to local VMDK files.
+
+        Args:
+            vm_name: Source VM name
+            output_dir: Directory for the VMDK files
+            progress_callback: Optional callback(file_name, downloaded, total)
+            on_disk_exported: Called with each VMDK path as soon as that disk
+                is on disk, so a consumer can process it while the next disk
+                is still downloading
+            already_exported: Optional predicate marking a disk as done even
+                if its VMDK is gone (e.g. already consumed by the converter)
+        """
         import threading
 
         output_dir.mkdir(parents=True, exist_ok=True)
@@ -100,15 +113,19 @@ class VMExporter:
                 file_name = f"{vm_name}-{safe_key}.vmdk"
                 file_path = output_dir / file_name
 
-                if file_path.exists():
+                if file_path.exists() or (already_exported and already_exported(file_path)):
                     logger.info(f"Disk file already exists, skipping: {file_name}")
                     exported_files.append(file_path)
+                    if on_disk_exported:
+                        on_disk_exported(file_path)
                     disk_idx += 1
                     continue
 
                 logger.info(f"Downloading disk: {file_name}")
                 self._download_disk(url, file_path, lease, disk_idx, total_disks, progress_callback)
                 exported_files.append(file_path)
+                if on_disk_exported:
+                    on_disk_exported(file_path)
                 disk_idx += 1
 
             self._lease_done = True